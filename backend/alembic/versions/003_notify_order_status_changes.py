@@ -0,0 +1,81 @@
+# the status triggers from 002 also pg_notify every change, so the api can push order progress to clients
+# (see services/order_events.py) instead of them polling /api/orders or /orders/{id}/history.
+# payload stays tiny -- ids + statuses + timestamp, well under the 8000 byte notify limit
+
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "003"
+down_revision: Union[str, None] = "002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # same audit insert as before, plus the notify -- it only fires when the transaction commits
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_order_status_change()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF OLD.status IS DISTINCT FROM NEW.status THEN
+                INSERT INTO order_status_history (order_id, old_status, new_status, changed_at)
+                VALUES (NEW.id, OLD.status, NEW.status, NOW());
+
+                PERFORM pg_notify('order_status', json_build_object(
+                    'order_id', NEW.id,
+                    'old_status', OLD.status,
+                    'new_status', NEW.status,
+                    'bot_id', NEW.bot_id,
+                    'changed_at', NOW()
+                )::text);
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_order_creation()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO order_status_history (order_id, old_status, new_status, changed_at)
+            VALUES (NEW.id, NULL, NEW.status, NOW());
+
+            PERFORM pg_notify('order_status', json_build_object(
+                'order_id', NEW.id,
+                'old_status', NULL,
+                'new_status', NEW.status,
+                'bot_id', NEW.bot_id,
+                'changed_at', NOW()
+            )::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+
+def downgrade() -> None:
+    # back to the 002 versions -- audit trail only, no notify
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_order_status_change()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF OLD.status IS DISTINCT FROM NEW.status THEN
+                INSERT INTO order_status_history (order_id, old_status, new_status, changed_at)
+                VALUES (NEW.id, OLD.status, NEW.status, NOW());
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_order_creation()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO order_status_history (order_id, old_status, new_status, changed_at)
+            VALUES (NEW.id, NULL, NEW.status, NOW());
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
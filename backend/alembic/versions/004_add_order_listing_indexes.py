@@ -0,0 +1,34 @@
+# composite indexes for GET /api/orders -- every filter the listing supports is an equality prefix on
+# (created_at, id), the keyset the cursor pages over, so filtered views and deep pages stay index scans.
+# built CONCURRENTLY so adding them to a big live orders table doesn't block writes
+
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "004"
+down_revision: Union[str, None] = "003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, leading filter column or None)
+ORDER_LISTING_INDEXES = (
+    ("ix_orders_created_id", None),
+    ("ix_orders_status_created_id", "status"),
+    ("ix_orders_restaurant_created_id", "restaurant_id"),
+    ("ix_orders_bot_created_id", "bot_id"),
+    ("ix_orders_delivery_created_id", "delivery_node_id"),
+)
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for name, column in ORDER_LISTING_INDEXES:
+            columns = ([column] if column else []) + ["created_at", "id"]
+            op.create_index(name, "orders", columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in ORDER_LISTING_INDEXES:
+            op.drop_index(name, table_name="orders", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,38 @@
+# the order list/history etags (see services/order_events.py) have to change on every order write, not just
+# status changes -- a moved delivery point or a new bot_id changes the views too. the 003 notify only covers
+# status transitions, so every other update gets a bare notify on its own channel that just bumps the version
+
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "005"
+down_revision: Union[str, None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_order_change()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            -- status changes already go out on 'order_status' (003)
+            IF OLD.status IS NOT DISTINCT FROM NEW.status AND OLD IS DISTINCT FROM NEW THEN
+                PERFORM pg_notify('order_changed', NEW.id::text);
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER order_change_notify_trigger
+        AFTER UPDATE ON orders
+        FOR EACH ROW
+        EXECUTE FUNCTION notify_order_change();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS order_change_notify_trigger ON orders")
+    op.execute("DROP FUNCTION IF EXISTS notify_order_change()")
@@ -19,11 +19,60 @@ class Settings(BaseSettings):
 
     # Fleet configuration
     TOTAL_BOTS: int = 5
+    # bots start at (and return to) the central station node at these coordinates
+    STATION_X: int = 4
+    STATION_Y: int = 3
     MAX_BOT_CAPACITY: int = 3
+    # restaurant admission: at most MAX_RESTAURANT_ORDERS per window -- wall-clock seconds for the api,
+    # ticks inside the simulation
     MAX_RESTAURANT_ORDERS: int = 3
+    RESTAURANT_WINDOW_SECONDS: int = 30
     RESTAURANT_COOLDOWN_TICKS: int = 30
+    # on startup, rebuild the api's restaurant windows from the last RESTAURANT_WINDOW_SECONDS of orders
+    ADMISSION_WARM_START: bool = True
+    # order -> bot dispatch: "greedy" (nearest bot, one order at a time) or "batch" (min-cost matching per tick)
+    DISPATCH_MODE: str = "greedy"
+    # greedy dispatch finds the nearest bots through a grid index of their positions -- cell size in nodes
+    BOT_INDEX_BUCKET_SIZE: int = 8
+    # collision avoidance: plan bots in priority order with space-time a* so no two share a node (the station
+    # excepted) or swap places on the same tick. routes are checked COLLISION_WINDOW_TICKS ahead, and a bot whose
+    # search runs past COLLISION_MAX_EXPANSIONS steps just waits a tick -- keeps the cost per bot flat as the fleet grows
+    COLLISION_AVOIDANCE: bool = False
+    COLLISION_WINDOW_TICKS: int = 16
+    COLLISION_MAX_EXPANSIONS: int = 2000
     # how often the simulation loop ticks (in seconds)
     SIMULATION_TICK_INTERVAL: float = 1.0
+    # speed multiplier for the server-side tick loop -- 2.0 ticks twice per interval
+    SIMULATION_SPEED: float = 1.0
+    # upper bound on a single headless /simulation/run so one request can't pin a worker forever
+    HEADLESS_MAX_TICKS: int = 100000
+
+    # order intake: "direct" (each POST /api/orders commits on its own) or "grouped" (posts queue up and one
+    # writer commits them together -- every ORDER_INTAKE_MAX_WAIT_MS or ORDER_INTAKE_MAX_BATCH orders, whichever comes first)
+    ORDER_INTAKE_MODE: str = "direct"
+    ORDER_INTAKE_MAX_BATCH: int = 100
+    ORDER_INTAKE_MAX_WAIT_MS: float = 5.0
+
+    # all-pairs distance table is O(n^2) memory, so past this many nodes we fall back to plain a*.
+    # it gets built when the graph loads at startup (about 1s at 900 nodes, 4s at 2000), not on the first request
+    DISTANCE_TABLE_MAX_NODES: int = 2000
+    # what to use past that limit: "astar" (exact, expands a lot on big maps) or "hierarchical" (hpa* over
+    # HPA_CLUSTER_SIZE x HPA_CLUSTER_SIZE clusters -- near-shortest paths at a fraction of the search)
+    PATHFINDING_MODE: str = "astar"
+    HPA_CLUSTER_SIZE: int = 16
+    # landmarks for the a* heuristic on those maps (one bfs row of n ints each) -- 0 means plain manhattan
+    ASTAR_LANDMARKS: int = 8
+    # one distance row per restaurant, delivery point and the station (built on first use), so distances and
+    # routes towards them are lookups instead of searches
+    DISTANCE_FIELDS: bool = True
+    # precompiled grid artifact (see services/grid_artifact.py) -- empty means always build the graph from the db
+    GRID_ARTIFACT_PATH: str = ""
+    # bake the distance/next-hop tables into the artifact too (only for grids under DISTANCE_TABLE_MAX_NODES)
+    GRID_ARTIFACT_TABLES: bool = True
+
+    # map import -- where sample_data.csv / BlockedPaths.csv live (defaults to the repo's data/), rows per bulk insert
+    MAP_DATA_DIR: str = ""
+    IMPORT_CHUNK_SIZE: int = 5000
 
     class Config:
         env_file = ".env"
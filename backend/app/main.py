@@ -1,5 +1,6 @@
 # EagRoute API — main entry point for the route optimization delivery bot system (FastAPI backend)
 import time
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -8,9 +9,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.config import settings
-from app.database import run_migrations, SessionLocal
+from app.database import run_migrations, SessionLocal, engine
 from app.utils.data_loader import load_initial_data
+from app.services.admission import warm_from_db
+from app.services.grid_graph import load_grid_graph
 from app.routers import grid_router, bots_router, orders_router, simulation_router
+from app.routers.simulation import ticker, live_updates
+from app.routers.orders import order_intake
+from app.services.order_events import order_events
 from app.middleware.security import SecurityMiddleware
 
 logging.basicConfig(level=logging.INFO)
@@ -29,15 +35,33 @@ async def lifespan(app: FastAPI):
     db = SessionLocal()
     try:
         load_initial_data(db)
+        # build the in-memory grid graph once -- pathfinding, the simulation and the grid api all share it
+        graph = load_grid_graph(db)
+        logger.info(f"Grid graph loaded: {graph.size} nodes, {len(graph.blocked_edges)} blocked edges (v{graph.version})")
+        # restaurant windows live in memory -- pick up the orders from the last window so a restart doesn't reset them
+        if settings.ADMISSION_WARM_START:
+            restored = warm_from_db(db)
+            logger.info(f"Restaurant admission windows restored ({restored} recent orders)")
     finally:
         db.close()
 
+    # the simulation tick loop lives on this event loop -- /simulation/start and /stop drive it
+    ticker.bind(asyncio.get_running_loop())
+    # same loop hosts the live dashboard streams
+    live_updates.bind(asyncio.get_running_loop())
+    # order status feed: LISTEN on postgres, the engine's change hook anywhere else
+    order_events.start(engine, asyncio.get_running_loop())
+
     logger.info(f"API running - env: {settings.ENVIRONMENT}")
     logger.info("Docs available at http://localhost:8000/docs")
 
     yield
 
     logger.info("Shutting down...")
+    await ticker.shutdown()
+    # anything still queued for a group commit gets written before we go
+    order_intake.stop()
+    order_events.stop()
 
 
 app = FastAPI(
@@ -57,6 +81,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # so the browser lets the frontend read the order list's paging cursor and etag
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 
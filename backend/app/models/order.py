@@ -1,6 +1,6 @@
 # order — a food delivery request, lifecycle: PENDING -> ASSIGNED -> PICKED_UP -> DELIVERED (or CANCELLED)
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Index, func
 from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime
@@ -70,6 +70,15 @@ class Order(Base):
         order_by="OrderStatusHistory.changed_at"
     )
 
+    # GET /api/orders pages over (created_at, id) newest first, optionally behind one equality filter (migration 004)
+    __table_args__ = (
+        Index("ix_orders_created_id", "created_at", "id"),
+        Index("ix_orders_status_created_id", "status", "created_at", "id"),
+        Index("ix_orders_restaurant_created_id", "restaurant_id", "created_at", "id"),
+        Index("ix_orders_bot_created_id", "bot_id", "created_at", "id"),
+        Index("ix_orders_delivery_created_id", "delivery_node_id", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<Order(id={self.id}, restaurant={self.restaurant_id}, status={self.status}, bot={self.bot_id})>"
 
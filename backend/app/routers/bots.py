@@ -9,35 +9,36 @@ from app.database import get_db
 from app.models import Bot, Order
 from app.models.order import OrderStatus
 from app.schemas import BotResponse, OrderResponse
+from app.routers.orders import order_view_query, order_view_response
+from app.services.fleet_load import fleet_load_snapshot
+from app.services.grid_graph import GridGraph, get_grid_graph
 
 router = APIRouter()
 
 
+def _bot_response(bot: Bot, active_orders: int, graph: GridGraph) -> BotResponse:
+    # coords come from the in-memory graph so we don't lazy-load bot.current_node per bot
+    coords = graph.coords(bot.current_node_id) if bot.current_node_id else None
+    return BotResponse(
+        id=bot.id,
+        name=bot.name,
+        status=bot.status,
+        current_node_id=bot.current_node_id,
+        x=coords[0] if coords else None,
+        y=coords[1] if coords else None,
+        max_capacity=bot.max_capacity,
+        current_order_count=active_orders,
+        available_capacity=bot.max_capacity - active_orders
+    )
+
+
 @router.get("", response_model=List[BotResponse])
 def get_bots(db: Session = Depends(get_db)):
-    # returns all bots with their current order counts and available capacity
+    # returns all bots with their current order counts and available capacity -- one load snapshot for the whole fleet
     bots = db.query(Bot).all()
-
-    responses = []
-    for bot in bots:
-        active_orders = db.query(Order).filter(
-            Order.bot_id == bot.id,
-            Order.status.in_([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP])
-        ).count()
-
-        responses.append(BotResponse(
-            id=bot.id,
-            name=bot.name,
-            status=bot.status,
-            current_node_id=bot.current_node_id,
-            x=bot.current_node.x if bot.current_node else None,
-            y=bot.current_node.y if bot.current_node else None,
-            max_capacity=bot.max_capacity,
-            current_order_count=active_orders,
-            available_capacity=bot.max_capacity - active_orders
-        ))
-
-    return responses
+    loads = fleet_load_snapshot(db)
+    graph = get_grid_graph(db)
+    return [_bot_response(bot, loads.get(bot.id, 0), graph) for bot in bots]
 
 
 @router.get("/{bot_id}", response_model=BotResponse)
@@ -46,22 +47,8 @@ def get_bot(bot_id: int, db: Session = Depends(get_db)):
     if not bot:
         raise HTTPException(status_code=404, detail="Bot not found")
 
-    active_orders = db.query(Order).filter(
-        Order.bot_id == bot.id,
-        Order.status.in_([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP])
-    ).count()
-
-    return BotResponse(
-        id=bot.id,
-        name=bot.name,
-        status=bot.status,
-        current_node_id=bot.current_node_id,
-        x=bot.current_node.x if bot.current_node else None,
-        y=bot.current_node.y if bot.current_node else None,
-        max_capacity=bot.max_capacity,
-        current_order_count=active_orders,
-        available_capacity=bot.max_capacity - active_orders
-    )
+    loads = fleet_load_snapshot(db)
+    return _bot_response(bot, loads.get(bot.id, 0), get_grid_graph(db))
 
 
 @router.get("/{bot_id}/orders", response_model=List[OrderResponse])
@@ -71,25 +58,9 @@ def get_bot_orders(bot_id: int, db: Session = Depends(get_db)):
     if not bot:
         raise HTTPException(status_code=404, detail="Bot not found")
 
-    orders = db.query(Order).filter(
+    rows = order_view_query(db).filter(
         Order.bot_id == bot_id,
         Order.status.in_([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP])
     ).all()
 
-    return [
-        OrderResponse(
-            id=o.id,
-            restaurant_id=o.restaurant_id,
-            restaurant_name=o.restaurant.name if o.restaurant else None,
-            pickup_node_id=o.pickup_node_id,
-            delivery_node_id=o.delivery_node_id,
-            bot_id=o.bot_id,
-            bot_name=o.bot.name if o.bot else None,
-            status=o.status,
-            created_at=o.created_at,
-            assigned_at=o.assigned_at,
-            picked_up_at=o.picked_up_at,
-            delivered_at=o.delivered_at
-        )
-        for o in orders
-    ]
+    return [order_view_response(row) for row in rows]
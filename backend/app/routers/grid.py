@@ -1,17 +1,23 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List
 
 from app.database import get_db
-from app.models import Node, Restaurant, BlockedEdge
+from app.models import Node, BlockedEdge
 from app.schemas import (
     NodeResponse,
     RestaurantResponse,
     BlockedEdgeResponse,
+    BlockedEdgeCreate,
     GridResponse
 )
+from app.services.grid_graph import GridGraph, get_grid_graph, block_edge, unblock_edge
+from app.services.simulation import get_simulation_service
 
 router = APIRouter()
+logger = logging.getLogger("eagroute")
 
 
 def to_address(x: int, y: int) -> str:
@@ -30,73 +36,130 @@ def node_to_response(node: Node) -> NodeResponse:
     )
 
 
-@router.get("", response_model=GridResponse)
-def get_grid(db: Session = Depends(get_db)):
-    # returns everything the frontend needs to draw the map
-    nodes = db.query(Node).all()
-
-    restaurants = db.query(Restaurant).all()
-    restaurant_responses = []
-    for r in restaurants:
-        x = r.node.x if r.node else 0
-        y = r.node.y if r.node else 0
-        restaurant_responses.append(RestaurantResponse(
-            id=r.id,
-            name=r.name,
-            node_id=r.node_id,
-            x=x,
-            y=y,
-            address=to_address(x, y),
+def get_graph(db: Session = Depends(get_db)) -> GridGraph:
+    # fastapi dependency -- hands out the shared in-memory graph, the db is only touched if it isn't loaded yet
+    return get_grid_graph(db)
+
+
+def _graph_node_response(graph: GridGraph, i: int) -> NodeResponse:
+    x, y = graph.xs[i], graph.ys[i]
+    return NodeResponse(
+        id=graph.node_ids[i],
+        x=x,
+        y=y,
+        is_delivery_point=bool(graph.is_delivery[i]),
+        address=to_address(x, y),
+    )
+
+
+def _graph_restaurant_responses(graph: GridGraph) -> List[RestaurantResponse]:
+    responses = []
+    for restaurant_id, name, node_id in graph.restaurants:
+        coords = graph.coords(node_id)
+        responses.append(RestaurantResponse(
+            id=restaurant_id,
+            name=name,
+            node_id=node_id,
+            x=coords[0] if coords else None,
+            y=coords[1] if coords else None,
+            address=to_address(*coords) if coords else "",
         ))
+    return responses
 
-    blocked_edges = db.query(BlockedEdge).all()
-    delivery_points = db.query(Node).filter(Node.is_delivery_point == True).all()
 
+def _graph_blocked_edge_responses(graph: GridGraph) -> List[BlockedEdgeResponse]:
+    return [
+        BlockedEdgeResponse(id=edge_id, from_node_id=from_id, to_node_id=to_id)
+        for edge_id, from_id, to_id in graph.blocked_edges
+    ]
+
+
+@router.get("", response_model=GridResponse)
+def get_grid(graph: GridGraph = Depends(get_graph)):
+    # returns everything the frontend needs to draw the map, straight from the in-memory graph
     return GridResponse(
-        nodes=[node_to_response(n) for n in nodes],
-        restaurants=restaurant_responses,
-        blocked_edges=[BlockedEdgeResponse.model_validate(e) for e in blocked_edges],
-        delivery_points=[node_to_response(d) for d in delivery_points],
+        nodes=[_graph_node_response(graph, i) for i in range(graph.size)],
+        restaurants=_graph_restaurant_responses(graph),
+        blocked_edges=_graph_blocked_edge_responses(graph),
+        delivery_points=[_graph_node_response(graph, i) for i in range(graph.size) if graph.is_delivery[i]],
     )
 
 
 @router.get("/nodes", response_model=List[NodeResponse])
-def get_nodes(db: Session = Depends(get_db)):
-    nodes = db.query(Node).all()
-    return [node_to_response(n) for n in nodes]
+def get_nodes(graph: GridGraph = Depends(get_graph)):
+    return [_graph_node_response(graph, i) for i in range(graph.size)]
 
 
 @router.get("/nodes/{node_id}", response_model=NodeResponse)
-def get_node(node_id: int, db: Session = Depends(get_db)):
-    node = db.query(Node).filter(Node.id == node_id).first()
-    if not node:
+def get_node(node_id: int, graph: GridGraph = Depends(get_graph)):
+    i = graph.index.get(node_id)
+    if i is None:
         raise HTTPException(status_code=404, detail="Node not found")
-    return node_to_response(node)
+    return _graph_node_response(graph, i)
 
 
 @router.get("/restaurants", response_model=List[RestaurantResponse])
-def get_restaurants(db: Session = Depends(get_db)):
-    restaurants = db.query(Restaurant).all()
-    return [
-        RestaurantResponse(
-            id=r.id,
-            name=r.name,
-            node_id=r.node_id,
-            x=r.node.x if r.node else None,
-            y=r.node.y if r.node else None,
-            address=to_address(r.node.x, r.node.y) if r.node else "",
-        )
-        for r in restaurants
-    ]
+def get_restaurants(graph: GridGraph = Depends(get_graph)):
+    return _graph_restaurant_responses(graph)
 
 
 @router.get("/delivery-points", response_model=List[NodeResponse])
-def get_delivery_points(db: Session = Depends(get_db)):
-    delivery_points = db.query(Node).filter(Node.is_delivery_point == True).all()
-    return [node_to_response(d) for d in delivery_points]
+def get_delivery_points(graph: GridGraph = Depends(get_graph)):
+    return [_graph_node_response(graph, i) for i in range(graph.size) if graph.is_delivery[i]]
 
 
 @router.get("/blocked-edges", response_model=List[BlockedEdgeResponse])
-def get_blocked_edges(db: Session = Depends(get_db)):
-    edges = db.query(BlockedEdge).all()
-    return [BlockedEdgeResponse.model_validate(e) for e in edges]
+def get_blocked_edges(graph: GridGraph = Depends(get_graph)):
+    return _graph_blocked_edge_responses(graph)
+
+
+@router.post("/blocked-edges", response_model=BlockedEdgeResponse, status_code=201)
+def create_blocked_edge(edge_data: BlockedEdgeCreate, db: Session = Depends(get_db)):
+    # road closure at runtime -- only bots whose remaining route crosses this edge get re-planned
+    graph = get_grid_graph(db)
+    from_coords = graph.coords(edge_data.from_node_id)
+    to_coords = graph.coords(edge_data.to_node_id)
+    if from_coords is None or to_coords is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    if abs(from_coords[0] - to_coords[0]) + abs(from_coords[1] - to_coords[1]) != 1:
+        raise HTTPException(status_code=400, detail="Nodes must be adjacent to block the edge between them")
+    if (edge_data.from_node_id, edge_data.to_node_id) in graph.blocked_pairs:
+        raise HTTPException(status_code=409, detail="Edge is already blocked")
+
+    # stored once with from < to, same as the csv data
+    from_id, to_id = sorted((edge_data.from_node_id, edge_data.to_node_id))
+    edge = BlockedEdge(from_node_id=from_id, to_node_id=to_id)
+    db.add(edge)
+    try:
+        db.commit()
+    except IntegrityError:
+        # a concurrent request blocked the same edge between our check and the insert -- the unique constraint caught it
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Edge is already blocked")
+    db.refresh(edge)
+
+    graph = block_edge(db, edge.id, from_id, to_id)
+    _repair_bot_routes(db, graph, from_id, to_id)
+
+    return BlockedEdgeResponse.model_validate(edge)
+
+
+@router.delete("/blocked-edges/{edge_id}", status_code=204)
+def delete_blocked_edge(edge_id: int, db: Session = Depends(get_db)):
+    # road reopened -- bots that now have a shorter way to their target get re-planned
+    edge = db.query(BlockedEdge).filter(BlockedEdge.id == edge_id).first()
+    if not edge:
+        raise HTTPException(status_code=404, detail="Blocked edge not found")
+
+    from_id, to_id = edge.from_node_id, edge.to_node_id
+    db.delete(edge)
+    db.commit()
+
+    graph = unblock_edge(db, edge_id, from_id, to_id)
+    _repair_bot_routes(db, graph, from_id, to_id)
+    return None
+
+
+def _repair_bot_routes(db: Session, graph: GridGraph, from_id: int, to_id: int):
+    replanned = get_simulation_service(db).repair_routes(graph, from_id, to_id)
+    logger.info(f"Edge {from_id}<->{to_id} changed (graph v{graph.version}), re-planned bots: {replanned}")
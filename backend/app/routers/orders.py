@@ -1,52 +1,158 @@
 # Order management endpoints
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime, timedelta
-
-from app.database import get_db
+import base64
+from concurrent.futures import TimeoutError as FuturesTimeout
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, tuple_
+from sqlalchemy.orm import Session, aliased
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from urllib.parse import urlencode
+
+from app.config import settings
+from app.database import get_db, SessionLocal
 from app.models import Order, Restaurant, Node, Bot
 from app.models.order import OrderStatus
 from app.models.bot import BotStatus
-from app.schemas import OrderCreate, OrderUpdate, OrderResponse, OrderStatusHistory
+from app.schemas import (
+    OrderCreate,
+    OrderUpdate,
+    OrderResponse,
+    OrderStatusHistory,
+    OrderBatchCreate,
+    OrderBatchItem,
+    OrderBatchResponse,
+)
 from app.routers.grid import to_address
+from app.services.admission import restaurant_admission
+from app.services.group_commit import GroupCommitQueue
+from app.services.order_events import order_events
+from app.services.simulation import get_simulation_service
 
 router = APIRouter()
 
-# restaurant throttle: max 3 orders created within a 30-second window
-RESTAURANT_MAX_ORDERS = 3
-RESTAURANT_WINDOW_SECONDS = 30
+# restaurant throttle: max 3 orders created within a 30-second window (services/admission.py keeps the windows)
+RESTAURANT_MAX_ORDERS = settings.MAX_RESTAURANT_ORDERS
+RESTAURANT_WINDOW_SECONDS = settings.RESTAURANT_WINDOW_SECONDS
+
+# how long a grouped-intake POST waits for the writer before giving up
+ORDER_INTAKE_TIMEOUT_SECONDS = 30
+
+# most orders one POST /api/orders/batch may carry
+ORDERS_MAX_BATCH = 500
+
+# biggest page GET /api/orders hands out -- walk further with the X-Next-Cursor header instead
+ORDERS_MAX_PAGE = 500
+
+
+# the two node joins need their own aliases
+PickupNode = aliased(Node)
+DeliveryNode = aliased(Node)
+
+
+def order_view_query(db: Session):
+    # everything OrderResponse needs in one select -- outer joins + plain columns, so listing n orders
+    # is one query instead of up to 4 lazy loads per order
+    return (
+        db.query(
+            Order.id,
+            Order.restaurant_id,
+            Restaurant.name.label("restaurant_name"),
+            Order.pickup_node_id,
+            PickupNode.x.label("pickup_x"),
+            PickupNode.y.label("pickup_y"),
+            Order.delivery_node_id,
+            DeliveryNode.x.label("delivery_x"),
+            DeliveryNode.y.label("delivery_y"),
+            Order.bot_id,
+            Bot.name.label("bot_name"),
+            Order.status,
+            Order.created_at,
+            Order.assigned_at,
+            Order.picked_up_at,
+            Order.delivered_at,
+        )
+        .outerjoin(Restaurant, Restaurant.id == Order.restaurant_id)
+        .outerjoin(PickupNode, PickupNode.id == Order.pickup_node_id)
+        .outerjoin(DeliveryNode, DeliveryNode.id == Order.delivery_node_id)
+        .outerjoin(Bot, Bot.id == Order.bot_id)
+    )
 
 
-def _order_response(o: Order) -> OrderResponse:
+def order_view_response(row) -> OrderResponse:
     # builds the response with the LR address format included for frontend display
     return OrderResponse(
-        id=o.id,
-        restaurant_id=o.restaurant_id,
-        restaurant_name=o.restaurant.name if o.restaurant else None,
-        pickup_node_id=o.pickup_node_id,
-        pickup_address=to_address(o.pickup_node.x, o.pickup_node.y) if o.pickup_node else "",
-        delivery_node_id=o.delivery_node_id,
-        delivery_address=to_address(o.delivery_node.x, o.delivery_node.y) if o.delivery_node else "",
-        bot_id=o.bot_id,
-        bot_name=o.bot.name if o.bot else None,
-        status=o.status,
-        created_at=o.created_at,
-        assigned_at=o.assigned_at,
-        picked_up_at=o.picked_up_at,
-        delivered_at=o.delivered_at,
+        id=row.id,
+        restaurant_id=row.restaurant_id,
+        restaurant_name=row.restaurant_name,
+        pickup_node_id=row.pickup_node_id,
+        pickup_address=to_address(row.pickup_x, row.pickup_y) if row.pickup_x is not None else "",
+        delivery_node_id=row.delivery_node_id,
+        delivery_address=to_address(row.delivery_x, row.delivery_y) if row.delivery_x is not None else "",
+        bot_id=row.bot_id,
+        bot_name=row.bot_name,
+        status=row.status,
+        created_at=row.created_at,
+        assigned_at=row.assigned_at,
+        picked_up_at=row.picked_up_at,
+        delivered_at=row.delivered_at,
     )
 
 
-# READ -- list orders with optional status filter
+def _order_response(db: Session, order_id: int) -> OrderResponse:
+    return order_view_response(order_view_query(db).filter(Order.id == order_id).one())
+
+
+def _not_modified(request: Request, response: Response) -> bool:
+    # order views carry an etag that changes with every order write -- a client that still polls gets a 304
+    # instead of the same list again. the path and query are part of it (params sorted, so their order
+    # doesn't matter): a filter, cursor or limit change is a different view with its own etag
+    query = urlencode(sorted(request.query_params.multi_items()))
+    etag = order_events.etag(f"{request.url.path}?{query}")
+    if etag is None:
+        return False
+    response.headers["ETag"] = etag
+    return request.headers.get("if-none-match") == etag
+
+
+def _encode_cursor(created_at: datetime, order_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{order_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    # opaque to clients -- it's just the (created_at, id) of the last order on the previous page
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# READ -- list orders newest first, with filters and keyset pagination:
+# pass the X-Next-Cursor header of one page as ?cursor= to get the next one (no header means last page)
 @router.get("", response_model=List[OrderResponse])
 def get_orders(
+    request: Request,
+    response: Response,
     status: Optional[str] = None,
+    restaurant_id: Optional[int] = None,
+    bot_id: Optional[int] = None,
+    delivery_node_id: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    query = db.query(Order)
+    if limit < 1 or limit > ORDERS_MAX_PAGE:
+        raise HTTPException(status_code=400, detail=f"Limit must be between 1 and {ORDERS_MAX_PAGE}")
+
+    if _not_modified(request, response):
+        return Response(status_code=304, headers=dict(response.headers))
+
+    query = order_view_query(db)
 
     if status:
         try:
@@ -54,33 +160,62 @@ def get_orders(
             query = query.filter(Order.status == status_enum)
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
-
-    orders = query.order_by(Order.created_at.desc()).limit(limit).all()
-    return [_order_response(o) for o in orders]
+    if restaurant_id is not None:
+        query = query.filter(Order.restaurant_id == restaurant_id)
+    if bot_id is not None:
+        query = query.filter(Order.bot_id == bot_id)
+    if delivery_node_id is not None:
+        query = query.filter(Order.delivery_node_id == delivery_node_id)
+    if created_after is not None:
+        query = query.filter(Order.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(Order.created_at < created_before)
+    if cursor:
+        # seek past the previous page instead of OFFSET, so page 1000 costs the same as page 1
+        query = query.filter(tuple_(Order.created_at, Order.id) < _decode_cursor(cursor))
+
+    # one extra row tells us whether there's another page
+    rows = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [order_view_response(row) for row in rows]
+
+
+def _throttle_detail(restaurant_name: str, recent_count: int) -> str:
+    return (
+        f"Restaurant '{restaurant_name}' has received {recent_count} "
+        f"orders in the last {RESTAURANT_WINDOW_SECONDS}s. "
+        f"Max {RESTAURANT_MAX_ORDERS} allowed — please wait."
+    )
 
 
 # CREATE -- place a new order at a restaurant
 @router.post("", response_model=OrderResponse, status_code=201)
 def create_order(order_data: OrderCreate, db: Session = Depends(get_db)):
+    if settings.ORDER_INTAKE_MODE == "grouped":
+        # same checks and response, but the insert/commit/assignment is shared with whatever else is queued
+        future = order_intake.submit(order_data)
+        try:
+            result = future.result(timeout=ORDER_INTAKE_TIMEOUT_SECONDS)
+        except FuturesTimeout:
+            # only give up if the writer hasn't picked it up yet -- otherwise it's being committed right now,
+            # and a 503 would make the client retry into a duplicate order
+            if future.cancel():
+                raise HTTPException(status_code=503, detail="Order intake is backed up, please retry")
+            result = future.result()
+        if result.order is None:
+            raise HTTPException(status_code=result.status_code, detail=result.detail)
+        return result.order
+
     restaurant = db.query(Restaurant).filter(Restaurant.id == order_data.restaurant_id).first()
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
 
     # restaurant rate limit: max 3 orders per 30s window — doesn't matter if orders got delivered or cancelled, the cooldown still applies
-    window_start = datetime.utcnow() - timedelta(seconds=RESTAURANT_WINDOW_SECONDS)
-    recent_count = db.query(Order).filter(
-        Order.restaurant_id == restaurant.id,
-        Order.created_at >= window_start,
-    ).count()
+    recent_count = restaurant_admission.count(restaurant.id)
     if recent_count >= RESTAURANT_MAX_ORDERS:
-        raise HTTPException(
-            status_code=429,
-            detail=(
-                f"Restaurant '{restaurant.name}' has received {recent_count} "
-                f"orders in the last {RESTAURANT_WINDOW_SECONDS}s. "
-                f"Max {RESTAURANT_MAX_ORDERS} allowed — please wait."
-            ),
-        )
+        raise HTTPException(status_code=429, detail=_throttle_detail(restaurant.name, recent_count))
 
     delivery_node = db.query(Node).filter(Node.id == order_data.delivery_node_id).first()
     if not delivery_node:
@@ -88,6 +223,11 @@ def create_order(order_data: OrderCreate, db: Session = Depends(get_db)):
     if not delivery_node.is_delivery_point:
         raise HTTPException(status_code=400, detail="Selected node is not a valid delivery point")
 
+    # check-and-record in one step, so two requests racing for the last slot can't both get it
+    admitted, recent_count = restaurant_admission.try_admit(restaurant.id)
+    if not admitted:
+        raise HTTPException(status_code=429, detail=_throttle_detail(restaurant.name, recent_count))
+
     order = Order(
         restaurant_id=restaurant.id,
         pickup_node_id=restaurant.node_id,
@@ -95,92 +235,247 @@ def create_order(order_data: OrderCreate, db: Session = Depends(get_db)):
         status=OrderStatus.PENDING,
     )
 
-    db.add(order)
-    db.commit()
+    try:
+        db.add(order)
+        db.commit()
+    except Exception:
+        # the order never got stored, so it shouldn't keep the restaurant's slot
+        db.rollback()
+        restaurant_admission.release(restaurant.id)
+        raise
     db.refresh(order)
 
-    # try to assign a bot right away so the user doesn't have to wait for the next tick
+    # hand it to the simulation engine, then try to assign a bot right away so the user doesn't have to wait for the next tick
+    get_simulation_service(db).add_order(order)
     try_assign_order(order, db)
 
-    return _order_response(order)
+    return _order_response(db, order.id)
+
+
+def _ingest_orders(db: Session, items: List[OrderCreate]) -> List[OrderBatchItem]:
+    # shared by the batch endpoint and the group-commit intake: the same checks, in the same order, as a single
+    # POST /api/orders, with the restaurant window applied across the whole set -- then one insert, one commit
+    # and one assignment pass. every item gets its own result
+    restaurant_ids = {o.restaurant_id for o in items}
+    restaurants = {
+        r.id: r for r in db.query(Restaurant.id, Restaurant.name, Restaurant.node_id).filter(Restaurant.id.in_(restaurant_ids))
+    }
+    delivery_points = dict(
+        db.query(Node.id, Node.is_delivery_point).filter(Node.id.in_({o.delivery_node_id for o in items}))
+    )
+
+    results: List[OrderBatchItem] = []
+    accepted: List[Tuple[int, Dict]] = []
+    for index, item in enumerate(items):
+        restaurant = restaurants.get(item.restaurant_id)
+        if restaurant is None:
+            results.append(OrderBatchItem(index=index, status_code=404, detail="Restaurant not found"))
+            continue
+        # earlier items in the set count against the window just like already-stored orders
+        recent_count = restaurant_admission.count(restaurant.id)
+        if recent_count >= RESTAURANT_MAX_ORDERS:
+            results.append(OrderBatchItem(index=index, status_code=429, detail=_throttle_detail(restaurant.name, recent_count)))
+            continue
+        if item.delivery_node_id not in delivery_points:
+            results.append(OrderBatchItem(index=index, status_code=404, detail="Delivery node not found"))
+            continue
+        if not delivery_points[item.delivery_node_id]:
+            results.append(OrderBatchItem(index=index, status_code=400, detail="Selected node is not a valid delivery point"))
+            continue
+        admitted, recent_count = restaurant_admission.try_admit(restaurant.id)
+        if not admitted:
+            results.append(OrderBatchItem(index=index, status_code=429, detail=_throttle_detail(restaurant.name, recent_count)))
+            continue
+
+        results.append(OrderBatchItem(index=index, status_code=201))
+        accepted.append((index, {
+            "restaurant_id": restaurant.id,
+            "pickup_node_id": restaurant.node_id,
+            "delivery_node_id": item.delivery_node_id,
+            "status": OrderStatus.PENDING,
+        }))
+
+    if accepted:
+        # one multi-row insert, ids back in submission order
+        try:
+            order_ids = list(db.scalars(
+                insert(Order).returning(Order.id, sort_by_parameter_order=True),
+                [row for _, row in accepted],
+            ))
+            db.commit()
+        except Exception:
+            # nothing got stored (for the group-commit intake: the whole batch fails) -- give every slot back
+            db.rollback()
+            for _, row in accepted:
+                restaurant_admission.release(row["restaurant_id"])
+            raise
+
+        service = get_simulation_service(db)
+        service.add_orders(db.query(Order).filter(Order.id.in_(order_ids)).order_by(Order.id).all())
+        if service.assign_least_loaded(order_ids):
+            service.flush(db)
+
+        views = {row.id: order_view_response(row) for row in order_view_query(db).filter(Order.id.in_(order_ids))}
+        for (index, _), order_id in zip(accepted, order_ids):
+            results[index].order = views[order_id]
+
+    return results
+
+
+# ORDER_INTAKE_MODE=grouped: single POSTs are queued and written together by one writer thread
+order_intake = GroupCommitQueue(
+    _ingest_orders,
+    SessionLocal,
+    max_batch=settings.ORDER_INTAKE_MAX_BATCH,
+    max_wait_seconds=settings.ORDER_INTAKE_MAX_WAIT_MS / 1000,
+)
+
+
+# CREATE -- a burst of orders in one request, each with its own result
+@router.post("/batch", response_model=OrderBatchResponse)
+def create_orders_batch(batch: OrderBatchCreate, db: Session = Depends(get_db)):
+    if not batch.orders or len(batch.orders) > ORDERS_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"A batch must carry between 1 and {ORDERS_MAX_BATCH} orders")
+
+    results = _ingest_orders(db, batch.orders)
+    created = sum(1 for r in results if r.order is not None)
+    return OrderBatchResponse(created=created, rejected=len(results) - created, results=results)
+
+
+def _status_snapshot() -> Dict:
+    # what a new order stream subscriber starts from -- the status of every active order, one column query
+    db = SessionLocal()
+    try:
+        active = db.query(Order.id, Order.status, Order.bot_id).filter(
+            Order.status.in_([OrderStatus.PENDING, OrderStatus.ASSIGNED, OrderStatus.PICKED_UP])
+        ).order_by(Order.id).all()
+        return {
+            "seq": order_events.broadcaster.last_seq,
+            "orders": [{"order_id": i, "status": s.value, "bot_id": b} for i, s, b in active],
+        }
+    finally:
+        db.close()
+
+
+@router.get("/stream")
+async def stream_order_status(request: Request):
+    # server-sent events: active order statuses, then a "status" event per batch of transitions
+    # ({order_id, old_status, new_status, bot_id, changed_at}) -- replaces polling the list or /history
+    broadcaster = order_events.broadcaster
+    queue = broadcaster.subscribe()
+
+    async def snapshot():
+        return await run_in_threadpool(_status_snapshot)
+
+    async def events():
+        try:
+            async for frame in broadcaster.stream(queue, snapshot, request.is_disconnected):
+                yield frame
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # READ -- get a single order by id
 @router.get("/{order_id}", response_model=OrderResponse)
 def get_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
+    row = order_view_query(db).filter(Order.id == order_id).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Order not found")
-    return _order_response(order)
+    return order_view_response(row)
 
 
 # UPDATE -- change delivery location (only while pending) or update status
 @router.put("/{order_id}", response_model=OrderResponse)
 def update_order(order_id: int, update_data: OrderUpdate, db: Session = Depends(get_db)):
-    # only pending orders can change delivery location, and delivered/cancelled orders can't be touched at all
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-
-    if update_data.delivery_node_id is not None:
-        if order.status != OrderStatus.PENDING:
-            raise HTTPException(
-                status_code=400,
-                detail="Can only change delivery location for PENDING orders",
-            )
-        delivery_node = db.query(Node).filter(Node.id == update_data.delivery_node_id).first()
-        if not delivery_node:
-            raise HTTPException(status_code=404, detail="Delivery node not found")
-        if not delivery_node.is_delivery_point:
-            raise HTTPException(status_code=400, detail="Selected node is not a valid delivery point")
-        order.delivery_node_id = delivery_node.id
-
-    if update_data.status is not None:
-        if order.status in (OrderStatus.DELIVERED, OrderStatus.CANCELLED):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Cannot update order with status {order.status.value}",
-            )
-        order.status = OrderStatus(update_data.status.value)
+    # only pending orders can change delivery location, and delivered/cancelled orders can't be touched at all.
+    # the engine lock is held from the read to the sync, so no tick or background flush can slip in between
+    # and write its older copy of the order over ours
+    service = get_simulation_service(db)
+    with service.lock:
+        # whatever the engine hasn't written yet goes first, so the checks below see the real status
+        service.flush(db)
+        order = db.query(Order).filter(Order.id == order_id).first()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+
+        if update_data.delivery_node_id is not None:
+            if order.status != OrderStatus.PENDING:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Can only change delivery location for PENDING orders",
+                )
+            delivery_node = db.query(Node).filter(Node.id == update_data.delivery_node_id).first()
+            if not delivery_node:
+                raise HTTPException(status_code=404, detail="Delivery node not found")
+            if not delivery_node.is_delivery_point:
+                raise HTTPException(status_code=400, detail="Selected node is not a valid delivery point")
+            order.delivery_node_id = delivery_node.id
+
+        if update_data.status is not None:
+            if order.status in (OrderStatus.DELIVERED, OrderStatus.CANCELLED):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Cannot update order with status {order.status.value}",
+                )
+            order.status = OrderStatus(update_data.status.value)
 
-    db.commit()
-    db.refresh(order)
-    return _order_response(order)
+        db.commit()
+        db.refresh(order)
+        service.sync_order(order)
+    return _order_response(db, order.id)
 
 
 # DELETE -- cancel an order (only if it hasn't been picked up yet)
 @router.delete("/{order_id}", status_code=204)
 def cancel_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+    # same as update_order: read, check, commit and sync all under the engine lock
+    service = get_simulation_service(db)
+    with service.lock:
+        service.flush(db)
+        order = db.query(Order).filter(Order.id == order_id).first()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+
+        if order.status not in [OrderStatus.PENDING, OrderStatus.ASSIGNED]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot cancel order with status {order.status.value}",
+            )
 
-    if order.status not in [OrderStatus.PENDING, OrderStatus.ASSIGNED]:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot cancel order with status {order.status.value}",
-        )
+        # if this was the bot's only active order, free it up so it can take new ones
+        freed_bot = None
+        if order.bot_id:
+            other_orders = db.query(Order).filter(
+                Order.bot_id == order.bot_id,
+                Order.id != order.id,
+                Order.status.in_([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP]),
+            ).count()
+
+            if other_orders == 0:
+                freed_bot = db.query(Bot).filter(Bot.id == order.bot_id).first()
+                if freed_bot:
+                    freed_bot.status = BotStatus.IDLE
+
+        order.status = OrderStatus.CANCELLED
+        db.commit()
 
-    # if this was the bot's only active order, free it up so it can take new ones
-    if order.bot_id:
-        other_orders = db.query(Order).filter(
-            Order.bot_id == order.bot_id,
-            Order.id != order.id,
-            Order.status.in_([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP]),
-        ).count()
-
-        if other_orders == 0:
-            bot = db.query(Bot).filter(Bot.id == order.bot_id).first()
-            if bot:
-                bot.status = BotStatus.IDLE
-
-    order.status = OrderStatus.CANCELLED
-    db.commit()
+        service.sync_order(order)
+        if freed_bot:
+            service.sync_bot(freed_bot)
     return None
 
 
 @router.get("/{order_id}/history", response_model=List[OrderStatusHistory])
-def get_order_history(order_id: int, db: Session = Depends(get_db)):
+def get_order_history(order_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    if _not_modified(request, response):
+        return Response(status_code=304, headers=dict(response.headers))
+
     order = db.query(Order).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -204,39 +499,13 @@ def get_order_history(order_id: int, db: Session = Depends(get_db)):
 
 
 def try_assign_order(order: Order, db: Session) -> bool:
-    # tries to immediately assign the order to the least-loaded idle/moving bot so it doesn't have to wait for the next simulation tick
-    bots = db.query(Bot).filter(
-        Bot.status.in_([BotStatus.IDLE, BotStatus.MOVING])
-    ).all()
-
-    best_bot = None
-    best_load = float('inf')
-
-    for bot in bots:
-        current_orders = db.query(Order).filter(
-            Order.bot_id == bot.id,
-            Order.status.in_([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP]),
-        ).count()
-
-        # strictly respect the bot's capacity limit
-        if current_orders >= bot.max_capacity:
-            continue
-
-        # prefer the bot with the fewest active orders to spread the load evenly
-        if current_orders < best_load:
-            best_load = current_orders
-            best_bot = bot
-
-    if best_bot:
-        order.bot_id = best_bot.id
-        order.status = OrderStatus.ASSIGNED
-        order.assigned_at = datetime.utcnow()
-
-        if best_bot.status == BotStatus.IDLE:
-            best_bot.status = BotStatus.MOVING
-
-        db.commit()
-        return True
+    # tries to immediately assign the order to the least-loaded idle/moving bot so it doesn't have to wait for the next simulation tick.
+    # the engine owns bot load in memory, so it makes the pick and we just flush its change through this request's session
+    service = get_simulation_service(db)
+    assigned = service.try_assign_least_loaded(order.id)
+    if assigned:
+        service.flush(db)
+        db.refresh(order)
 
     # no bot available right now -- stays PENDING until the simulation assigns it
-    return False
+    return assigned
@@ -1,15 +1,32 @@
 # Simulation control endpoints for live bot movement tracking
 
-from fastapi import APIRouter, Depends
+import threading
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_db, SessionLocal
 from app.models import Order, Bot
 from app.models.order import OrderStatus
 from app.models.bot import BotStatus
-from app.schemas import SimulationStatus, BotResponse
-from app.services.simulation import SimulationService
+from app.schemas import SimulationStatus, BotResponse, HeadlessRunRequest
+from app.routers.grid import to_address
+from app.services.broadcaster import DeltaBroadcaster
+from app.services.fleet_state import BotState, OrderState
+from app.services.order_events import order_events
+from app.services.headless import OrderArrival, fresh_fleet, run_headless, snapshot_fleet
+from app.services.simulation import (
+    SimulationService,
+    add_service_listener,
+    get_simulation_service,
+    peek_simulation_service,
+    reset_simulation_service,
+)
+from app.services.grid_graph import get_grid_graph
+from app.services.ticker import SimulationTicker
 
 router = APIRouter()
 
@@ -18,11 +35,179 @@ simulation_state = {
     "tick_count": 0
 }
 
-_simulation_service = None
+
+def advance_simulation(db: Session) -> Dict:
+    # one tick = assign orders -> calculate routes -> move bots -> handle pickups/deliveries
+    results = get_simulation_service(db).tick(db)
+    simulation_state["tick_count"] += 1
+    return results
+
+
+def _background_tick():
+    # the tick loop runs outside any request, so it opens (and closes) its own session
+    db = SessionLocal()
+    try:
+        advance_simulation(db)
+    finally:
+        db.close()
+
+
+# bound to the event loop in the app lifespan; /start and /stop just start and stop its task
+ticker = SimulationTicker(_background_tick, settings.SIMULATION_TICK_INTERVAL, settings.SIMULATION_SPEED)
+
+# live dashboard feed (GET /stream) -- also bound to the event loop in the lifespan
+live_updates = DeltaBroadcaster()
+
+# order counters for the status panel, kept up to date from the deltas so streaming viewers never hit the db.
+# loaded from the db by the first snapshot, dropped whenever nobody is watching or the simulation resets
+_live_lock = threading.Lock()
+_live_counts: Dict = {"ready": False, "total": 0, "pending": 0, "delivered": 0}
+_live_order_status: Dict[int, OrderStatus] = {}
+
+
+def _bot_position(service: SimulationService, bot: BotState, active_counts: Dict[int, int]) -> Dict:
+    route = list(service.get_bot_route(bot.id))
+    target = service.get_bot_target(bot.id)
+    plan = service.get_bot_plan(bot.id)
+    coords = service.graph.coords(bot.current_node_id) if bot.current_node_id else None
+
+    return {
+        "id": bot.id,
+        "name": bot.name,
+        "status": bot.status.value,
+        "current_node_id": bot.current_node_id,
+        "x": coords[0] if coords else None,
+        "y": coords[1] if coords else None,
+        "route": route,
+        "target": {
+            "node_id": target[0] if target else None,
+            "action": target[1] if target else None,
+            "order_id": target[2] if target else None
+        } if target else None,
+        "plan": [
+            {"node_id": node_id, "action": action, "order_id": order_id}
+            for node_id, action, order_id in plan
+        ],
+        "active_orders": active_counts.get(bot.id, 0)
+    }
+
+
+def _order_view(service: SimulationService, order: OrderState) -> Dict:
+    # same shape as OrderResponse, built from engine memory + the graph instead of lazy-loaded relationships
+    graph = service.graph
+    restaurant_name = next((name for rid, name, _ in graph.restaurants if rid == order.restaurant_id), None)
+    pickup = graph.coords(order.pickup_node_id)
+    delivery = graph.coords(order.delivery_node_id)
+    bot = service.bots.get(order.bot_id) if order.bot_id is not None else None
+
+    return {
+        "id": order.id,
+        "restaurant_id": order.restaurant_id,
+        "restaurant_name": restaurant_name,
+        "pickup_node_id": order.pickup_node_id,
+        "pickup_address": to_address(*pickup) if pickup else "",
+        "delivery_node_id": order.delivery_node_id,
+        "delivery_address": to_address(*delivery) if delivery else "",
+        "bot_id": order.bot_id,
+        "bot_name": bot.name if bot else None,
+        "status": order.status.value,
+        "created_at": order.created_at,
+        "assigned_at": order.assigned_at,
+        "picked_up_at": order.picked_up_at,
+        "delivered_at": order.delivered_at,
+    }
+
+
+def _live_status(service: SimulationService) -> Optional[Dict]:
+    if not _live_counts["ready"]:
+        return None
+    return {
+        "is_running": simulation_state["is_running"],
+        "tick_count": service.tick_count,
+        "total_orders": _live_counts["total"],
+        "pending_orders": _live_counts["pending"],
+        "delivered_orders": _live_counts["delivered"],
+        "active_bots": sum(1 for b in service.bots.values() if b.status != BotStatus.IDLE),
+    }
 
 
-def get_simulation_service(db: Session) -> SimulationService:
-    return SimulationService(db)
+def _track_order(order: OrderState):
+    # bumps the status panel counters for one order transition
+    previous = _live_order_status.pop(order.id, None)
+    if previous is None and order.is_active:
+        _live_counts["total"] += 1
+    if previous == OrderStatus.PENDING:
+        _live_counts["pending"] -= 1
+    if order.status == OrderStatus.PENDING:
+        _live_counts["pending"] += 1
+    if order.status == OrderStatus.DELIVERED and previous is not None:
+        _live_counts["delivered"] += 1
+    if order.is_active:
+        _live_order_status[order.id] = order.status
+
+
+def _publish_changes(service: SimulationService, bots: List[BotState], orders: List[OrderState]):
+    # engine listener -- runs once per flush/http hook, under the engine lock, whatever the viewer count
+    with _live_lock:
+        if not live_updates.has_subscribers:
+            _live_counts["ready"] = False
+            return
+        if _live_counts["ready"]:
+            for order in orders:
+                _track_order(order)
+
+        active_counts = service.active_order_counts()
+        live_updates.publish("delta", {
+            "tick": service.tick_count,
+            "bots": [_bot_position(service, bot, active_counts) for bot in bots],
+            "orders": [_order_view(service, order) for order in orders],
+            "status": _live_status(service),
+        })
+
+
+add_service_listener(_publish_changes)
+
+
+def _publish_status_change():
+    # start/stop don't touch the engine, so nudge viewers with an empty delta carrying the new status
+    service = peek_simulation_service()
+    if service is not None:
+        with service.lock:
+            _publish_changes(service, [], [])
+
+
+def _live_snapshot() -> Dict:
+    # what a new (or resyncing) viewer starts from -- the only db work a viewer ever causes
+    db = SessionLocal()
+    try:
+        service = get_simulation_service(db)
+        with service.lock, _live_lock:
+            if not _live_counts["ready"]:
+                status = get_simulation_status(db)
+                _live_counts.update(
+                    ready=True,
+                    total=status.total_orders,
+                    pending=status.pending_orders,
+                    delivered=status.delivered_orders,
+                )
+                _live_order_status.clear()
+                _live_order_status.update({o.id: o.status for o in service.orders.values() if o.is_active})
+
+            active_counts = service.active_order_counts()
+            recent = db.query(Order).order_by(Order.created_at.desc()).limit(100).all()
+            return {
+                "seq": live_updates.last_seq,
+                "tick": service.tick_count,
+                "bots": [_bot_position(service, bot, active_counts) for bot in sorted(service.bots.values(), key=lambda b: b.id)],
+                # memory is ahead of the db for in-flight orders, so prefer the engine's copy where it has one
+                "orders": [
+                    _order_view(service, service.orders.get(o.id) or OrderState.from_model(o))
+                    for o in recent
+                ],
+                "status": _live_status(service),
+            }
+    finally:
+        db.close()
 
 
 @router.get("/status", response_model=SimulationStatus)
@@ -44,34 +229,45 @@ def get_simulation_status(db: Session = Depends(get_db)):
 
 
 @router.post("/start")
-def start_simulation():
+def start_simulation(speed: Optional[float] = None):
+    # kicks off the server-side tick loop -- optional speed multiplier on top of SIMULATION_TICK_INTERVAL
+    if speed is not None and speed <= 0:
+        raise HTTPException(status_code=400, detail="Speed must be greater than 0")
+
     simulation_state["is_running"] = True
-    return {"message": "Simulation started", "is_running": True}
+    ticker.start(speed)
+    _publish_status_change()
+    return {"message": "Simulation started", "is_running": True, "speed": ticker.speed}
 
 
 @router.post("/stop")
 def stop_simulation():
     simulation_state["is_running"] = False
+    ticker.stop()
+    _publish_status_change()
     return {"message": "Simulation stopped", "is_running": False}
 
 
+@router.get("/metrics")
+def get_tick_metrics():
+    # tick-lag numbers from the background loop -- handy for spotting an overloaded engine
+    return ticker.metrics()
+
+
 @router.post("/reset")
 def reset_simulation(db: Session = Depends(get_db)):
     # wipes the slate clean -- cancels in-flight orders, resets bots to idle at start position
     simulation_state["is_running"] = False
+    # stop() waits out a tick that's still running, so it can't write over the reset below
+    ticker.stop()
     simulation_state["tick_count"] = 0
-
-    # clear the restaurant cooldown tracking and tick counter too
-    SimulationService._tick_counter = 0
-    SimulationService._restaurant_order_log = {}
+    ticker.reset_metrics()
 
     db.query(Order).filter(
         Order.status.in_([OrderStatus.PENDING, OrderStatus.ASSIGNED, OrderStatus.PICKED_UP])
     ).update({Order.status: OrderStatus.CANCELLED}, synchronize_session=False)
 
-    from app.models import Node
-    start_node = db.query(Node).filter(Node.x == 4, Node.y == 3).first()
-    start_node_id = start_node.id if start_node else None
+    start_node_id = get_grid_graph(db).station_node_id()
 
     db.query(Bot).update({
         Bot.status: BotStatus.IDLE,
@@ -80,23 +276,22 @@ def reset_simulation(db: Session = Depends(get_db)):
 
     db.commit()
 
+    # drop the in-memory engine (routes, targets, restaurant cooldowns, tick counter) -- it reloads from the db on next use
+    reset_simulation_service()
+    # and every live viewer starts over from a fresh snapshot
+    with _live_lock:
+        _live_counts["ready"] = False
+    live_updates.resync_all()
+    # the bulk cancel above bypasses the engine, so order feed subscribers start over too
+    order_events.resync()
+
     return {"message": "Simulation reset", "is_running": False, "tick_count": 0}
 
 
 @router.post("/tick")
 def simulation_tick(db: Session = Depends(get_db)):
-    # one tick = assign orders -> calculate routes -> move bots -> handle pickups/deliveries
-    if not simulation_state["is_running"]:
-        return {
-            "message": "Simulation is not running",
-            "tick": simulation_state["tick_count"],
-            "results": None
-        }
-
-    service = get_simulation_service(db)
-    results = service.tick()
-
-    simulation_state["tick_count"] += 1
+    # manual stepping -- advances exactly one tick, whether or not the background loop is running
+    results = advance_simulation(db)
 
     return {
         "message": "Tick processed",
@@ -105,36 +300,67 @@ def simulation_tick(db: Session = Depends(get_db)):
     }
 
 
+@router.post("/run")
+def run_simulation_headless(request: HeadlessRunRequest, db: Session = Depends(get_db)):
+    # fast-forwards a what-if run entirely in memory and returns KPIs -- never touches the live engine or the db
+    if request.ticks < 1 or request.ticks > settings.HEADLESS_MAX_TICKS:
+        raise HTTPException(status_code=400, detail=f"Ticks must be between 1 and {settings.HEADLESS_MAX_TICKS}")
+
+    graph = get_grid_graph(db)
+    try:
+        if request.bots is None:
+            bots, orders = snapshot_fleet(db)
+        else:
+            bots = fresh_fleet(graph, [(b.node_id, b.max_capacity) for b in request.bots])
+            orders = []
+
+        arrivals = [OrderArrival(o.tick, o.restaurant_id, o.delivery_node_id) for o in request.orders]
+        return run_headless(
+            graph,
+            bots,
+            arrivals,
+            request.ticks,
+            orders=orders,
+            dispatch_mode=request.dispatch_mode,
+            collision_avoidance=request.collision_avoidance,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
 @router.get("/bots/positions")
 def get_bot_positions(db: Session = Depends(get_db)):
-    # real-time bot positions, routes, and targets for the frontend map display
+    # real-time bot positions, routes, and targets for the frontend map display -- served from engine memory
     service = get_simulation_service(db)
-    bots = db.query(Bot).all()
-
-    positions = []
-    for bot in bots:
-        route = service.get_bot_route(bot.id)
-        target = service.get_bot_target(bot.id)
-
-        active_orders = db.query(Order).filter(
-            Order.bot_id == bot.id,
-            Order.status.in_([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP])
-        ).count()
-
-        positions.append({
-            "id": bot.id,
-            "name": bot.name,
-            "status": bot.status.value,
-            "current_node_id": bot.current_node_id,
-            "x": bot.current_node.x if bot.current_node else None,
-            "y": bot.current_node.y if bot.current_node else None,
-            "route": route,
-            "target": {
-                "node_id": target[0] if target else None,
-                "action": target[1] if target else None,
-                "order_id": target[2] if target else None
-            } if target else None,
-            "active_orders": active_orders
-        })
+
+    with service.lock:
+        active_counts = service.active_order_counts()
+        positions = [
+            _bot_position(service, bot, active_counts)
+            for bot in sorted(service.bots.values(), key=lambda b: b.id)
+        ]
 
     return {"bots": positions, "tick": simulation_state["tick_count"]}
+
+
+@router.get("/stream")
+async def stream_simulation(request: Request):
+    # server-sent events: one full snapshot, then a delta per tick (moved bots, status changes, order transitions).
+    # deltas are built once per tick and shared by every viewer, so more screens don't mean more queries
+    queue = live_updates.subscribe()
+
+    async def snapshot():
+        return await run_in_threadpool(_live_snapshot)
+
+    async def events():
+        try:
+            async for frame in live_updates.stream(queue, snapshot, request.is_disconnected):
+                yield frame
+        finally:
+            live_updates.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -4,10 +4,18 @@ from app.schemas.enums import OrderStatusEnum, BotStatusEnum
 from app.schemas.node import NodeBase, NodeResponse
 from app.schemas.restaurant import RestaurantResponse
 from app.schemas.bot import BotResponse
-from app.schemas.blocked_edge import BlockedEdgeResponse
-from app.schemas.order import OrderCreate, OrderUpdate, OrderResponse, OrderStatusHistory
+from app.schemas.blocked_edge import BlockedEdgeResponse, BlockedEdgeCreate
+from app.schemas.order import (
+    OrderCreate,
+    OrderUpdate,
+    OrderResponse,
+    OrderStatusHistory,
+    OrderBatchCreate,
+    OrderBatchItem,
+    OrderBatchResponse,
+)
 from app.schemas.grid import GridResponse
-from app.schemas.simulation import SimulationStatus
+from app.schemas.simulation import SimulationStatus, HeadlessBot, ScriptedOrder, HeadlessRunRequest
 
 __all__ = [
     "OrderStatusEnum",
@@ -17,10 +25,17 @@ __all__ = [
     "RestaurantResponse",
     "BotResponse",
     "BlockedEdgeResponse",
+    "BlockedEdgeCreate",
     "OrderCreate",
     "OrderUpdate",
     "OrderResponse",
     "OrderStatusHistory",
+    "OrderBatchCreate",
+    "OrderBatchItem",
+    "OrderBatchResponse",
     "GridResponse",
     "SimulationStatus",
+    "HeadlessBot",
+    "ScriptedOrder",
+    "HeadlessRunRequest",
 ]
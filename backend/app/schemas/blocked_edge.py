@@ -10,3 +10,8 @@ class BlockedEdgeResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class BlockedEdgeCreate(BaseModel):
+    from_node_id: int
+    to_node_id: int
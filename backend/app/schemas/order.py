@@ -1,7 +1,7 @@
 # Order schemas covering creation, updates, and status tracking
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from app.schemas.enums import OrderStatusEnum
 
@@ -11,6 +11,10 @@ class OrderCreate(BaseModel):
     delivery_node_id: int
 
 
+class OrderBatchCreate(BaseModel):
+    orders: List[OrderCreate]
+
+
 class OrderUpdate(BaseModel):
     delivery_node_id: Optional[int] = None
     status: Optional[OrderStatusEnum] = None
@@ -36,6 +40,20 @@ class OrderResponse(BaseModel):
         from_attributes = True
 
 
+class OrderBatchItem(BaseModel):
+    # one per submitted order, in submission order -- status_code is what a single POST would have returned
+    index: int
+    status_code: int
+    order: Optional[OrderResponse] = None
+    detail: Optional[str] = None
+
+
+class OrderBatchResponse(BaseModel):
+    created: int
+    rejected: int
+    results: List[OrderBatchItem]
+
+
 class OrderStatusHistory(BaseModel):
     id: int
     order_id: int
@@ -1,6 +1,7 @@
 # real-time simulation status snapshot -- the frontend polls this to show live delivery progress
 
 from pydantic import BaseModel
+from typing import List, Optional
 
 
 class SimulationStatus(BaseModel):
@@ -10,3 +11,25 @@ class SimulationStatus(BaseModel):
     pending_orders: int
     delivered_orders: int
     active_bots: int
+
+
+class HeadlessBot(BaseModel):
+    # a hypothetical bot for a sizing run -- starts at the station with the default capacity unless told otherwise
+    node_id: Optional[int] = None
+    max_capacity: Optional[int] = None
+
+
+class ScriptedOrder(BaseModel):
+    tick: int
+    restaurant_id: int
+    delivery_node_id: int
+
+
+class HeadlessRunRequest(BaseModel):
+    ticks: int
+    orders: List[ScriptedOrder] = []
+    # leave out to start from the current fleet (and its in-flight orders)
+    bots: Optional[List[HeadlessBot]] = None
+    dispatch_mode: Optional[str] = None
+    # leave out to use the server's COLLISION_AVOIDANCE setting
+    collision_avoidance: Optional[bool] = None
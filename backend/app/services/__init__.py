@@ -1,4 +1,5 @@
+from app.services.grid_graph import GridGraph
 from app.services.pathfinding import PathfindingService
 from app.services.simulation import SimulationService
 
-__all__ = ["PathfindingService", "SimulationService"]
+__all__ = ["GridGraph", "PathfindingService", "SimulationService"]
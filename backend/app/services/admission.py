@@ -0,0 +1,100 @@
+# restaurant admission control -- "at most N orders per restaurant in any window", kept in memory.
+# one deque of admission timestamps per restaurant: new ones go on the right, expired ones fall off the left,
+# so a check is O(1) amortized instead of a COUNT query or re-filtering a whole list.
+# the clock is pluggable: wall-clock seconds for the http api, the tick counter for the simulation engine
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Hashable, Iterable, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Order
+
+
+class SlidingWindowLimiter:
+    # check-and-record happens under one lock, so concurrent requests can't both squeeze into the last slot
+
+    def __init__(self, limit: int, window: float, clock: Callable[[], float] = time.time):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self._windows: Dict[Hashable, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def _trimmed(self, key: Hashable, now: float) -> Deque[float]:
+        stamps = self._windows.get(key)
+        if stamps is None:
+            stamps = self._windows[key] = deque()
+        while stamps and now - stamps[0] >= self.window:
+            stamps.popleft()
+        return stamps
+
+    def count(self, key: Hashable) -> int:
+        # how many admissions are still inside the window right now
+        with self._lock:
+            return len(self._trimmed(key, self.clock()))
+
+    def room(self, key: Hashable) -> int:
+        return max(self.limit - self.count(key), 0)
+
+    def try_admit(self, key: Hashable) -> Tuple[bool, int]:
+        # records an admission if there's room -- returns (admitted, count in the window before this call)
+        with self._lock:
+            now = self.clock()
+            stamps = self._trimmed(key, now)
+            recent = len(stamps)
+            if recent >= self.limit:
+                return False, recent
+            stamps.append(now)
+            return True, recent
+
+    def record(self, key: Hashable):
+        # unconditional admission (the caller already decided) -- still counts against later checks
+        with self._lock:
+            now = self.clock()
+            self._trimmed(key, now).append(now)
+
+    def release(self, key: Hashable):
+        # hands back a slot whose order never got stored (failed insert/commit). drops the newest admission --
+        # under concurrency that may be someone else's, but the count comes out right and the window only
+        # frees up later than it should, never earlier
+        with self._lock:
+            stamps = self._windows.get(key)
+            if stamps:
+                stamps.pop()
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+
+    def restore(self, entries: Dict[Hashable, Iterable[float]]):
+        # merges admissions recorded elsewhere (see warm_from_db) into the windows
+        with self._lock:
+            for key, stamps in entries.items():
+                merged = sorted(list(self._windows.get(key, ())) + list(stamps))
+                self._windows[key] = deque(merged)
+
+
+# the http api's window (POST /api/orders, /orders/batch, grouped intake) -- wall-clock seconds.
+# per process: with several api workers each one enforces the limit on its own share of the traffic
+restaurant_admission = SlidingWindowLimiter(settings.MAX_RESTAURANT_ORDERS, settings.RESTAURANT_WINDOW_SECONDS)
+
+
+def warm_from_db(db: Session, limiter: SlidingWindowLimiter = restaurant_admission) -> int:
+    # restart persistence for the http window: the orders table already has every admission's created_at, so
+    # one query over the last window puts the limiter back where it was. returns how many admissions were restored
+    since = limiter.clock() - limiter.window
+    rows = db.query(Order.restaurant_id, Order.created_at).filter(
+        Order.created_at >= datetime.utcfromtimestamp(since)
+    ).all()
+
+    entries: Dict[int, List[float]] = {}
+    for restaurant_id, created_at in rows:
+        # created_at is naive utc, same as the rest of the api assumes
+        entries.setdefault(restaurant_id, []).append(created_at.replace(tzinfo=timezone.utc).timestamp())
+    limiter.restore(entries)
+    return len(rows)
@@ -0,0 +1,91 @@
+# min-cost bipartite matching (hungarian algorithm) for batch order -> bot dispatch
+# rows are orders, columns are free bot capacity slots, cost is the path distance to the pickup
+
+from typing import List, Optional
+
+INF = float('inf')
+
+
+def min_cost_assignment(cost: List[List[float]]) -> List[Optional[int]]:
+    # returns, for every row, the column it's matched to (or None). rows with only infinite
+    # costs stay unmatched. works for rectangular matrices -- the smaller side is fully matched
+    # as long as finite costs allow it
+    rows = len(cost)
+    cols = len(cost[0]) if rows else 0
+    if rows == 0 or cols == 0:
+        return [None] * rows
+
+    # infinite entries (unreachable pickups) become a cost that's worse than any real matching,
+    # then get thrown out at the end
+    finite = [c for row in cost for c in row if c != INF]
+    big = (max(finite) if finite else 0) * (rows + cols) + 1
+    matrix = [[c if c != INF else big for c in row] for row in cost]
+
+    transposed = rows > cols
+    if transposed:
+        matrix = [list(column) for column in zip(*matrix)]
+        rows, cols = cols, rows
+
+    match = _hungarian(matrix, rows, cols)
+
+    result: List[Optional[int]] = [None] * (cols if transposed else rows)
+    for r, c in enumerate(match):
+        order_row, slot_col = (c, r) if transposed else (r, c)
+        if cost[order_row][slot_col] != INF:
+            result[order_row] = slot_col
+    return result
+
+
+def _hungarian(a: List[List[float]], n: int, m: int) -> List[int]:
+    # classic O(n^2 * m) potentials version, n <= m. returns the column matched to each row
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)      # p[j] = row matched to column j (1-based, 0 = free)
+    way = [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [INF] * (m + 1)
+        used = [False] * (m + 1)
+
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            delta = INF
+            j1 = 0
+            row = a[i0 - 1]
+            ui0 = u[i0]
+            for j in range(1, m + 1):
+                if used[j]:
+                    continue
+                cur = row[j - 1] - ui0 - v[j]
+                if cur < minv[j]:
+                    minv[j] = cur
+                    way[j] = j0
+                if minv[j] < delta:
+                    delta = minv[j]
+                    j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+
+        # walk the augmenting path back
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    match = [0] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            match[p[j] - 1] = j - 1
+    return match
@@ -0,0 +1,104 @@
+# live update fan-out for the dashboard -- every change is serialised once and pushed to all open
+# server-sent-event streams, so db/cpu cost stays flat no matter how many screens are watching
+
+import asyncio
+import itertools
+import json
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+# queued in place of a delta when a viewer needs a fresh snapshot (fell behind, or the simulation was reset)
+RESYNC = object()
+
+
+def format_sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class DeltaBroadcaster:
+    # publish() can be called from any thread (ticks run in worker threads); the per-viewer queues
+    # live on the event loop and are only touched from it
+
+    def __init__(self, max_pending: int = 100, keepalive_seconds: float = 15.0):
+        self.max_pending = max_pending
+        self.keepalive_seconds = keepalive_seconds
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        # every published delta gets a sequence number, snapshots record the last one they include
+        self._seq = itertools.count(1)
+        self._seq_lock = threading.Lock()
+        self.last_seq = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        # must run on the event loop (i.e. from an async endpoint)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: str, data: Dict):
+        # serialises once, then hands the same frame to every viewer
+        if not self._subscribers or self._loop is None:
+            return
+        with self._seq_lock:
+            seq = next(self._seq)
+            self.last_seq = seq
+        frame = format_sse(event, {**data, "seq": seq})
+        self._loop.call_soon_threadsafe(self._fan_out, (seq, frame))
+
+    def resync_all(self):
+        if self._subscribers and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._fan_out, RESYNC)
+
+    def _fan_out(self, item):
+        for queue in list(self._subscribers):
+            if item is not RESYNC and not queue.full():
+                queue.put_nowait(item)
+                continue
+            # a viewer that can't keep up loses its backlog and gets a fresh snapshot instead
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    async def stream(
+        self,
+        queue: asyncio.Queue,
+        snapshot: Callable[[], Awaitable[Dict]],
+        is_disconnected: Callable[[], Awaitable[bool]],
+    ) -> AsyncIterator[str]:
+        # full snapshot first, then deltas -- anything queued before the snapshot was taken is already in it
+        state = await snapshot()
+        seen = state.get("seq", 0)
+        yield format_sse("snapshot", state)
+
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=self.keepalive_seconds)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+
+            if item is RESYNC:
+                state = await snapshot()
+                seen = state.get("seq", 0)
+                yield format_sse("snapshot", state)
+                continue
+
+            seq, frame = item
+            if seq > seen:
+                yield frame
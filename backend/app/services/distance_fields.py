@@ -0,0 +1,75 @@
+# per-target distance fields -- nearly every query the engine makes ends at a restaurant, a delivery point or
+# the station, so each of those targets gets one flat int32 array of hop counts indexed by node index (a single
+# bfs, built the first time someone asks). "how far is every bot from this pickup" is then one numpy gather over
+# the array instead of a path search per bot, and routing to a target is a walk downhill along its field.
+# on maps small enough for the all-pairs table the fields are just zero-copy views of its rows
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.distance_table import UNREACHABLE, bfs_distances
+
+
+class DistanceFields:
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.version = graph.version
+        targets = {node_id for _, _, node_id in graph.restaurants}
+        targets.update(graph.delivery_point_ids())
+        station = graph.station_node_id()
+        if station is not None:
+            targets.add(station)
+        self.targets = frozenset(targets)
+        self._fields: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def field(self, node_id: int) -> Optional[np.ndarray]:
+        # the field towards node_id, or None when it isn't one of the fixed targets
+        field = self._fields.get(node_id)
+        if field is not None or node_id not in self.targets:
+            return field
+
+        graph = self.graph
+        target = graph.index.get(node_id)
+        if target is None:
+            return None
+        with self._lock:
+            field = self._fields.get(node_id)
+            if field is None:
+                if graph._table is not None:
+                    field = np.frombuffer(graph._table.row(target)[0], dtype=np.int32)
+                else:
+                    field = np.frombuffer(bfs_distances(graph, target), dtype=np.int32)
+                self._fields[node_id] = field
+        return field
+
+    def gather(self, field: np.ndarray, node_ids: List[int]) -> List[Optional[int]]:
+        # distance from each node to the field's target, in order -- None for unknown or cut-off nodes.
+        # unknown ids go in as index -1 and get masked to UNREACHABLE, which only turns into None on the way out
+        index = self.graph.index
+        idx = np.asarray([index.get(node_id, -1) for node_id in node_ids], dtype=np.intp)
+        distances = field[idx]
+        distances[idx < 0] = UNREACHABLE
+        return [None if d == UNREACHABLE else d for d in distances.tolist()]
+
+    def descend(self, field: np.ndarray, start_id: int) -> Optional[List[int]]:
+        # shortest path to the field's target: every step goes to a neighbour one hop closer.
+        # a step-by-step walk, so it reads the field through a memoryview -- numpy scalar indexing is slower
+        graph = self.graph
+        field = field.data
+        current = graph.index.get(start_id)
+        if current is None or field[current] == UNREACHABLE:
+            return None
+        offsets, targets, node_ids = graph.offsets, graph.targets, graph.node_ids
+        path = [start_id]
+        while field[current]:
+            closer = field[current] - 1
+            for k in range(offsets[current], offsets[current + 1]):
+                if field[targets[k]] == closer:
+                    current = targets[k]
+                    break
+            path.append(node_ids[current])
+        return path
@@ -0,0 +1,200 @@
+# all-pairs shortest-path distances + next hops for the grid, built with one bfs per node
+# every edge costs 1, so plain bfs gives exact distances -- no need for dijkstra or a* here
+
+from array import array
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# marker for "no path" in both tables -- keeps everything in flat int arrays
+UNREACHABLE = -1
+
+# a repaired table folds its overlay back into flat arrays once it covers more than 1/this of the rows
+OVERLAY_COMPACT_FRACTION = 4
+
+
+class DistanceTable:
+    # flat target-major arrays: dist[t * n + s] is the hop count from s to t, next_hop[t * n + s]
+    # is the node index s should step to when heading for t. the graph is undirected so
+    # one bfs rooted at t fills the whole t row (it's the shortest path tree towards t).
+    # repaired tables share those flat arrays with the table they came from and keep only the rows an edge
+    # change forced them to recompute, in an overlay that takes precedence -- see repaired below
+
+    def __init__(
+        self,
+        graph,
+        dist: Optional[array] = None,
+        next_hop: Optional[array] = None,
+        overlay: Optional[Dict[int, Tuple[array, array]]] = None,
+    ):
+        self.version = graph.version
+        self.node_ids = graph.node_ids
+        self.index: Dict[int, int] = graph.index
+        self.size = graph.size
+        # target -> (dist row, next hop row) recomputed since the flat arrays were built
+        self._overlay: Dict[int, Tuple[array, array]] = overlay or {}
+
+        if dist is not None and next_hop is not None:
+            # adopting tables that were already built (e.g. by repaired below, or a mapped grid artifact)
+            self._dist = dist
+            self._next_hop = next_hop
+            return
+
+        self._dist = array("i")
+        self._next_hop = array("i")
+        for target in range(self.size):
+            dist_row, next_row = self._bfs_row(target, graph.offsets, graph.targets)
+            self._dist.extend(dist_row)
+            self._next_hop.extend(next_row)
+
+    def __getstate__(self):
+        # tables adopted from a memory-mapped grid artifact are memoryviews -- pickle plain copies
+        state = self.__dict__.copy()
+        for key in ("_dist", "_next_hop", "node_ids"):
+            if isinstance(state[key], memoryview):
+                state[key] = _int_array_copy(state[key])
+        return state
+
+    @property
+    def dist(self) -> array:
+        # the whole flat table -- free without an overlay, an O(n^2) copy with one (artifact writes, tests)
+        return self._flat()[0]
+
+    @property
+    def next_hop(self) -> array:
+        return self._flat()[1]
+
+    def _flat(self) -> Tuple[array, array]:
+        if not self._overlay:
+            return self._dist, self._next_hop
+        n = self.size
+        dist = _int_array_copy(self._dist)
+        next_hop = _int_array_copy(self._next_hop)
+        for target, (dist_row, next_row) in self._overlay.items():
+            dist[target * n:(target + 1) * n] = dist_row
+            next_hop[target * n:(target + 1) * n] = next_row
+        return dist, next_hop
+
+    def row(self, target: int) -> Tuple[Sequence[int], Sequence[int]]:
+        # (dist row, next hop row) towards one target node index -- zero-copy either way
+        rows = self._overlay.get(target)
+        if rows is not None:
+            return rows
+        n = self.size
+        return memoryview(self._dist)[target * n:(target + 1) * n], memoryview(self._next_hop)[target * n:(target + 1) * n]
+
+    def _bfs_row(self, target: int, offsets: array, targets: array) -> Tuple[array, array]:
+        # bfs out from the target -- the node we discovered you from is your next hop towards it
+        dist_row = array("i", [UNREACHABLE]) * self.size
+        next_row = array("i", [UNREACHABLE]) * self.size
+        dist_row[target] = 0
+        next_row[target] = target
+
+        queue = deque([target])
+        while queue:
+            current = queue.popleft()
+            next_dist = dist_row[current] + 1
+            for k in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[k]
+                if dist_row[neighbor] == UNREACHABLE:
+                    dist_row[neighbor] = next_dist
+                    next_row[neighbor] = current
+                    queue.append(neighbor)
+
+        return dist_row, next_row
+
+    def repaired(self, graph, from_id: int, to_id: int) -> Tuple["DistanceTable", int]:
+        # table for a graph that differs from ours by a single blocked/unblocked edge.
+        # only the target rows whose shortest path tree can change get a fresh bfs:
+        #   - newly blocked: rows where the tree actually uses the edge
+        #   - newly opened: rows where the two endpoints are more than one hop apart
+        # the new table shares our flat arrays and overlay, plus the fresh rows on top, so a repair costs
+        # about (rows recomputed) * n instead of copying n^2 ints per edge change. once the overlay holds more
+        # than 1/OVERLAY_COMPACT_FRACTION of the rows it gets folded into new flat arrays -- that full copy is
+        # paid at most once per n / OVERLAY_COMPACT_FRACTION recomputed rows.
+        # returns the new table plus how many rows had to be recomputed
+        n = self.size
+        u = self.index[from_id]
+        v = self.index[to_id]
+        now_blocked = (from_id, to_id) in graph.blocked_pairs
+
+        affected = []
+        for target in range(n):
+            rows = self._overlay.get(target)
+            if rows is not None:
+                dist, next_hop, row = rows[0], rows[1], 0
+            else:
+                dist, next_hop, row = self._dist, self._next_hop, target * n
+            if now_blocked:
+                if next_hop[row + u] == v or next_hop[row + v] == u:
+                    affected.append(target)
+            else:
+                du, dv = dist[row + u], dist[row + v]
+                if du == UNREACHABLE or dv == UNREACHABLE:
+                    if du != dv:
+                        affected.append(target)
+                elif abs(du - dv) > 1:
+                    affected.append(target)
+
+        overlay = dict(self._overlay)
+        for target in affected:
+            overlay[target] = self._bfs_row(target, graph.offsets, graph.targets)
+
+        if len(overlay) * OVERLAY_COMPACT_FRACTION > n:
+            table = DistanceTable(graph, self._dist, self._next_hop, overlay)
+            dist, next_hop = table._flat()
+            return DistanceTable(graph, dist, next_hop), len(affected)
+        return DistanceTable(graph, self._dist, self._next_hop, overlay), len(affected)
+
+    def distance(self, start_id: int, goal_id: int) -> Optional[int]:
+        # O(1) lookup -- None when either node is unknown or the goal can't be reached
+        start = self.index.get(start_id)
+        goal = self.index.get(goal_id)
+        if start is None or goal is None:
+            return None
+
+        rows = self._overlay.get(goal)
+        d = rows[0][start] if rows is not None else self._dist[goal * self.size + start]
+        return None if d == UNREACHABLE else d
+
+    def path(self, start_id: int, goal_id: int) -> Optional[List[int]]:
+        # walks the next hop pointers, so it costs O(path length) instead of a fresh search
+        start = self.index.get(start_id)
+        goal = self.index.get(goal_id)
+        if start is None or goal is None:
+            return None
+
+        dist_row, next_row = self.row(goal)
+        if dist_row[start] == UNREACHABLE:
+            return None
+
+        path = [start_id]
+        current = start
+        while current != goal:
+            current = next_row[current]
+            path.append(self.node_ids[current])
+        return path
+
+
+def bfs_distances(graph, source: int) -> array:
+    # one hop-count row from source to every node index -- the graph is undirected, so it's also every node's
+    # distance to source
+    offsets, targets = graph.offsets, graph.targets
+    dist = array("i", [UNREACHABLE]) * graph.size
+    dist[source] = 0
+    queue = deque([source])
+    while queue:
+        current = queue.popleft()
+        next_dist = dist[current] + 1
+        for k in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[k]
+            if dist[neighbor] == UNREACHABLE:
+                dist[neighbor] = next_dist
+                queue.append(neighbor)
+    return dist
+
+
+def _int_array_copy(values) -> array:
+    # byte-level copy, works the same for an array or a memory-mapped memoryview
+    copy = array("i")
+    copy.frombytes(memoryview(values).cast("B"))
+    return copy
@@ -0,0 +1,24 @@
+# fleet load snapshot -- how many active orders each bot is carrying, fetched once and shared
+# instead of a COUNT(orders) per bot (which made every bot listing and dispatch pass N+1)
+
+from typing import Dict
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import Order
+from app.services.fleet_state import CARRIED_ORDER_STATUSES
+from app.services.simulation import peek_simulation_service
+
+
+def fleet_load_snapshot(db: Session) -> Dict[int, int]:
+    # bot_id -> ASSIGNED + PICKED_UP order count. the running engine owns this in memory, so we ask it first;
+    # otherwise it's a single GROUP BY bot_id. bots with nothing on board simply aren't in the dict
+    service = peek_simulation_service()
+    if service is not None:
+        return service.active_order_counts()
+
+    rows = db.query(Order.bot_id, func.count(Order.id)).filter(
+        Order.bot_id.isnot(None),
+        Order.status.in_(CARRIED_ORDER_STATUSES),
+    ).group_by(Order.bot_id).all()
+    return {bot_id: count for bot_id, count in rows}
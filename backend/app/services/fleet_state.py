@@ -0,0 +1,82 @@
+# plain in-memory copies of bots and orders -- the simulation engine works on these between ticks
+# and only writes the ones that changed back to the db (write-behind), so a tick is mostly pure cpu
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from app.models import Bot, Order
+from app.models.bot import BotStatus
+from app.models.order import OrderStatus
+
+# orders the engine keeps in memory -- delivered/cancelled ones are dropped once they're flushed
+ACTIVE_ORDER_STATUSES = (OrderStatus.PENDING, OrderStatus.ASSIGNED, OrderStatus.PICKED_UP)
+# orders that count against a bot's capacity
+CARRIED_ORDER_STATUSES = (OrderStatus.ASSIGNED, OrderStatus.PICKED_UP)
+
+
+@dataclass
+class BotState:
+    id: int
+    name: str
+    current_node_id: Optional[int]
+    status: BotStatus
+    max_capacity: int
+
+    @classmethod
+    def from_model(cls, bot: Bot) -> "BotState":
+        return cls(
+            id=bot.id,
+            name=bot.name,
+            current_node_id=bot.current_node_id,
+            status=bot.status,
+            max_capacity=bot.max_capacity,
+        )
+
+    def to_row(self) -> dict:
+        # the columns the engine is allowed to change, keyed for a bulk update by primary key
+        return {"id": self.id, "current_node_id": self.current_node_id, "status": self.status}
+
+
+@dataclass
+class OrderState:
+    id: int
+    restaurant_id: int
+    pickup_node_id: int
+    delivery_node_id: int
+    bot_id: Optional[int]
+    status: OrderStatus
+    assigned_at: Optional[datetime] = None
+    picked_up_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
+    # read-only -- never written back
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_model(cls, order: Order) -> "OrderState":
+        return cls(
+            id=order.id,
+            restaurant_id=order.restaurant_id,
+            pickup_node_id=order.pickup_node_id,
+            delivery_node_id=order.delivery_node_id,
+            bot_id=order.bot_id,
+            status=order.status,
+            assigned_at=order.assigned_at,
+            picked_up_at=order.picked_up_at,
+            delivered_at=order.delivered_at,
+            created_at=order.created_at,
+        )
+
+    def to_row(self) -> dict:
+        return {
+            "id": self.id,
+            "bot_id": self.bot_id,
+            "status": self.status,
+            "assigned_at": self.assigned_at,
+            "picked_up_at": self.picked_up_at,
+            "delivered_at": self.delivered_at,
+        }
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_ORDER_STATUSES
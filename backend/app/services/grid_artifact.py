@@ -0,0 +1,239 @@
+# precompiled grid artifact -- the whole routing graph (nodes, csr adjacency, blocked edges, restaurants,
+# delivery points and optionally the distance/next-hop tables) in one versioned binary file.
+# at startup it's memory-mapped read-only, so there's no csv/orm/csr/bfs work before the first route,
+# and every worker process mapping the same file shares the same physical pages.
+# the artifact carries a fingerprint of the grid tables and is only used while the db still matches it
+#
+#   python -m app.services.grid_artifact build grid.bin
+#   python -m app.services.grid_artifact inspect grid.bin
+#
+# layout: MAGIC | u32 format version | u32 header length | json header | 8-byte aligned sections
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Node, Restaurant, BlockedEdge
+from app.services.distance_table import DistanceTable
+from app.services.grid_graph import GridGraph
+
+logger = logging.getLogger("eagroute")
+
+MAGIC = b"EAGGRID\0"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<8sII")
+ALIGN = 8
+
+# array sections in file order: (name, typecode)
+GRAPH_SECTIONS = (
+    ("node_ids", "i"),
+    ("xs", "i"),
+    ("ys", "i"),
+    ("is_delivery", "b"),
+    ("offsets", "i"),
+    ("targets", "i"),
+    ("blocked_edges", "i"),
+)
+TABLE_SECTIONS = (("dist", "i"), ("next_hop", "i"))
+
+# rows fetched per round trip while fingerprinting
+FINGERPRINT_BATCH = 5000
+
+
+def db_fingerprint(db: Session) -> str:
+    # sha256 over every grid row in id order, streamed -- any change to any row (a moved node, a blocked edge
+    # swapped for another) gives a new fingerprint, which aggregates like SUM(id * x) can't promise
+    digest = hashlib.sha256()
+    queries = (
+        ("nodes", db.query(Node.id, Node.x, Node.y, Node.is_delivery_point).order_by(Node.id)),
+        ("blocked_edges", db.query(BlockedEdge.id, BlockedEdge.from_node_id, BlockedEdge.to_node_id).order_by(BlockedEdge.id)),
+        ("restaurants", db.query(Restaurant.id, Restaurant.name, Restaurant.node_id).order_by(Restaurant.id)),
+    )
+    for name, query in queries:
+        digest.update(f"{name}\n".encode())
+        for row in query.yield_per(FINGERPRINT_BATCH):
+            digest.update(json.dumps(list(row)).encode() + b"\n")
+    return digest.hexdigest()
+
+
+def _graph_arrays(graph: GridGraph) -> Dict[str, array]:
+    flat_edges = array("i")
+    for edge in graph.blocked_edges:
+        flat_edges.extend(edge)
+    return {
+        "node_ids": graph.node_ids,
+        "xs": graph.xs,
+        "ys": graph.ys,
+        "is_delivery": graph.is_delivery,
+        "offsets": graph.offsets,
+        "targets": graph.targets,
+        "blocked_edges": flat_edges,
+    }
+
+
+def write_artifact(path: str, graph: GridGraph, fingerprint: str, include_tables: bool = True) -> Dict:
+    # written to a temp file and renamed into place, so a reader never maps a half-written artifact
+    sections = _graph_arrays(graph)
+    section_types = list(GRAPH_SECTIONS)
+    if include_tables and 0 < graph.size <= settings.DISTANCE_TABLE_MAX_NODES:
+        table = graph.distance_table()
+        sections["dist"] = table.dist
+        sections["next_hop"] = table.next_hop
+        section_types += TABLE_SECTIONS
+
+    header = {
+        "fingerprint": fingerprint,
+        "byteorder": sys.byteorder,
+        "built_at": datetime.utcnow().isoformat(),
+        "size": graph.size,
+        "restaurants": [list(r) for r in graph.restaurants],
+        "has_tables": "dist" in sections,
+        "sections": {},
+    }
+
+    # section offsets depend on the header length, and the header holds the offsets -- lay out relative
+    # to the data start first, then fix up once the header size is known
+    relative = 0
+    for name, typecode in section_types:
+        data = memoryview(sections[name]).cast("B")
+        header["sections"][name] = {"offset": relative, "count": len(sections[name]), "typecode": typecode}
+        relative += _aligned(len(data))
+
+    header_bytes = json.dumps(header).encode()
+    data_start = _aligned(PREAMBLE.size + len(header_bytes))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name, _ in section_types:
+            data = memoryview(sections[name]).cast("B")
+            f.write(data)
+            f.write(b"\0" * (_aligned(len(data)) - len(data)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    return header
+
+
+def _aligned(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def read_header(buffer) -> Dict:
+    if len(buffer) < PREAMBLE.size:
+        raise ValueError("Grid artifact is truncated")
+    magic, version, header_length = PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a grid artifact")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Grid artifact format {version} is not supported (expected {FORMAT_VERSION})")
+    header = json.loads(bytes(buffer[PREAMBLE.size:PREAMBLE.size + header_length]))
+    header["data_start"] = _aligned(PREAMBLE.size + header_length)
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"Grid artifact was built on a {header['byteorder']}-endian machine")
+    return header
+
+
+def map_artifact(path: str, expected_fingerprint: Optional[str] = None) -> GridGraph:
+    # the returned graph's arrays are views straight into the mapping -- nothing gets copied or rebuilt
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    header = read_header(view)
+    if expected_fingerprint is not None and header["fingerprint"] != expected_fingerprint:
+        raise ValueError("Grid artifact is stale (db fingerprint mismatch)")
+
+    arrays = {}
+    for name, section in header["sections"].items():
+        start = header["data_start"] + section["offset"]
+        length = section["count"] * array(section["typecode"]).itemsize
+        if start + length > len(view):
+            raise ValueError(f"Grid artifact is truncated (section {name})")
+        arrays[name] = view[start:start + length].cast(section["typecode"])
+
+    flat_edges = arrays["blocked_edges"]
+    blocked_rows = [tuple(flat_edges[i:i + 3]) for i in range(0, len(flat_edges), 3)]
+    graph = GridGraph.from_arrays(
+        arrays["node_ids"],
+        arrays["xs"],
+        arrays["ys"],
+        arrays["is_delivery"],
+        arrays["offsets"],
+        arrays["targets"],
+        blocked_rows,
+        [tuple(r) for r in header["restaurants"]],
+    )
+    if header["has_tables"]:
+        graph._table = DistanceTable(graph, arrays["dist"], arrays["next_hop"])
+    return graph
+
+
+def build_artifact(db: Session, path: str, include_tables: bool = True) -> Dict:
+    # fingerprint first, then the graph -- both read in the same session
+    fingerprint = db_fingerprint(db)
+    return write_artifact(path, GridGraph.from_db(db), fingerprint, include_tables)
+
+
+def load_or_rebuild(db: Session, path: str) -> GridGraph:
+    # startup path: map the artifact if it still matches the db, otherwise load from the db and
+    # write a fresh artifact so the next start is instant again
+    fingerprint = db_fingerprint(db)
+    if os.path.exists(path):
+        try:
+            graph = map_artifact(path, fingerprint)
+            logger.info(f"Grid graph mapped from artifact {path}")
+            return graph
+        except (ValueError, KeyError, struct.error) as exc:
+            # stale, foreign, truncated or with a mangled header -- any of them just means a rebuild
+            logger.warning(f"Ignoring grid artifact {path}: {exc!r}")
+
+    graph = GridGraph.from_db(db)
+    try:
+        write_artifact(path, graph, fingerprint, settings.GRID_ARTIFACT_TABLES)
+        logger.info(f"Grid artifact written to {path}")
+    except OSError as exc:
+        logger.warning(f"Could not write grid artifact {path}: {exc}")
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the precompiled grid artifact")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="compile the grid in the db into an artifact")
+    build.add_argument("path", nargs="?", default=settings.GRID_ARTIFACT_PATH or "grid.bin")
+    build.add_argument("--no-tables", action="store_true", help="leave out the distance/next-hop tables")
+    inspect = sub.add_parser("inspect", help="print an artifact's header")
+    inspect.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            header = build_artifact(db, args.path, include_tables=not args.no_tables)
+        finally:
+            db.close()
+    else:
+        with open(args.path, "rb") as f:
+            header = read_header(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    print(json.dumps({k: v for k, v in header.items() if k != "restaurants"}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
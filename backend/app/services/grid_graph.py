@@ -0,0 +1,305 @@
+# process-wide grid graph -- loaded from the db once at startup and shared by every request and tick
+# adjacency is stored as csr (offsets + flat targets) over integer node indices, so
+# neighbour lookups are just array slices instead of rebuilding coordinate tuples each time
+
+import itertools
+import logging
+import threading
+import time
+from array import array
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Node, Restaurant, BlockedEdge
+from app.services.distance_fields import DistanceFields
+from app.services.distance_table import DistanceTable
+from app.services.hierarchy import ClusterHierarchy
+from app.services.landmarks import LandmarkTable
+
+logger = logging.getLogger("eagroute")
+
+# every graph gets its own version so caches built on top of it (distance tables etc.) can tell when they're stale
+_versions = itertools.count(1)
+
+
+class GridGraph:
+    # immutable snapshot of the map -- never mutate one in place, build a new version instead
+
+    def __init__(
+        self,
+        node_rows: Iterable[Tuple[int, int, int, bool]],
+        blocked_rows: Iterable[Tuple[int, int, int]],
+        restaurant_rows: Iterable[Tuple[int, str, int]],
+        version: Optional[int] = None,
+    ):
+        self.version = version if version is not None else next(_versions)
+
+        node_rows = sorted(node_rows)
+        self.size = len(node_rows)
+        self.node_ids = array("i", (row[0] for row in node_rows))
+        self.xs = array("i", (row[1] for row in node_rows))
+        self.ys = array("i", (row[2] for row in node_rows))
+        self.is_delivery = array("b", (1 if row[3] else 0 for row in node_rows))
+
+        self._index_nodes()
+        self._set_edges_and_restaurants(blocked_rows, restaurant_rows)
+
+        self.offsets, self.targets = self._build_csr()
+
+        self._table = None
+        self._hierarchy = None
+        self._landmarks = None
+        self._fields = None
+        self._table_lock = threading.Lock()
+
+    @classmethod
+    def from_arrays(
+        cls,
+        node_ids,
+        xs,
+        ys,
+        is_delivery,
+        offsets,
+        targets,
+        blocked_rows: Iterable[Tuple[int, int, int]],
+        restaurant_rows: Iterable[Tuple[int, str, int]],
+    ) -> "GridGraph":
+        # adopts already-built node/csr arrays as they are (e.g. memory-mapped from a grid artifact),
+        # so only the lookup dicts get built -- node_ids must be sorted, same as __init__ leaves them
+        graph = cls.__new__(cls)
+        graph.version = next(_versions)
+        graph.size = len(node_ids)
+        graph.node_ids, graph.xs, graph.ys, graph.is_delivery = node_ids, xs, ys, is_delivery
+        graph._index_nodes()
+        graph._set_edges_and_restaurants(blocked_rows, restaurant_rows)
+        graph.offsets, graph.targets = offsets, targets
+        graph._table = None
+        graph._hierarchy = None
+        graph._landmarks = None
+        graph._fields = None
+        graph._table_lock = threading.Lock()
+        return graph
+
+    def _index_nodes(self):
+        self.index: Dict[int, int] = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.coord_index: Dict[Tuple[int, int], int] = {
+            (x, y): i for i, (x, y) in enumerate(zip(self.xs, self.ys))
+        }
+
+    def _set_edges_and_restaurants(self, blocked_rows, restaurant_rows):
+        # (id, from_node_id, to_node_id) exactly as stored, plus both directions for lookups
+        self.blocked_edges: Tuple[Tuple[int, int, int], ...] = tuple(sorted(blocked_rows))
+        blocked_pairs = set()
+        for _, from_id, to_id in self.blocked_edges:
+            blocked_pairs.add((from_id, to_id))
+            blocked_pairs.add((to_id, from_id))
+        self.blocked_pairs: FrozenSet[Tuple[int, int]] = frozenset(blocked_pairs)
+
+        # (id, name, node_id)
+        self.restaurants: Tuple[Tuple[int, str, int], ...] = tuple(sorted(restaurant_rows))
+
+    def __getstate__(self):
+        # picklable for process pools (the lock isn't) -- a built distance table travels along with it
+        state = self.__dict__.copy()
+        del state["_table_lock"]
+        # fields hold a lock and possibly views into the table -- cheap to rebuild on the other side
+        state["_fields"] = None
+        for key, value in state.items():
+            if isinstance(value, memoryview):
+                # memory-mapped arrays can't be pickled, ship a copy instead
+                state[key] = array(value.format, value)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._table_lock = threading.Lock()
+
+    def _build_csr(self) -> Tuple[array, array]:
+        # 4-connected grid: up/down/left/right, minus anything in the blocked set
+        offsets = array("i", [0])
+        targets = array("i")
+
+        for i in range(self.size):
+            node_id = self.node_ids[i]
+            x, y = self.xs[i], self.ys[i]
+            for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
+                j = self.coord_index.get((x + dx, y + dy))
+                if j is not None and (node_id, self.node_ids[j]) not in self.blocked_pairs:
+                    targets.append(j)
+            offsets.append(len(targets))
+
+        return offsets, targets
+
+    def neighbors(self, i: int) -> array:
+        # neighbour indices of node index i
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def has_node(self, node_id: int) -> bool:
+        return node_id in self.index
+
+    def coords(self, node_id: int) -> Optional[Tuple[int, int]]:
+        i = self.index.get(node_id)
+        if i is None:
+            return None
+        return self.xs[i], self.ys[i]
+
+    def node_at(self, x: int, y: int) -> Optional[int]:
+        i = self.coord_index.get((x, y))
+        return self.node_ids[i] if i is not None else None
+
+    def is_delivery_point(self, node_id: int) -> bool:
+        i = self.index.get(node_id)
+        return i is not None and bool(self.is_delivery[i])
+
+    def station_node_id(self) -> Optional[int]:
+        # where bots park when they have nothing to do
+        return self.node_at(settings.STATION_X, settings.STATION_Y)
+
+    def delivery_point_ids(self) -> List[int]:
+        return [self.node_ids[i] for i in range(self.size) if self.is_delivery[i]]
+
+    def with_blocked_edge(self, edge_id: int, from_id: int, to_id: int) -> "GridGraph":
+        # new graph version with one extra blocked edge -- this one stays untouched
+        return GridGraph(self._node_rows(), self.blocked_edges + ((edge_id, from_id, to_id),), self.restaurants)
+
+    def without_blocked_edge(self, edge_id: int) -> "GridGraph":
+        # new graph version with a blocked edge reopened
+        remaining = [edge for edge in self.blocked_edges if edge[0] != edge_id]
+        return GridGraph(self._node_rows(), remaining, self.restaurants)
+
+    def _node_rows(self) -> List[Tuple[int, int, int, bool]]:
+        return [
+            (self.node_ids[i], self.xs[i], self.ys[i], bool(self.is_delivery[i]))
+            for i in range(self.size)
+        ]
+
+    def distance_table(self) -> DistanceTable:
+        # built lazily the first time someone asks, then shared for the lifetime of this version
+        if self._table is None:
+            with self._table_lock:
+                if self._table is None:
+                    self._table = DistanceTable(self)
+        return self._table
+
+    def hierarchy(self) -> ClusterHierarchy:
+        # hpa* clusters for maps past the table limit -- same lazy, once-per-version deal as the table
+        if self._hierarchy is None:
+            with self._table_lock:
+                if self._hierarchy is None:
+                    self._hierarchy = ClusterHierarchy(self, settings.HPA_CLUSTER_SIZE)
+        return self._hierarchy
+
+    def landmarks(self) -> LandmarkTable:
+        # alt heuristic rows for plain a* past the table limit
+        if self._landmarks is None:
+            with self._table_lock:
+                if self._landmarks is None:
+                    self._landmarks = LandmarkTable(self, settings.ASTAR_LANDMARKS)
+        return self._landmarks
+
+    def distance_fields(self) -> DistanceFields:
+        # per-target fields fill in one at a time, a new version starts over with none built
+        if self._fields is None:
+            with self._table_lock:
+                if self._fields is None:
+                    self._fields = DistanceFields(self)
+        return self._fields
+
+    @classmethod
+    def from_db(cls, db: Session) -> "GridGraph":
+        # column-only queries -- we don't need full orm objects for any of this
+        node_rows = db.query(Node.id, Node.x, Node.y, Node.is_delivery_point).all()
+        blocked_rows = db.query(BlockedEdge.id, BlockedEdge.from_node_id, BlockedEdge.to_node_id).all()
+        restaurant_rows = db.query(Restaurant.id, Restaurant.name, Restaurant.node_id).all()
+        return cls(
+            [tuple(r) for r in node_rows],
+            [tuple(r) for r in blocked_rows],
+            [tuple(r) for r in restaurant_rows],
+        )
+
+
+_graph_lock = threading.Lock()
+_current_graph: Optional[GridGraph] = None
+
+
+def load_grid_graph(db: Session) -> GridGraph:
+    # (re)loads the graph and makes it the shared one -- called from the lifespan hook.
+    # with GRID_ARTIFACT_PATH set it's memory-mapped from the precompiled artifact when that still matches the db
+    if settings.GRID_ARTIFACT_PATH:
+        from app.services.grid_artifact import load_or_rebuild
+        graph = load_or_rebuild(db, settings.GRID_ARTIFACT_PATH)
+    else:
+        graph = GridGraph.from_db(db)
+    # the all-pairs table is a few seconds of pure python near DISTANCE_TABLE_MAX_NODES -- built here, at
+    # startup, instead of inside whichever request or tick happens to route first (a mapped artifact has it already)
+    if 0 < graph.size <= settings.DISTANCE_TABLE_MAX_NODES:
+        started = time.perf_counter()
+        graph.distance_table()
+        logger.info(f"Distance table ready in {time.perf_counter() - started:.2f}s")
+    set_grid_graph(graph)
+    return graph
+
+
+def set_grid_graph(graph: GridGraph):
+    global _current_graph
+    with _graph_lock:
+        _current_graph = graph
+
+
+def get_grid_graph(db: Optional[Session] = None) -> GridGraph:
+    # returns the shared graph, falling back to a db load if startup didn't get to it
+    global _current_graph
+
+    graph = _current_graph
+    if graph is not None:
+        return graph
+    if db is None:
+        raise RuntimeError("Grid graph has not been loaded yet")
+
+    with _graph_lock:
+        if _current_graph is None:
+            _current_graph = GridGraph.from_db(db)
+        return _current_graph
+
+
+# serialises runtime edge changes so two closures can't both build on the same old version
+_edge_lock = threading.Lock()
+
+
+def block_edge(db: Session, edge_id: int, from_id: int, to_id: int) -> GridGraph:
+    # road closure -- swaps in a new graph version with the edge blocked
+    with _edge_lock:
+        current = get_grid_graph(db)
+        return _install_edge_change(current, current.with_blocked_edge(edge_id, from_id, to_id), from_id, to_id)
+
+
+def unblock_edge(db: Session, edge_id: int, from_id: int, to_id: int) -> GridGraph:
+    # road reopened -- swaps in a new graph version without that blocked edge
+    with _edge_lock:
+        current = get_grid_graph(db)
+        return _install_edge_change(current, current.without_blocked_edge(edge_id), from_id, to_id)
+
+
+def _install_edge_change(old_graph: GridGraph, graph: GridGraph, from_id: int, to_id: int) -> GridGraph:
+    # if the old version already had a distance table we repair it row by row instead of rebuilding it
+    if old_graph._table is not None:
+        table, rows = old_graph._table.repaired(graph, from_id, to_id)
+        graph._table = table
+        logger.info(f"Distance table repaired for v{graph.version}: {rows}/{graph.size} rows recomputed")
+    # same for the hpa* clusters -- only the one or two clusters around the edge get rebuilt
+    if old_graph._hierarchy is not None:
+        hierarchy, clusters = old_graph._hierarchy.repaired(graph, from_id, to_id)
+        graph._hierarchy = hierarchy
+        logger.info(f"Cluster hierarchy repaired for v{graph.version}: {clusters} clusters rebuilt")
+    if old_graph._landmarks is not None:
+        graph._landmarks = old_graph._landmarks.rebuilt(graph)
+
+    set_grid_graph(graph)
+    return graph
+
+
+def reset_grid_graph():
+    # drops the shared graph so the next caller reloads it -- mostly for tests
+    set_grid_graph(None)
@@ -0,0 +1,108 @@
+# group commit -- callers hand items to one writer thread, which drains whatever has queued up (up to max_batch
+# items, waiting at most max_wait after the first one) and writes it all in one transaction. each caller blocks on
+# its own future and gets its own result back, so throughput follows batch size instead of per-commit latency
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("eagroute")
+
+_STOP = object()
+
+
+class GroupCommitQueue:
+    # handler(db, items) -> one result per item, in order. it owns the transaction (commit inside it);
+    # if it raises, the batch is rolled back and every caller in it gets the exception
+
+    def __init__(
+        self,
+        handler: Callable[[Session, List[Any]], List[Any]],
+        session_factory: Callable[[], Session],
+        max_batch: int = 100,
+        max_wait_seconds: float = 0.005,
+    ):
+        self.handler = handler
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self.batches_written = 0
+        self.items_written = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        self._ensure_writer()
+        self._queue.put((item, future))
+        return future
+
+    def _ensure_writer(self):
+        # started on first use, so the direct intake mode never spins up a thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        # lets the writer finish what's already queued, then exit
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+
+            batch = [entry]
+            stopping = False
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch: List[Tuple[Any, Future]]):
+        # callers that gave up waiting cancel their future -- those items are skipped, and once an item is
+        # marked running here the caller can't cancel it any more and waits for the real result instead
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        db = self.session_factory()
+        try:
+            results = self.handler(db, [item for item, _ in batch])
+        except Exception as exc:
+            db.rollback()
+            logger.error(f"Group commit of {len(batch)} items failed: {exc}")
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        finally:
+            db.close()
+
+        self.batches_written += 1
+        self.items_written += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
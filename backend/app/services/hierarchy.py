@@ -0,0 +1,235 @@
+# hierarchical pathfinding (hpa*) for maps too big for the all-pairs table.
+# the grid is cut into cluster_size x cluster_size blocks. every straight run of open edges between two
+# neighbouring blocks gets one or two transitions (the ends of long runs, the middle of short ones), and
+# inside each block we precompute the hop counts between its transition nodes. a query connects start and
+# goal to the transitions of their own blocks, searches that small abstract graph, then refines only the
+# legs it actually uses. paths can come out a few hops longer than the true shortest path -- that's the trade
+
+import heapq
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+Cluster = Tuple[int, int]
+
+# runs of at least this many crossings get a transition at each end instead of one in the middle
+LONG_ENTRANCE = 6
+
+
+class ClusterHierarchy:
+
+    def __init__(self, graph, cluster_size: int, _copy_from: Optional["ClusterHierarchy"] = None):
+        self.graph = graph
+        self.version = graph.version
+        self.cluster_size = cluster_size
+
+        if _copy_from is not None:
+            # repaired below: same block layout, so the per-cluster dicts start out shared with the old version
+            self.members = _copy_from.members
+            self.transitions = dict(_copy_from.transitions)
+            self.intra = dict(_copy_from.intra)
+            self._link()
+            return
+
+        self.members: Dict[Cluster, List[int]] = {}
+        for i in range(graph.size):
+            self.members.setdefault(self.cluster_of(i), []).append(i)
+
+        # (cluster, right/lower neighbour cluster) -> [(node on this side, node on that side)]
+        self.transitions: Dict[Tuple[Cluster, Cluster], List[Tuple[int, int]]] = {}
+        for cluster in self.members:
+            self.transitions.update(self._find_transitions(cluster))
+
+        self._link()
+        # transition node -> {other transition node in the same cluster: hop count inside the cluster}
+        self.intra: Dict[Cluster, Dict[int, Dict[int, int]]] = {
+            cluster: self._intra_distances(cluster) for cluster in self.members
+        }
+
+    def cluster_of(self, i: int) -> Cluster:
+        return self.graph.xs[i] // self.cluster_size, self.graph.ys[i] // self.cluster_size
+
+    def _find_transitions(self, cluster: Cluster) -> Dict[Tuple[Cluster, Cluster], List[Tuple[int, int]]]:
+        # crossings into the block to the right and the block below, grouped into contiguous runs
+        graph = self.graph
+        xs, ys, offsets, targets = graph.xs, graph.ys, graph.offsets, graph.targets
+        crossings: Dict[Cluster, List[Tuple[int, int, int]]] = {}
+        for i in self.members[cluster]:
+            for k in range(offsets[i], offsets[i + 1]):
+                j = targets[k]
+                other = self.cluster_of(j)
+                if other == cluster:
+                    continue
+                if xs[j] == xs[i] + 1:
+                    crossings.setdefault(other, []).append((ys[i], i, j))
+                elif ys[j] == ys[i] + 1:
+                    crossings.setdefault(other, []).append((xs[i], i, j))
+
+        transitions = {}
+        for other, found in crossings.items():
+            found.sort()
+            chosen = []
+            run = [found[0]]
+            for crossing in found[1:] + [None]:
+                if crossing is not None and crossing[0] == run[-1][0] + 1:
+                    run.append(crossing)
+                    continue
+                if len(run) >= LONG_ENTRANCE:
+                    chosen += [run[0][1:], run[-1][1:]]
+                else:
+                    chosen.append(run[len(run) // 2][1:])
+                if crossing is not None:
+                    run = [crossing]
+            transitions[(cluster, other)] = chosen
+        return transitions
+
+    def _link(self):
+        # transition nodes per cluster plus the one-hop links across cluster borders
+        self.entrances: Dict[Cluster, Set[int]] = {}
+        self.inter: Dict[int, Set[int]] = {}
+        for (a, b), pairs in self.transitions.items():
+            for i, j in pairs:
+                self.entrances.setdefault(a, set()).add(i)
+                self.entrances.setdefault(b, set()).add(j)
+                self.inter.setdefault(i, set()).add(j)
+                self.inter.setdefault(j, set()).add(i)
+        self._legs: Dict[Tuple[int, int], List[int]] = {}
+
+    def _bfs(self, start: int, cluster: Cluster) -> Tuple[Dict[int, int], Dict[int, int]]:
+        # plain bfs that never leaves the cluster -- (distances, parents)
+        graph = self.graph
+        offsets, targets = graph.offsets, graph.targets
+        cs = self.cluster_size
+        cx, cy = cluster
+        dist = {start: 0}
+        parent: Dict[int, int] = {}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            for k in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[k]
+                if neighbor in dist or graph.xs[neighbor] // cs != cx or graph.ys[neighbor] // cs != cy:
+                    continue
+                dist[neighbor] = dist[current] + 1
+                parent[neighbor] = current
+                queue.append(neighbor)
+        return dist, parent
+
+    def _intra_distances(self, cluster: Cluster) -> Dict[int, Dict[int, int]]:
+        entrances = self.entrances.get(cluster, set())
+        table = {}
+        for entrance in entrances:
+            dist, _ = self._bfs(entrance, cluster)
+            table[entrance] = {other: dist[other] for other in entrances if other != entrance and other in dist}
+        return table
+
+    def repaired(self, graph, from_id: int, to_id: int) -> Tuple["ClusterHierarchy", int]:
+        # hierarchy for a graph that differs from ours by one blocked/unblocked edge: only the cluster(s) the
+        # edge touches get their transitions and intra-cluster distances rebuilt. returns it plus that count
+        hierarchy = ClusterHierarchy(graph, self.cluster_size, _copy_from=self)
+        u, v = graph.index[from_id], graph.index[to_id]
+        affected = {hierarchy.cluster_of(u), hierarchy.cluster_of(v)}
+
+        if len(affected) > 1:
+            # the edge crosses a border -- its transitions are kept under the left/upper block, which sorts first
+            owner = min(affected)
+            for key in [key for key in hierarchy.transitions if key[0] == owner]:
+                del hierarchy.transitions[key]
+            hierarchy.transitions.update(hierarchy._find_transitions(owner))
+            hierarchy._link()
+
+        for cluster in affected:
+            hierarchy.intra[cluster] = hierarchy._intra_distances(cluster)
+        return hierarchy, len(affected)
+
+    def find_path(self, start: int, goal: int) -> Optional[List[int]]:
+        # node indices from start to goal, or None when the abstract graph can't connect them
+        if start == goal:
+            return [start]
+        xs, ys = self.graph.xs, self.graph.ys
+        start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+        start_dist, start_parent = self._bfs(start, start_cluster)
+        goal_dist, goal_parent = self._bfs(goal, goal_cluster)
+
+        # abstract search: -1 is the start, -2 the goal, everything else is a transition node
+        gx, gy = xs[goal], ys[goal]
+        open_set = []
+        g_score: Dict[int, int] = {-1: 0}
+        came_from: Dict[int, int] = {}
+
+        def push(node: int, g: int, parent: int):
+            if node in g_score and g_score[node] <= g:
+                return
+            g_score[node] = g
+            came_from[node] = parent
+            h = 0 if node == -2 else abs(xs[node] - gx) + abs(ys[node] - gy)
+            heapq.heappush(open_set, (g + h, g, node))
+
+        if goal in start_dist:
+            push(-2, start_dist[goal], -1)
+        for entrance in self.entrances.get(start_cluster, ()):
+            if entrance in start_dist:
+                push(entrance, start_dist[entrance], -1)
+
+        closed: Set[int] = set()
+        while open_set:
+            _, g, node = heapq.heappop(open_set)
+            if node == -2:
+                break
+            if node in closed:
+                continue
+            closed.add(node)
+
+            if node in goal_dist:
+                push(-2, g + goal_dist[node], node)
+            for other, cost in self.intra[self.cluster_of(node)].get(node, {}).items():
+                push(other, g + cost, node)
+            for other in self.inter.get(node, ()):
+                push(other, g + 1, node)
+        else:
+            return None
+
+        abstract = [-2]
+        while abstract[-1] != -1:
+            abstract.append(came_from[abstract[-1]])
+        abstract.reverse()
+        return self._refine(abstract, start, goal, start_parent, goal_parent)
+
+    def _refine(
+        self,
+        abstract: List[int],
+        start: int,
+        goal: int,
+        start_parent: Dict[int, int],
+        goal_parent: Dict[int, int],
+    ) -> List[int]:
+        # expands the abstract hops back into grid steps -- first and last leg come straight from the query bfs
+        if len(abstract) == 2:
+            return _walk_back(start_parent, goal)[::-1]
+
+        path = _walk_back(start_parent, abstract[1])[::-1]
+        for a, b in zip(abstract[1:-2], abstract[2:-1]):
+            if self.cluster_of(a) != self.cluster_of(b):
+                # one step across a cluster border
+                path.append(b)
+            else:
+                path += self._leg(a, b)[1:]
+        path += _walk_back(goal_parent, abstract[-2])[1:]
+        return path
+
+    def _leg(self, a: int, b: int) -> List[int]:
+        # intra-cluster route between two transitions, worked out the first time a query needs it
+        leg = self._legs.get((a, b))
+        if leg is None:
+            _, parent = self._bfs(a, self.cluster_of(a))
+            leg = _walk_back(parent, b)[::-1]
+            self._legs[(a, b)] = leg
+        return leg
+
+
+def _walk_back(parent: Dict[int, int], node: int) -> List[int]:
+    # node back to the bfs root
+    path = [node]
+    while node in parent:
+        node = parent[node]
+        path.append(node)
+    return path
@@ -0,0 +1,77 @@
+# landmark (alt) lower bounds for a* on maps too big for the all-pairs table.
+# k landmark nodes, one bfs distance row each (O(k * n) ints instead of n^2). by the triangle inequality
+# |d(L, goal) - d(L, v)| never overestimates d(v, goal), so the max over the landmarks is an admissible,
+# consistent heuristic -- and unlike manhattan it knows about the detours blocked edges force
+
+from array import array
+from typing import List, Optional, Tuple
+
+from app.services.distance_table import UNREACHABLE, bfs_distances
+
+# per query only the landmarks that give the best bound at the start get used -- checking all k on
+# every expanded node costs more than the extra pruning saves
+ACTIVE_LANDMARKS = 4
+
+
+class LandmarkTable:
+
+    def __init__(self, graph, count: int, landmarks: Optional[List[int]] = None):
+        self.version = graph.version
+        self.size = graph.size
+        self.rows: List[array] = []
+
+        if landmarks is not None:
+            # same landmarks on a new graph version (see rebuilt below)
+            self.landmarks = list(landmarks)
+            self.rows = [bfs_distances(graph, landmark) for landmark in self.landmarks]
+            return
+
+        # farthest-point selection: each new landmark is the node furthest from all the ones picked so far,
+        # which lands them out on the edges of the map where the bounds are tightest. landmarks all come from
+        # node 0's component -- the map is meant to be connected, stray islands just get weaker bounds
+        self.landmarks: List[int] = []
+        if self.size == 0 or count <= 0:
+            return
+        nearest = bfs_distances(graph, 0)
+        for _ in range(min(count, self.size)):
+            landmark = max(range(self.size), key=lambda i: nearest[i])
+            if nearest[landmark] <= 0 and self.landmarks:
+                # everything reachable is already a landmark
+                break
+            row = bfs_distances(graph, landmark)
+            self.landmarks.append(landmark)
+            self.rows.append(row)
+            for i in range(self.size):
+                if row[i] != UNREACHABLE and row[i] < nearest[i]:
+                    nearest[i] = row[i]
+
+    def rebuilt(self, graph) -> "LandmarkTable":
+        # a blocked/reopened edge can move distances either way, so every row gets a fresh bfs
+        # (k of them, cheap next to the n a distance table would need) -- the landmarks themselves stay put
+        return LandmarkTable(graph, len(self.landmarks), self.landmarks)
+
+    def for_query(self, start: int, goal: int) -> Optional[List[Tuple[array, int]]]:
+        # (row, d(L, goal)) for the active landmarks of one start -> goal query, or None when some landmark
+        # reaches one end but not the other (different components, so there's no path at all)
+        ranked = []
+        for row in self.rows:
+            to_start, to_goal = row[start], row[goal]
+            if to_start == UNREACHABLE or to_goal == UNREACHABLE:
+                if to_start != to_goal:
+                    return None
+                continue
+            ranked.append((abs(to_goal - to_start), row, to_goal))
+        ranked.sort(key=lambda entry: entry[0], reverse=True)
+        return [(row, to_goal) for _, row, to_goal in ranked[:ACTIVE_LANDMARKS]]
+
+    def bound(self, node: int, active: List[Tuple[array, int]]) -> int:
+        # lower bound on the hops from node to the goal -- node has to be in the start's component
+        best = 0
+        for row, to_goal in active:
+            gap = to_goal - row[node]
+            if gap < 0:
+                gap = -gap
+            if gap > best:
+                best = gap
+        return best
+
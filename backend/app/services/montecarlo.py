@@ -0,0 +1,185 @@
+# monte carlo capacity planning -- fans many independent headless runs out over a process pool
+# and merges the per-seed KPIs into distributions per scenario (fleet size, capacity, cooldown, arrival rate).
+# the grid graph and its distance table are built once in the parent and handed to each worker at startup,
+# so no worker ever touches the db or rebuilds the table
+#
+#   python -m app.services.montecarlo --bots 3 5 8 --arrival-rates 0.2 0.5 --seeds 20 --ticks 2000
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.services.grid_graph import GridGraph
+from app.services.headless import OrderArrival, fresh_fleet, nearest_rank_percentile, run_headless
+
+# KPIs that get summarised across seeds
+DISTRIBUTION_KPIS = (
+    "deliveries",
+    "undelivered",
+    "mean_delivery_ticks",
+    "p95_delivery_ticks",
+    "bot_utilization",
+    "distance_travelled",
+)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    bots: int = settings.TOTAL_BOTS
+    max_capacity: int = settings.MAX_BOT_CAPACITY
+    cooldown_ticks: int = settings.RESTAURANT_COOLDOWN_TICKS
+    # mean orders per tick (poisson)
+    arrival_rate: float = 0.3
+    ticks: int = 1000
+    seed: int = 0
+    dispatch_mode: Optional[str] = None
+
+    def key(self) -> tuple:
+        # everything except the seed -- runs sharing a key get merged into one distribution
+        return (self.bots, self.max_capacity, self.cooldown_ticks, self.arrival_rate, self.ticks, self.dispatch_mode)
+
+
+def scenario_grid(
+    bots: List[int],
+    capacities: List[int],
+    cooldowns: List[int],
+    arrival_rates: List[float],
+    seeds: int,
+    ticks: int,
+    dispatch_mode: Optional[str] = None,
+) -> List[Scenario]:
+    # full cross product of the knobs, `seeds` runs each
+    return [
+        Scenario(b, c, cd, rate, ticks, seed, dispatch_mode)
+        for b, c, cd, rate in itertools.product(bots, capacities, cooldowns, arrival_rates)
+        for seed in range(seeds)
+    ]
+
+
+def generate_arrivals(graph: GridGraph, rate: float, ticks: int, seed: int) -> List[OrderArrival]:
+    # poisson arrivals per tick, random restaurant and random delivery point -- deterministic per seed
+    rng = random.Random(seed)
+    restaurant_ids = [restaurant_id for restaurant_id, _, _ in graph.restaurants]
+    delivery_ids = graph.delivery_point_ids()
+    if not restaurant_ids or not delivery_ids or rate <= 0:
+        return []
+
+    threshold = math.exp(-rate)
+    arrivals = []
+    for tick in range(1, ticks + 1):
+        # knuth's method -- fine for the small per-tick rates we deal with
+        count, p = 0, rng.random()
+        while p > threshold:
+            count += 1
+            p *= rng.random()
+        for _ in range(count):
+            arrivals.append(OrderArrival(tick, rng.choice(restaurant_ids), rng.choice(delivery_ids)))
+    return arrivals
+
+
+def run_scenario(graph: GridGraph, scenario: Scenario) -> Dict:
+    bots = fresh_fleet(graph, [(None, scenario.max_capacity)] * scenario.bots)
+    arrivals = generate_arrivals(graph, scenario.arrival_rate, scenario.ticks, scenario.seed)
+    kpis = run_headless(
+        graph,
+        bots,
+        arrivals,
+        scenario.ticks,
+        dispatch_mode=scenario.dispatch_mode,
+        restaurant_cooldown_ticks=scenario.cooldown_ticks,
+    )
+    return {"scenario": asdict(scenario), "kpis": kpis}
+
+
+# set once per worker process by the pool initializer
+_worker_graph: Optional[GridGraph] = None
+
+
+def _init_worker(graph: GridGraph):
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _run_in_worker(scenario: Scenario) -> Dict:
+    return run_scenario(_worker_graph, scenario)
+
+
+def run_scenarios(graph: GridGraph, scenarios: List[Scenario], max_workers: Optional[int] = None) -> Dict:
+    # build the expensive bits before the pool starts so workers inherit them instead of redoing them
+    if 0 < graph.size <= settings.DISTANCE_TABLE_MAX_NODES:
+        graph.distance_table()
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1:
+        runs = [run_scenario(graph, scenario) for scenario in scenarios]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(graph,)) as pool:
+            runs = list(pool.map(_run_in_worker, scenarios, chunksize=max(1, len(scenarios) // (workers * 4))))
+
+    return {"scenarios": merge_runs(scenarios, runs), "runs": runs}
+
+
+def merge_runs(scenarios: List[Scenario], runs: List[Dict]) -> List[Dict]:
+    # one entry per scenario key, each KPI summarised over its seeds
+    grouped: Dict[tuple, List[Dict]] = {}
+    params: Dict[tuple, Dict] = {}
+    for scenario, run in zip(scenarios, runs):
+        grouped.setdefault(scenario.key(), []).append(run["kpis"])
+        if scenario.key() not in params:
+            params[scenario.key()] = {k: v for k, v in asdict(scenario).items() if k != "seed"}
+
+    merged = []
+    for key, kpi_runs in grouped.items():
+        summary = {}
+        for name in DISTRIBUTION_KPIS:
+            values = sorted(k[name] for k in kpi_runs if k[name] is not None)
+            summary[name] = {
+                "mean": round(sum(values) / len(values), 4) if values else None,
+                "min": values[0] if values else None,
+                "p50": nearest_rank_percentile(values, 0.5),
+                "p95": nearest_rank_percentile(values, 0.95),
+                "max": values[-1] if values else None,
+            }
+        merged.append({**params[key], "runs": len(kpi_runs), "kpis": summary})
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo fleet sizing over the current grid")
+    parser.add_argument("--bots", type=int, nargs="+", default=[settings.TOTAL_BOTS])
+    parser.add_argument("--capacities", type=int, nargs="+", default=[settings.MAX_BOT_CAPACITY])
+    parser.add_argument("--cooldowns", type=int, nargs="+", default=[settings.RESTAURANT_COOLDOWN_TICKS])
+    parser.add_argument("--arrival-rates", type=float, nargs="+", default=[0.3])
+    parser.add_argument("--seeds", type=int, default=10)
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--dispatch-mode", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--include-runs", action="store_true", help="also print every individual run")
+    args = parser.parse_args()
+
+    # only the parent touches the db, once
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        graph = GridGraph.from_db(db)
+    finally:
+        db.close()
+
+    scenarios = scenario_grid(
+        args.bots, args.capacities, args.cooldowns, args.arrival_rates, args.seeds, args.ticks, args.dispatch_mode
+    )
+    result = run_scenarios(graph, scenarios, args.workers)
+    if not args.include_runs:
+        del result["runs"]
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# order status feed -- every order transition is pushed to GET /api/orders/stream, and every order write
+# (status or not) bumps the version behind the order list/history etags, so clients don't have to poll for progress.
+# on postgres the triggers pg_notify each change (migrations 003 and 005) and one LISTEN connection per process
+# picks them up -- that covers changes made by other workers, scripts or psql too. anywhere else (sqlite test
+# runs) the feed is driven by the simulation engine's change hook instead
+
+import hashlib
+import itertools
+import json
+import logging
+import select
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.models.order import OrderStatus
+from app.services.broadcaster import DeltaBroadcaster
+from app.services.fleet_state import BotState, OrderState
+from app.services.simulation import add_service_listener
+
+logger = logging.getLogger("eagroute")
+
+ORDER_STATUS_CHANNEL = "order_status"
+# every other order update -- payload is just the id, it only bumps the etag version
+ORDER_CHANGED_CHANNEL = "order_changed"
+# how long the listener blocks waiting for notifications before checking whether it should stop
+LISTEN_POLL_SECONDS = 1.0
+RECONNECT_SECONDS = 5.0
+
+
+class OrderEventHub:
+    # one per process (order_events below); the stream endpoint and etag helpers in routers/orders.py read from it
+
+    def __init__(self):
+        self.broadcaster = DeltaBroadcaster()
+        # "notify" (postgres LISTEN), "local" (engine hook) or None until start() -- etags are only handed out once started
+        self.mode: Optional[str] = None
+        # etags carry a per-process token so a version number from before a restart can never match
+        self._boot = uuid.uuid4().hex[:8]
+        self._versions = itertools.count(1)
+        self.version = 0
+        # local mode only: last status seen per active order, to fill in old_status
+        self._known: Dict[int, OrderStatus] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def etag(self, view: str) -> Optional[str]:
+        # view is the normalized request (path + sorted query) -- it's hashed in, so two different
+        # queries never share an etag even at the same version
+        if self.mode is None:
+            return None
+        digest = hashlib.sha1(view.encode()).hexdigest()[:12]
+        return f'W/"{self._boot}-{self.version}-{digest}"'
+
+    def start(self, engine, loop):
+        self.broadcaster.bind(loop)
+        self._known.clear()
+        if engine.dialect.name != "postgresql":
+            self.mode = "local"
+            return
+
+        self.mode = "notify"
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, args=(engine,), name="order-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=LISTEN_POLL_SECONDS * 2)
+            self._thread = None
+        self.mode = None
+
+    def invalidate(self):
+        # next order list/history request gets a fresh etag
+        self.version = next(self._versions)
+
+    def resync(self):
+        # for bulk writes no per-order event describes (e.g. /simulation/reset) -- viewers get a fresh snapshot
+        self.invalidate()
+        self._known.clear()
+        self.broadcaster.resync_all()
+
+    def publish(self, events: List[Dict]):
+        if not events:
+            return
+        self.invalidate()
+        self.broadcaster.publish("status", {"events": events})
+
+    def engine_changed(self, service, bots: List[BotState], orders: List[OrderState]):
+        # simulation listener -- runs in every mode so this process's own writes invalidate straight away,
+        # but only publishes in local mode (on postgres the triggers already report them)
+        if not orders:
+            return
+        self.invalidate()
+        if self.mode != "local":
+            return
+
+        events = []
+        now = datetime.utcnow()
+        for order in orders:
+            previous = self._known.get(order.id)
+            if order.is_active:
+                self._known[order.id] = order.status
+            else:
+                self._known.pop(order.id, None)
+            if previous == order.status:
+                continue
+            events.append({
+                "order_id": order.id,
+                "old_status": previous.value if previous else None,
+                "new_status": order.status.value,
+                "bot_id": order.bot_id,
+                "changed_at": now,
+            })
+        self.publish(events)
+
+    def _listen(self, engine):
+        # one dedicated connection, detached from the pool so it never gets handed to a request
+        while not self._stop.is_set():
+            try:
+                raw = engine.raw_connection()
+            except Exception as exc:
+                logger.warning(f"Order event listener could not connect: {exc}")
+                self._stop.wait(RECONNECT_SECONDS)
+                continue
+
+            raw.detach()
+            try:
+                conn = raw.driver_connection
+                conn.autocommit = True
+                cursor = conn.cursor()
+                cursor.execute(f"LISTEN {ORDER_STATUS_CHANNEL}")
+                cursor.execute(f"LISTEN {ORDER_CHANGED_CHANNEL}")
+                cursor.close()
+                # whatever changed while we weren't listening is unknown -- start everyone over
+                self.resync()
+                logger.info(f"Listening for order status changes on '{ORDER_STATUS_CHANNEL}'")
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    # a tick can move many orders at once -- drain them all into one frame
+                    events = []
+                    while conn.notifies:
+                        notice = conn.notifies.pop(0)
+                        if notice.channel == ORDER_CHANGED_CHANNEL:
+                            self.invalidate()
+                            continue
+                        try:
+                            events.append(json.loads(notice.payload))
+                        except ValueError:
+                            logger.warning(f"Ignoring malformed order notification: {notice.payload!r}")
+                    self.publish(events)
+            except Exception as exc:
+                logger.warning(f"Order event listener dropped: {exc}")
+                self._stop.wait(RECONNECT_SECONDS)
+            finally:
+                raw.close()
+
+
+order_events = OrderEventHub()
+add_service_listener(order_events.engine_changed)
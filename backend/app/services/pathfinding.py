@@ -4,103 +4,163 @@ import heapq
 from typing import Dict, List, Optional, Set, Tuple
 from sqlalchemy.orm import Session
 
-from app.models import Node, BlockedEdge
+from app.config import settings
+from app.services.distance_fields import DistanceFields
+from app.services.distance_table import DistanceTable
+from app.services.grid_graph import GridGraph, get_grid_graph
+from app.services.hierarchy import ClusterHierarchy
+from app.services.landmarks import LandmarkTable
+
+PATHFINDING_MODES = ("astar", "hierarchical")
 
 
 class PathfindingService:
-    # uses manhattan distance as the a* heuristic and caches the graph so we don't reload it every time
+    # a* over the shared grid graph -- manhattan distance tightened by landmark bounds as the heuristic --
+    # and the all-pairs table as the fast path when the map is small enough for one
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Optional[Session] = None, graph: Optional[GridGraph] = None, mode: Optional[str] = None):
         self.db = db
-        self._nodes: Dict[int, Tuple[int, int]] = {}
-        self._coord_to_node: Dict[Tuple[int, int], int] = {}
-        self._blocked_edges: Set[Tuple[int, int]] = set()
+        self._graph = graph
+        self.mode = mode or settings.PATHFINDING_MODE
+        if self.mode not in PATHFINDING_MODES:
+            raise ValueError(f"Unknown pathfinding mode: {self.mode}")
+        self._table: Optional[DistanceTable] = None
+        self._hierarchy: Optional[ClusterHierarchy] = None
+        self._landmarks: Optional[LandmarkTable] = None
+        self._fields: Optional[DistanceFields] = None
         self._loaded = False
 
     def _load_grid(self):
-        # lazy-loads the grid from the db on first use so we don't hit it unnecessarily
+        # picks up the process-wide graph -- it only touches the db if startup never loaded one
         if self._loaded:
             return
 
-        nodes = self.db.query(Node).all()
-        for node in nodes:
-            self._nodes[node.id] = (node.x, node.y)
-            self._coord_to_node[(node.x, node.y)] = node.id
+        if self._graph is None:
+            self._graph = get_grid_graph(self.db)
 
-        # blocked edges are bidirectional, so store both directions for easy lookup
-        blocked = self.db.query(BlockedEdge).all()
-        for edge in blocked:
-            self._blocked_edges.add((edge.from_node_id, edge.to_node_id))
-            self._blocked_edges.add((edge.to_node_id, edge.from_node_id))
+        # small enough maps get the shared all-pairs table, bigger ones use a* (or hpa*) per query
+        if 0 < self._graph.size <= settings.DISTANCE_TABLE_MAX_NODES:
+            self._table = self._graph.distance_table()
+        elif self._graph.size:
+            if self.mode == "hierarchical":
+                self._hierarchy = self._graph.hierarchy()
+            if settings.ASTAR_LANDMARKS > 0:
+                self._landmarks = self._graph.landmarks()
+        if settings.DISTANCE_FIELDS and self._graph.size:
+            self._fields = self._graph.distance_fields()
 
         self._loaded = True
 
+    @property
+    def graph(self) -> GridGraph:
+        self._load_grid()
+        return self._graph
+
     def _get_neighbors(self, node_id: int) -> List[int]:
         # returns the 4 cardinal neighbors (up/down/left/right) that aren't blocked
-        if node_id not in self._nodes:
+        self._load_grid()
+        i = self._graph.index.get(node_id)
+        if i is None:
             return []
-
-        x, y = self._nodes[node_id]
-        neighbors = []
-
-        for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
-            nx, ny = x + dx, y + dy
-
-            if (nx, ny) in self._coord_to_node:
-                neighbor_id = self._coord_to_node[(nx, ny)]
-
-                if (node_id, neighbor_id) not in self._blocked_edges:
-                    neighbors.append(neighbor_id)
-
-        return neighbors
+        node_ids = self._graph.node_ids
+        return [node_ids[j] for j in self._graph.neighbors(i)]
 
     def _heuristic(self, node_id: int, goal_id: int) -> int:
-        # manhattan distance -- good fit for a grid where you can only move in 4 directions
-        if node_id not in self._nodes or goal_id not in self._nodes:
+        # manhattan distance -- good fit for a grid where you can only move in 4 directions --
+        # raised to the landmark bound when there is one (inf when the landmarks say it's unreachable)
+        start = self._graph.coords(node_id)
+        goal = self._graph.coords(goal_id)
+        if start is None or goal is None:
             return float('inf')
 
-        x1, y1 = self._nodes[node_id]
-        x2, y2 = self._nodes[goal_id]
-
-        return abs(x1 - x2) + abs(y1 - y2)
+        manhattan = abs(start[0] - goal[0]) + abs(start[1] - goal[1])
+        if self._landmarks is None:
+            return manhattan
+        node, goal_index = self._graph.index[node_id], self._graph.index[goal_id]
+        active = self._landmarks.for_query(node, goal_index)
+        return float('inf') if active is None else max(manhattan, self._landmarks.bound(node, active))
 
     def find_path(self, start_id: int, goal_id: int) -> Optional[List[int]]:
-        # classic a* search -- returns the list of node ids from start to goal, or None if no path exists
+        # returns the list of node ids from start to goal, or None if no path exists
         self._load_grid()
 
-        if start_id not in self._nodes or goal_id not in self._nodes:
+        if not self._graph.has_node(start_id) or not self._graph.has_node(goal_id):
             return None
 
         if start_id == goal_id:
             return [start_id]
 
-        open_set = [(0, start_id)]
+        if self._table is not None:
+            return self._table.path(start_id, goal_id)
+
+        # towards (or away from) a restaurant, delivery point or the station: walk its distance field
+        field = self._target_field(goal_id)
+        if field is not None:
+            return self._fields.descend(field, start_id)
+        field = self._target_field(start_id)
+        if field is not None:
+            path = self._fields.descend(field, goal_id)
+            return path[::-1] if path else None
+
+        start, goal = self._graph.index[start_id], self._graph.index[goal_id]
+        path = None
+        if self._hierarchy is not None:
+            path = self._hierarchy.find_path(start, goal)
+        if path is None:
+            # blocked edges along a cluster border can hide a connection from the abstract graph,
+            # so a miss there still gets the exact search before we call it unreachable
+            path = self._astar(start, goal)
+        if path is None:
+            return None
+        node_ids = self._graph.node_ids
+        return [node_ids[i] for i in path]
+
+    def _astar(self, start: int, goal: int) -> Optional[List[int]]:
+        # classic a* over node indices, walking the csr arrays directly
+        graph = self._graph
+        xs, ys = graph.xs, graph.ys
+        offsets, targets = graph.offsets, graph.targets
+        gx, gy = xs[goal], ys[goal]
+
+        landmarks = self._landmarks
+        active = None
+        h = abs(xs[start] - gx) + abs(ys[start] - gy)
+        if landmarks is not None:
+            active = landmarks.for_query(start, goal)
+            if active is None:
+                # the landmarks already know start and goal aren't connected -- no search needed
+                return None
+            h = max(h, landmarks.bound(start, active))
+
+        # (f, -g, node) -- on ties the deeper node goes first, so a tight heuristic dives straight for the goal
+        open_set = [(h, 0, start)]
         came_from: Dict[int, int] = {}
-        g_score: Dict[int, float] = {start_id: 0}
-        f_score: Dict[int, float] = {start_id: self._heuristic(start_id, goal_id)}
+        g_score: Dict[int, int] = {start: 0}
         closed_set: Set[int] = set()
 
         while open_set:
-            _, current = heapq.heappop(open_set)
+            _, _, current = heapq.heappop(open_set)
 
-            if current == goal_id:
+            if current == goal:
                 return self._reconstruct_path(came_from, current)
 
             if current in closed_set:
                 continue
             closed_set.add(current)
 
-            for neighbor in self._get_neighbors(current):
+            tentative_g = g_score[current] + 1
+            for k in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[k]
                 if neighbor in closed_set:
                     continue
 
-                tentative_g = g_score[current] + 1
-
                 if neighbor not in g_score or tentative_g < g_score[neighbor]:
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g
-                    f_score[neighbor] = tentative_g + self._heuristic(neighbor, goal_id)
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
+                    h = abs(xs[neighbor] - gx) + abs(ys[neighbor] - gy)
+                    if active:
+                        h = max(h, landmarks.bound(neighbor, active))
+                    heapq.heappush(open_set, (tentative_g + h, -tentative_g, neighbor))
 
         return None
 
@@ -113,12 +173,36 @@ class PathfindingService:
         path.reverse()
         return path
 
+    def _target_field(self, node_id: int):
+        return self._fields.field(node_id) if self._fields is not None else None
+
     def get_path_length(self, start_id: int, goal_id: int) -> Optional[int]:
+        self._load_grid()
+        if self._table is not None:
+            return self._table.distance(start_id, goal_id)
+
+        # the graph is undirected, so a field at either end will do
+        field = self._target_field(goal_id)
+        if field is not None:
+            return self._fields.gather(field, [start_id])[0]
+        field = self._target_field(start_id)
+        if field is not None:
+            return self._fields.gather(field, [goal_id])[0]
+
         path = self.find_path(start_id, goal_id)
         if path is None:
             return None
         return len(path) - 1
 
+    def distances_to(self, goal_id: int, start_ids: List[int]) -> List[Optional[int]]:
+        # hop counts from many starts to one goal (e.g. every candidate bot to a pickup) -- one gather over the
+        # goal's distance field when it has one, a query per start otherwise
+        self._load_grid()
+        field = self._target_field(goal_id)
+        if field is None:
+            return [self.get_path_length(start_id, goal_id) for start_id in start_ids]
+        return self._fields.gather(field, start_ids)
+
     def get_node_coords(self, node_id: int) -> Optional[Tuple[int, int]]:
         self._load_grid()
-        return self._nodes.get(node_id)
+        return self._graph.coords(node_id)
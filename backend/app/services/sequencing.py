@@ -0,0 +1,133 @@
+# pickup-and-delivery sequencing -- picks the stop order for everything a bot is carrying
+# instead of always chasing the nearest pickup and then the nearest drop-off one leg at a time
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.models.order import OrderStatus
+from app.services.fleet_state import OrderState
+
+# (node_id, 'PICKUP'|'DELIVER', order_id)
+Stop = Tuple[int, str, int]
+
+# exhaustive search is fine for a full 3-order bot (6 stops -> 90 feasible orderings);
+# past this many stops we fall back to nearest-feasible-stop so planning stays cheap
+MAX_EXACT_STOPS = 8
+
+
+def plan_tour(
+    start_node: int,
+    orders: List[OrderState],
+    distance: Callable[[int, int], Optional[int]],
+) -> List[Stop]:
+    # minimum total distance stop sequence where every pickup comes before its delivery.
+    # orders already picked up only need their delivery stop
+    pickups: Dict[int, Stop] = {}
+    deliveries: Dict[int, Stop] = {}
+    for order in orders:
+        if order.status == OrderStatus.ASSIGNED:
+            pickups[order.id] = (order.pickup_node_id, "PICKUP", order.id)
+            deliveries[order.id] = (order.delivery_node_id, "DELIVER", order.id)
+        elif order.status == OrderStatus.PICKED_UP:
+            deliveries[order.id] = (order.delivery_node_id, "DELIVER", order.id)
+
+    if not deliveries:
+        return []
+
+    cache: Dict[Tuple[int, int], Optional[int]] = {}
+
+    def leg(a: int, b: int) -> Optional[int]:
+        if (a, b) not in cache:
+            cache[(a, b)] = distance(a, b)
+        return cache[(a, b)]
+
+    stop_count = len(pickups) + len(deliveries)
+    if stop_count <= MAX_EXACT_STOPS:
+        best = _exact_tour(start_node, pickups, deliveries, leg)
+        if best is not None:
+            return best
+
+    return _nearest_feasible_tour(start_node, pickups, deliveries, leg)
+
+
+def _available_stops(pickups: Dict[int, Stop], deliveries: Dict[int, Stop], done: set) -> List[Stop]:
+    # a delivery only becomes available once its pickup (if it has one) is done
+    stops = [stop for order_id, stop in pickups.items() if stop not in done]
+    for order_id, stop in deliveries.items():
+        if stop in done:
+            continue
+        pickup = pickups.get(order_id)
+        if pickup is None or pickup in done:
+            stops.append(stop)
+    return stops
+
+
+def _exact_tour(
+    start_node: int,
+    pickups: Dict[int, Stop],
+    deliveries: Dict[int, Stop],
+    leg: Callable[[int, int], Optional[int]],
+) -> Optional[List[Stop]]:
+    # depth-first over precedence-feasible orderings with branch-and-bound on the best total so far
+    total_stops = len(pickups) + len(deliveries)
+    best_cost = [float('inf')]
+    best_tour: List[Optional[List[Stop]]] = [None]
+    done: set = set()
+    tour: List[Stop] = []
+
+    def search(node: int, cost: int):
+        if cost >= best_cost[0]:
+            return
+        if len(tour) == total_stops:
+            best_cost[0] = cost
+            best_tour[0] = list(tour)
+            return
+
+        for stop in _available_stops(pickups, deliveries, done):
+            d = leg(node, stop[0])
+            if d is None:
+                continue
+            done.add(stop)
+            tour.append(stop)
+            search(stop[0], cost + d)
+            tour.pop()
+            done.discard(stop)
+
+    search(start_node, 0)
+    return best_tour[0]
+
+
+def _nearest_feasible_tour(
+    start_node: int,
+    pickups: Dict[int, Stop],
+    deliveries: Dict[int, Stop],
+    leg: Callable[[int, int], Optional[int]],
+) -> List[Stop]:
+    # greedy fallback: keep heading for the nearest stop that's allowed next, skipping unreachable ones
+    done: set = set()
+    tour: List[Stop] = []
+    node = start_node
+
+    while True:
+        options = []
+        for stop in _available_stops(pickups, deliveries, done):
+            d = leg(node, stop[0])
+            if d is not None:
+                options.append((d, stop))
+        if not options:
+            return tour
+        _, stop = min(options)
+        done.add(stop)
+        tour.append(stop)
+        node = stop[0]
+
+
+def tour_length(start_node: int, tour: List[Stop], distance: Callable[[int, int], Optional[int]]) -> Optional[int]:
+    total = 0
+    node = start_node
+    for stop in tour:
+        d = distance(node, stop[0])
+        if d is None:
+            return None
+        total += d
+        node = stop[0]
+    return total
@@ -1,218 +1,539 @@
 # the heart of the delivery simulation -- runs tick by tick
-# each tick: assign orders -> calculate routes -> move bots -> handle pickups/deliveries
-
-from typing import Dict, List, Optional
+# each tick: assign orders -> sequence stops + calculate routes -> move bots -> handle pickups/deliveries
+# the service is long-lived: bots, active orders, routes and targets stay in memory between ticks,
+# and only the rows that changed get written back to the db in one bulk flush at the end of a tick
+
+import heapq
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Set
 from datetime import datetime
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
-from app.models import Bot, Order, Node, Restaurant
+from app.models import Bot, Order
 from app.models.bot import BotStatus
 from app.config import settings
 from app.models.order import OrderStatus
+from app.services.admission import SlidingWindowLimiter
+from app.services.assignment import INF, min_cost_assignment
+from app.services.fleet_state import BotState, OrderState, ACTIVE_ORDER_STATUSES, CARRIED_ORDER_STATUSES
+from app.services.grid_graph import GridGraph, get_grid_graph
 from app.services.pathfinding import PathfindingService
+from app.services.sequencing import Stop, plan_tour
+from app.services.spacetime import ReservationTable, SpaceTimePlanner
+from app.services.spatial_index import BotSpatialIndex
+
+logger = logging.getLogger("eagroute")
 
 # Restaurants have a cooldown period: 3 orders every 30 seconds
 # so each restaurant can only accept 3 orders within a 30-tick window
 RESTAURANT_ORDER_LIMIT = settings.MAX_RESTAURANT_ORDERS
 RESTAURANT_COOLDOWN_TICKS = settings.RESTAURANT_COOLDOWN_TICKS
 
+# "greedy" = nearest bot per order in arrival order, "batch" = min-cost matching over the whole pending set
+DISPATCH_MODES = ("greedy", "batch")
+BATCH_SLOT_TIE_BREAK = 1e-3
 
-class SimulationService:
 
-    # class-level state so it persists between service instantiations across ticks
-    _tick_counter: int = 0
-    _restaurant_order_log: Dict[int, List[int]] = {}
+class SimulationService:
 
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Optional[Session] = None,
+        graph: Optional[GridGraph] = None,
+        dispatch_mode: Optional[str] = None,
+        restaurant_order_limit: Optional[int] = None,
+        restaurant_cooldown_ticks: Optional[int] = None,
+        collision_avoidance: Optional[bool] = None,
+    ):
         self.db = db
-        self.pathfinder = PathfindingService(db)
+        self.dispatch_mode = dispatch_mode or settings.DISPATCH_MODE
+        if self.dispatch_mode not in DISPATCH_MODES:
+            raise ValueError(f"Unknown dispatch mode: {self.dispatch_mode}")
+        # if nobody handed us a graph we follow the shared one, including runtime edge changes
+        self._follows_shared_graph = graph is None
+        self.graph = graph or get_grid_graph(db)
+        self.pathfinder = PathfindingService(db, self.graph)
+
+        self.bots: Dict[int, BotState] = {}
+        self.orders: Dict[int, OrderState] = {}
+        self._dirty_bots: Set[int] = set()
+        self._dirty_orders: Set[int] = set()
+
         self._bot_routes: Dict[int, List[int]] = {}
-        # each target is (node_id, 'PICKUP'|'DELIVER', order_id)
+        # each target is (node_id, 'PICKUP'|'DELIVER'|'STATION', order_id)
         self._bot_targets: Dict[int, tuple] = {}
-        
-        # central station node (4,3)
-        self.station_node = self.db.query(Node).filter(Node.x == 4, Node.y == 3).first()
-        self.station_node_id = self.station_node.id if self.station_node else None
-
-    def tick(self) -> Dict:
-        SimulationService._tick_counter += 1
-
-        results = {
-            "orders_assigned": 0,
-            "orders_picked_up": 0,
-            "orders_delivered": 0,
-            "bots_moved": 0,
-        }
-
-        # phase 1: match pending orders to available bots
-        results["orders_assigned"] = self._assign_pending_orders()
-        # phase 2: figure out where each bot needs to go next
-        self._calculate_bot_routes()
-
-        # phase 3: move bots one step and handle any arrivals (pickups/deliveries)
-        # No waiting time at pick up location or destination location
-        move_results = self._move_bots()
-        results["bots_moved"] = move_results["moved"]
-        results["orders_picked_up"] = move_results["picked_up"]
-        results["orders_delivered"] = move_results["delivered"]
-
-        return results
-
-    def _get_restaurant_orders_in_window(self, restaurant_id: int) -> int:
-        # checks how many orders this restaurant got assigned in the last N ticks
-        current_tick = SimulationService._tick_counter
-        log = SimulationService._restaurant_order_log.get(restaurant_id, [])
+        # full multi-stop plan per bot, plus the order set it was sequenced for
+        self._bot_plans: Dict[int, List[Stop]] = {}
+        self._bot_plan_orders: Dict[int, frozenset] = {}
+
+        # collision-avoidance mode: routes come from the cooperative space-time planner instead of plain a*,
+        # and each route is only guaranteed conflict-free up to its horizon tick (replanned before it gets there)
+        self.collision_avoidance = settings.COLLISION_AVOIDANCE if collision_avoidance is None else collision_avoidance
+        self.collision_window = max(settings.COLLISION_WINDOW_TICKS, 2)
+        self.collision_max_expansions = settings.COLLISION_MAX_EXPANSIONS
+        self._route_horizon: Dict[int, int] = {}
+
+        # where every bot stands, for nearest-bot queries -- built on first use, then kept current as bots move
+        self._bot_index: Optional[BotSpatialIndex] = None
+        self._indexed_bots: Optional[Dict[int, BotState]] = None
+
+        self._tick_counter = 0
+        # overridable per engine so what-if runs can try other restaurant limits
+        # (None means default -- a limit of 0 is a real setting, a restaurant that takes no orders)
+        self.restaurant_order_limit = RESTAURANT_ORDER_LIMIT if restaurant_order_limit is None else restaurant_order_limit
+        self.restaurant_cooldown_ticks = (
+            RESTAURANT_COOLDOWN_TICKS if restaurant_cooldown_ticks is None else restaurant_cooldown_ticks
+        )
+        # same sliding window as the api's admission control, but counted in ticks
+        self._restaurant_window = SlidingWindowLimiter(
+            self.restaurant_order_limit, self.restaurant_cooldown_ticks, clock=lambda: self._tick_counter
+        )
+
+        # ticks, http hooks and the positions endpoint can all come in from different threads
+        self.lock = threading.RLock()
+
+        # called with (service, changed bots, changed orders) after every flush and http hook, while holding the lock
+        self.listeners: List[Callable[["SimulationService", List[BotState], List[OrderState]], None]] = []
+
+        # central station node (STATION_X, STATION_Y)
+        self.station_node_id = self.graph.station_node_id()
+
+        if db is not None:
+            self.load(db)
+
+    def load(self, db: Session):
+        # pulls bots and in-flight orders into memory -- done once, after that the engine owns them
+        with self.lock:
+            self.bots = {bot.id: BotState.from_model(bot) for bot in db.query(Bot).all()}
+            active = db.query(Order).filter(Order.status.in_(ACTIVE_ORDER_STATUSES)).all()
+            self.orders = {order.id: OrderState.from_model(order) for order in active}
+            self._dirty_bots.clear()
+            self._dirty_orders.clear()
+
+    def tick(self, db: Optional[Session] = None) -> Dict:
+        with self.lock:
+            self._sync_graph()
+            self._tick_counter += 1
+
+            results = {
+                "orders_assigned": 0,
+                "orders_picked_up": 0,
+                "orders_delivered": 0,
+                "bots_moved": 0,
+            }
+
+            # phase 1: match pending orders to available bots
+            results["orders_assigned"] = self._assign_pending_orders()
+            # phase 2: sequence each bot's stops and route it to the next one
+            self._calculate_bot_routes()
+
+            # phase 3: move bots one step and handle any arrivals (pickups/deliveries)
+            # No waiting time at pick up location or destination location
+            move_results = self._move_bots()
+            results["bots_moved"] = move_results["moved"]
+            results["orders_picked_up"] = move_results["picked_up"]
+            results["orders_delivered"] = move_results["delivered"]
+
+            # phase 4: one bulk write for everything that changed this tick
+            self.flush(db or self.db)
+
+            return results
+
+    def flush(self, db: Optional[Session]):
+        # write-behind: bulk update the dirty bots/orders by primary key, then forget finished orders
+        with self.lock:
+            if db is not None and (self._dirty_bots or self._dirty_orders):
+                bot_rows = [self.bots[bot_id].to_row() for bot_id in self._dirty_bots if bot_id in self.bots]
+                order_rows = [self.orders[order_id].to_row() for order_id in self._dirty_orders if order_id in self.orders]
+                if bot_rows:
+                    db.execute(update(Bot), bot_rows)
+                if order_rows:
+                    db.execute(update(Order), order_rows)
+                db.commit()
+
+            if self.listeners and (self._dirty_bots or self._dirty_orders):
+                self._notify(
+                    [self.bots[bot_id] for bot_id in self._dirty_bots if bot_id in self.bots],
+                    [self.orders[order_id] for order_id in self._dirty_orders if order_id in self.orders],
+                )
 
-        # toss out anything outside the cooldown window
-        recent = [t for t in log if current_tick - t < RESTAURANT_COOLDOWN_TICKS]
-        SimulationService._restaurant_order_log[restaurant_id] = recent
-        return len(recent)
+            self._dirty_bots.clear()
+            self._dirty_orders.clear()
+            for order_id in [o.id for o in self.orders.values() if not o.is_active]:
+                del self.orders[order_id]
 
-    def _log_restaurant_order(self, restaurant_id: int):
-        current_tick = SimulationService._tick_counter
-        if restaurant_id not in SimulationService._restaurant_order_log:
-            SimulationService._restaurant_order_log[restaurant_id] = []
-        SimulationService._restaurant_order_log[restaurant_id].append(current_tick)
+    def _sync_graph(self):
+        # picks up a graph that was swapped out from under us (e.g. reloaded) without a repair call
+        if not self._follows_shared_graph:
+            return
+        shared = get_grid_graph(self.db)
+        if shared is not self.graph:
+            self.graph = shared
+            self.pathfinder = PathfindingService(self.db, shared)
+            self._bot_routes.clear()
+            self._bot_targets.clear()
+            self._bot_plans.clear()
+            self._bot_plan_orders.clear()
+            self._route_horizon.clear()
+
+    def _notify(self, bots: List[BotState], orders: List[OrderState]):
+        for listener in self.listeners:
+            try:
+                listener(self, bots, orders)
+            except Exception as exc:
+                # a broken viewer feed must never take the simulation down with it
+                logger.error(f"Simulation listener failed: {exc}")
+
+    def _bot_positions(self) -> BotSpatialIndex:
+        # rebuilt only when the bots dict or the graph got swapped out (load, headless runs, graph changes) --
+        # otherwise _move_bots and sync_bot keep it current one bot at a time
+        index = self._bot_index
+        if index is None or index.graph is not self.graph or self._indexed_bots is not self.bots:
+            index = BotSpatialIndex(self.graph, settings.BOT_INDEX_BUCKET_SIZE)
+            for bot in self.bots.values():
+                index.move(bot.id, bot.current_node_id)
+            self._bot_index = index
+            self._indexed_bots = self.bots
+        return index
+
+    def _reindex(self, bot: BotState):
+        if self._bot_index is not None and self._indexed_bots is self.bots:
+            self._bot_index.move(bot.id, bot.current_node_id)
+
+    def _mark_bot(self, bot: BotState):
+        self._dirty_bots.add(bot.id)
+
+    def _mark_order(self, order: OrderState):
+        self._dirty_orders.add(order.id)
+
+    def _orders_by_bot(self) -> Dict[int, List[OrderState]]:
+        # groups the carried orders by bot once per phase instead of filtering per bot
+        by_bot: Dict[int, List[OrderState]] = {}
+        for order in self.orders.values():
+            if order.bot_id is not None and order.status in CARRIED_ORDER_STATUSES:
+                by_bot.setdefault(order.bot_id, []).append(order)
+        return by_bot
+
+    def _assign_order(self, order: OrderState, bot: BotState):
+        order.bot_id = bot.id
+        order.status = OrderStatus.ASSIGNED
+        order.assigned_at = datetime.utcnow()
+        self._mark_order(order)
+
+        if bot.status == BotStatus.IDLE:
+            bot.status = BotStatus.MOVING
+            self._mark_bot(bot)
 
     def _assign_pending_orders(self) -> int:
-        # finds the closest available bot for each pending order
+        pending_orders = sorted(
+            (o for o in self.orders.values() if o.status == OrderStatus.PENDING),
+            key=lambda o: o.id,
+        )
+        if not pending_orders:
+            return 0
+
+        if self.dispatch_mode == "batch":
+            return self._assign_batch(pending_orders)
+        return self._assign_greedy(pending_orders)
+
+    def _assign_greedy(self, pending_orders: List[OrderState]) -> int:
+        # finds the closest available bot for each pending order, one order at a time
         assigned = 0
 
-        pending_orders = self.db.query(Order).filter(
-            Order.status == OrderStatus.PENDING
-        ).all()
+        # current load per bot, bumped as we go so we don't blow past capacity within one tick
+        loads = self.active_order_counts()
+        positions = self._bot_positions()
 
-        # we track how many orders we assign to each bot THIS tick so we don't
-        # accidentally blow past their capacity by assigning multiple in one loop
-        extra_assignments: Dict[int, int] = {}
+        def available(bot_id: int) -> bool:
+            bot = self.bots[bot_id]
+            return bot.status in (BotStatus.IDLE, BotStatus.MOVING) and loads.get(bot_id, 0) < bot.max_capacity
 
         for order in pending_orders:
             # enforced restaurant rate limit (3 orders / 30 seconds)
-            if self._get_restaurant_orders_in_window(order.restaurant_id) >= RESTAURANT_ORDER_LIMIT:
+            if not self._restaurant_window.room(order.restaurant_id):
                 continue
 
-            available_bots = self.db.query(Bot).filter(
-                Bot.status.in_([BotStatus.IDLE, BotStatus.MOVING])
-            ).all()
+            # bots come closest-first by manhattan distance, which the real path can only match or exceed.
+            # the closest one's real distance caps the winner's, so everyone whose bound is within that cap
+            # gets scored in one gather over the pickup's distance field -- nobody further out can win
+            nearest = positions.nearest(order.pickup_node_id, available)
+            closest = next(nearest, None)
+            if closest is None:
+                continue
+            cap = self.pathfinder.distances_to(order.pickup_node_id, [self.bots[closest[1]].current_node_id])[0]
+            candidates = [self.bots[closest[1]]]
+            for lower_bound, bot_id in nearest:
+                if cap is not None and lower_bound > cap:
+                    break
+                candidates.append(self.bots[bot_id])
+            found = self.pathfinder.distances_to(order.pickup_node_id, [bot.current_node_id for bot in candidates])
 
             best_bot = None
-            best_distance = float('inf')
-
-            for bot in available_bots:
-                # count orders already committed in the db
-                db_orders = self.db.query(Order).filter(
-                    Order.bot_id == bot.id,
-                    Order.status.in_([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP])
-                ).count()
-
-                # plus any we just assigned this tick that haven't been committed yet
-                pending_extra = extra_assignments.get(bot.id, 0)
-                total_orders = db_orders + pending_extra
-
-                if total_orders >= bot.max_capacity:
+            best_distance = INF
+            for bot, distance in zip(candidates, found):
+                if distance is None:
                     continue
-
-                if bot.current_node_id:
-                    distance = self.pathfinder.get_path_length(
-                        bot.current_node_id,
-                        order.pickup_node_id
-                    )
-                    if distance is not None and distance < best_distance:
-                        best_distance = distance
-                        best_bot = bot
+                # equal distances go to the lower bot id
+                if distance < best_distance or (distance == best_distance and bot.id < best_bot.id):
+                    best_distance = distance
+                    best_bot = bot
 
             if best_bot:
-                order.bot_id = best_bot.id
-                order.status = OrderStatus.ASSIGNED
-                order.assigned_at = datetime.utcnow()
+                self._assign_order(order, best_bot)
+                loads[best_bot.id] = loads.get(best_bot.id, 0) + 1
+                self._restaurant_window.record(order.restaurant_id)
+                assigned += 1
 
-                if best_bot.status == BotStatus.IDLE:
-                    best_bot.status = BotStatus.MOVING
+        return assigned
 
-                # remember this assignment so the next iteration sees it
-                extra_assignments[best_bot.id] = extra_assignments.get(best_bot.id, 0) + 1
-                self._log_restaurant_order(order.restaurant_id)
-                assigned += 1
+    def _assign_batch(self, pending_orders: List[OrderState]) -> int:
+        # assigns the whole pending set in one go: orders x free bot slots, solved as a min-cost matching
+        # on path distance, so a burst doesn't strand bots the way first-come-first-served greedy can
+
+        # restaurant window still applies -- each restaurant only gets as many candidates as it has room for
+        room: Dict[int, int] = {}
+        candidates: List[OrderState] = []
+        for order in pending_orders:
+            if order.restaurant_id not in room:
+                room[order.restaurant_id] = self._restaurant_window.room(order.restaurant_id)
+            if room[order.restaurant_id] > 0:
+                room[order.restaurant_id] -= 1
+                candidates.append(order)
+        if not candidates:
+            return 0
+
+        # one column per free capacity slot, never more slots per bot than there are candidates
+        loads = self.active_order_counts()
+        slots: List[BotState] = []
+        slot_costs: List[float] = []
+        for bot in sorted(self.bots.values(), key=lambda b: b.id):
+            if bot.status not in (BotStatus.IDLE, BotStatus.MOVING) or not bot.current_node_id:
+                continue
+            load = loads.get(bot.id, 0)
+            for k in range(min(bot.max_capacity - load, len(candidates))):
+                slots.append(bot)
+                # tiny nudge so equal distances go to the emptier bot first
+                slot_costs.append((load + k) * BATCH_SLOT_TIE_BREAK)
+        if not slots:
+            return 0
+
+        # distance from every bot to every distinct pickup -- one gather per pickup over the bots with slots
+        slot_bots = list({bot.id: bot for bot in slots}.values())
+        distances: Dict[int, Dict[int, float]] = {}
+        cost = []
+        for order in candidates:
+            pickup = order.pickup_node_id
+            if pickup not in distances:
+                found = self.pathfinder.distances_to(pickup, [bot.current_node_id for bot in slot_bots])
+                distances[pickup] = {
+                    bot.id: d if d is not None else INF for bot, d in zip(slot_bots, found)
+                }
+            row = [distances[pickup][bot.id] + slot_cost for bot, slot_cost in zip(slots, slot_costs)]
+            cost.append(row)
+
+        assigned = 0
+        for order, slot in zip(candidates, min_cost_assignment(cost)):
+            if slot is None:
+                continue
+            self._assign_order(order, slots[slot])
+            self._restaurant_window.record(order.restaurant_id)
+            assigned += 1
 
-        self.db.commit()
         return assigned
 
     def _calculate_bot_routes(self):
-        # figures out the next destination for each bot -- pickups first, then deliveries
-        bots = self.db.query(Bot).filter(
-            Bot.status.in_([BotStatus.MOVING, BotStatus.IDLE])
-        ).all()
+        # figures out the next destination for each bot -- carried orders follow a sequenced multi-stop plan,
+        # bots with nothing on board head back to the station
+        orders_by_bot = self._orders_by_bot()
+        # collision-avoidance mode collects (bot, target) here and plans them all together afterwards
+        needs: List[tuple] = []
+
+        for bot in self.bots.values():
+            if bot.status not in (BotStatus.MOVING, BotStatus.IDLE):
+                continue
+
+            orders = orders_by_bot.get(bot.id, [])
+            if orders:
+                self._sequence_if_changed(bot, orders)
+            else:
+                self._bot_plans.pop(bot.id, None)
+                self._bot_plan_orders.pop(bot.id, None)
 
-        for bot in bots:
             if bot.id in self._bot_routes and self._bot_routes[bot.id]:
+                if self.collision_avoidance and bot.id in self._bot_targets and self._needs_replan(bot.id):
+                    needs.append((bot, self._bot_targets[bot.id]))
                 continue
 
-            target_node = None
-            action = None
-            target_order = None
-
-            orders = self.db.query(Order).filter(
-                Order.bot_id == bot.id,
-                Order.status.in_([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP])
-            ).all()
+            target = None
 
             if not orders:
                 if bot.status != BotStatus.IDLE:
                     bot.status = BotStatus.IDLE
-                
+                    self._mark_bot(bot)
+
                 # if idle and not at station, go to station
                 if self.station_node_id and bot.current_node_id != self.station_node_id:
-                     target_node = self.station_node_id
-                     action = "STATION"
-                     target_order = None
-                     # crucial: must start moving!
-                     bot.status = BotStatus.MOVING
+                    target = (self.station_node_id, "STATION", None)
+                    # crucial: must start moving!
+                    bot.status = BotStatus.MOVING
+                    self._mark_bot(bot)
                 else:
                     continue
+            else:
+                target = self._next_stop(bot.id)
 
-            assigned_orders = [o for o in orders if o.status == OrderStatus.ASSIGNED]
-            picked_up_orders = [o for o in orders if o.status == OrderStatus.PICKED_UP]
-
-            if assigned_orders:
-                # head to the closest restaurant to pick up
-                closest_order = min(
-                    assigned_orders,
-                    key=lambda o: self.pathfinder.get_path_length(
-                        bot.current_node_id, o.pickup_node_id
-                    ) or float('inf')
-                )
-                target_node = closest_order.pickup_node_id
-                action = "PICKUP"
-                target_order = closest_order
-            elif picked_up_orders:
-                # all pickups done, head to the closest delivery point
-                closest_order = min(
-                    picked_up_orders,
-                    key=lambda o: self.pathfinder.get_path_length(
-                        bot.current_node_id, o.delivery_node_id
-                    ) or float('inf')
-                )
-                target_node = closest_order.delivery_node_id
-                action = "DELIVER"
-                target_order = closest_order
-
-            if target_node and bot.current_node_id:
-                path = self.pathfinder.find_path(bot.current_node_id, target_node)
+            if target and bot.current_node_id:
+                if self.collision_avoidance:
+                    needs.append((bot, target))
+                    continue
+                path = self.pathfinder.find_path(bot.current_node_id, target[0])
                 if path:
                     self._bot_routes[bot.id] = path[1:] if len(path) > 1 else []
-                    self._bot_targets[bot.id] = (target_node, action, target_order.id if target_order else None)
+                    self._bot_targets[bot.id] = target
+
+        if needs:
+            self._plan_cooperative(needs, orders_by_bot)
+
+    def _needs_replan(self, bot_id: int) -> bool:
+        # a route that runs past its collision-checked horizon gets re-planned once less than half a window is left
+        horizon = self._route_horizon.get(bot_id)
+        if horizon is None:
+            return True
+        last_tick = self._tick_counter + len(self._bot_routes[bot_id]) - 1
+        return last_tick > horizon and horizon - self._tick_counter < self.collision_window // 2
+
+    def _plan_cooperative(self, needs: List[tuple], orders_by_bot: Dict[int, List[OrderState]]):
+        # prioritized planning: bots standing still and everyone who keeps their route book first, then the bots
+        # that need one are planned one at a time (carrying > assigned > heading home), each around what's been
+        # booked so far. route[k] is where the bot will be on tick + k, same as the plain routes.
+        # a bot that can't move holds its node for the whole window, and anyone booked through it is planned
+        # again around it -- it physically can't get out of their way, so they have to get out of its
+        first_tick = self._tick_counter
+        window = self.collision_window
+        index = self.graph.index
+        station = index.get(self.station_node_id)
+        reservations = ReservationTable(exempt=[station] if station is not None else [])
+        planner = SpaceTimePlanner(self.pathfinder, window, self.collision_max_expansions)
+        targets = {bot.id: target for bot, target in needs}
+
+        kept = []
+        for bot in self.bots.values():
+            current = index.get(bot.current_node_id)
+            if current is None:
+                continue
+            if bot.id in targets:
+                # hold the spot for one tick, in case it ends up having to wait
+                reservations.reserve_node(current, first_tick, bot.id)
+            elif self._bot_routes.get(bot.id) and bot.status == BotStatus.MOVING:
+                kept.append(bot)
+            else:
+                # parked with nowhere to go -- it stays put for the whole window
+                reservations.hold(bot.id, current, first_tick, window)
+
+        def priority(bot_id: int) -> tuple:
+            orders = orders_by_bot.get(bot_id, [])
+            carrying = any(o.status == OrderStatus.PICKED_UP for o in orders)
+            return (not carrying, not orders, bot_id)
+
+        queue = [(priority(bot_id), bot_id) for bot_id in targets]
+        heapq.heapify(queue)
+        queued = set(targets)
+
+        def requeue(displaced: Set[int]):
+            for bot_id in displaced:
+                target = targets.get(bot_id) or self._bot_targets.get(bot_id)
+                if target is None or bot_id in queued:
+                    continue
+                targets[bot_id] = target
+                queued.add(bot_id)
+                heapq.heappush(queue, (priority(bot_id), bot_id))
+
+        for bot in kept:
+            current = index[bot.current_node_id]
+            route = self._bot_routes[bot.id]
+            # only the checked part -- whatever lies past the horizon gets re-planned before the bot gets there
+            horizon = self._route_horizon.get(bot.id, first_tick + len(route) - 1)
+            checked = [index[n] for n in route[:max(horizon - first_tick + 1, 0)]]
+            if reservations.path_free(bot.id, current, checked, first_tick):
+                parks = window if len(checked) == len(route) else 0
+                reservations.reserve_path(bot.id, current, checked, first_tick, parks)
+            elif bot.id in self._bot_targets:
+                # someone parked or got stuck on it since it was planned -- back in the queue
+                requeue({bot.id})
+            else:
+                self._bot_routes[bot.id] = []
+                requeue(reservations.hold(bot.id, current, first_tick, window))
+
+        while queue:
+            _, bot_id = heapq.heappop(queue)
+            queued.discard(bot_id)
+            bot = self.bots[bot_id]
+            target = targets[bot_id]
+            current = index[bot.current_node_id]
+            reservations.release_node(current, first_tick, bot_id)
+            path = planner.plan(bot_id, bot.current_node_id, target[0], first_tick, reservations)
+
+            if path is None:
+                if self.pathfinder.get_path_length(bot.current_node_id, target[0]) is None:
+                    # unreachable, same as plain routing: no route, and it blocks its own node
+                    self._bot_routes[bot_id] = []
+                    self._route_horizon.pop(bot_id, None)
+                else:
+                    # boxed in (or out of search budget) this tick -- hold position and try again on the next one
+                    self._bot_routes[bot_id] = [bot.current_node_id]
+                    self._bot_targets[bot_id] = target
+                    self._route_horizon[bot_id] = first_tick
+                requeue(reservations.hold(bot_id, current, first_tick, window))
+                continue
+
+            checked = path[:window]
+            self._bot_routes[bot_id] = path
+            self._bot_targets[bot_id] = target
+            self._route_horizon[bot_id] = first_tick + len(checked) - 1
+            parks = window if len(checked) == len(path) else 0
+            reservations.reserve_path(bot_id, current, [index[n] for n in checked], first_tick, parks)
+
+    def _sequence_if_changed(self, bot: BotState, orders: List[OrderState]):
+        # re-plans the whole multi-stop tour, but only when the bot picked up new orders since the last plan --
+        # finished or cancelled orders just get skipped over in the existing plan
+        order_ids = frozenset(o.id for o in orders)
+        planned = self._bot_plan_orders.get(bot.id)
+        if planned is not None and order_ids <= planned:
+            return
+        if not bot.current_node_id:
+            return
 
-        self.db.commit()
+        self._bot_plans[bot.id] = plan_tour(bot.current_node_id, orders, self.pathfinder.get_path_length)
+        self._bot_plan_orders[bot.id] = order_ids
+
+        # if the new plan starts somewhere else, abandon the leg in progress
+        if self._bot_targets.get(bot.id) != self._next_stop(bot.id):
+            self._bot_targets.pop(bot.id, None)
+            self._bot_routes[bot.id] = []
+
+    def _next_stop(self, bot_id: int) -> Optional[Stop]:
+        # first stop in the plan that still needs doing -- drops the ones already handled (e.g. a pickup
+        # that happened early because two orders share a restaurant) or whose order went away
+        plan = self._bot_plans.get(bot_id, [])
+        while plan:
+            node_id, action, order_id = plan[0]
+            order = self.orders.get(order_id)
+            needed = OrderStatus.ASSIGNED if action == "PICKUP" else OrderStatus.PICKED_UP
+            if order is not None and order.bot_id == bot_id and order.status == needed:
+                return plan[0]
+            plan.pop(0)
+        return None
 
     def _move_bots(self) -> Dict:
         # advances each moving bot one step along its route (one node per tick)
         results = {"moved": 0, "picked_up": 0, "delivered": 0}
 
-        bots = self.db.query(Bot).filter(
-            Bot.status == BotStatus.MOVING
-        ).all()
+        for bot in list(self.bots.values()):
+            if bot.status != BotStatus.MOVING:
+                continue
 
-        for bot in bots:
             route = self._bot_routes.get(bot.id, [])
 
             if not route:
@@ -220,18 +541,21 @@ class SimulationService:
                 continue
 
             next_node_id = route.pop(0)
-            bot.current_node_id = next_node_id
-            results["moved"] += 1
+            # a repeated node is a planned wait (collision-avoidance mode) -- not a move
+            if next_node_id != bot.current_node_id:
+                bot.current_node_id = next_node_id
+                self._reindex(bot)
+                self._mark_bot(bot)
+                results["moved"] += 1
 
             self._bot_routes[bot.id] = route
 
             if not route:
                 self._handle_arrival(bot, results)
 
-        self.db.commit()
         return results
 
-    def _handle_arrival(self, bot: Bot, results: Dict):
+    def _handle_arrival(self, bot: BotState, results: Dict):
         # bot reached its target ^ immediate pick up or delivery
         target_info = self._bot_targets.get(bot.id)
         if not target_info:
@@ -244,34 +568,28 @@ class SimulationService:
 
         if action == "PICKUP":
             # grab all assigned orders at this restaurant node at once
-            orders = self.db.query(Order).filter(
-                Order.bot_id == bot.id,
-                Order.status == OrderStatus.ASSIGNED,
-                Order.pickup_node_id == target_node
-            ).all()
-
-            for order in orders:
-                order.status = OrderStatus.PICKED_UP
-                order.picked_up_at = datetime.utcnow()
-                results["picked_up"] += 1
+            for order in self.orders.values():
+                if (order.bot_id == bot.id and order.status == OrderStatus.ASSIGNED
+                        and order.pickup_node_id == target_node):
+                    order.status = OrderStatus.PICKED_UP
+                    order.picked_up_at = datetime.utcnow()
+                    self._mark_order(order)
+                    results["picked_up"] += 1
 
             bot.status = BotStatus.PICKING_UP
 
         elif action == "DELIVER":
             # drop off all picked-up orders headed to this location
-            orders = self.db.query(Order).filter(
-                Order.bot_id == bot.id,
-                Order.status == OrderStatus.PICKED_UP,
-                Order.delivery_node_id == target_node
-            ).all()
-
-            for order in orders:
-                order.status = OrderStatus.DELIVERED
-                order.delivered_at = datetime.utcnow()
-                results["delivered"] += 1
+            for order in self.orders.values():
+                if (order.bot_id == bot.id and order.status == OrderStatus.PICKED_UP
+                        and order.delivery_node_id == target_node):
+                    order.status = OrderStatus.DELIVERED
+                    order.delivered_at = datetime.utcnow()
+                    self._mark_order(order)
+                    results["delivered"] += 1
 
             bot.status = BotStatus.DELIVERING
-        
+
         elif action == "STATION":
             # just arrived at station, stay idle
             bot.status = BotStatus.IDLE
@@ -280,18 +598,202 @@ class SimulationService:
         del self._bot_targets[bot.id]
         self._bot_routes[bot.id] = []
 
-        remaining_orders = self.db.query(Order).filter(
-            Order.bot_id == bot.id,
-            Order.status.in_([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP])
-        ).count()
+        remaining_orders = sum(
+            1 for o in self.orders.values()
+            if o.bot_id == bot.id and o.status in CARRIED_ORDER_STATUSES
+        )
 
         if remaining_orders == 0:
             bot.status = BotStatus.IDLE
         else:
             bot.status = BotStatus.MOVING
+        self._mark_bot(bot)
+
+    # hooks for the http endpoints -- they commit their own change, then tell the engine about it
+    # so memory and db never disagree about who's carrying what
+
+    def add_order(self, order: Order):
+        self.add_orders([order])
+
+    def add_orders(self, orders: List[Order]):
+        # one lock + one listener notification for a whole batch of new orders
+        with self.lock:
+            states = [OrderState.from_model(o) for o in orders if o.status in ACTIVE_ORDER_STATUSES]
+            for state in states:
+                self.orders[state.id] = state
+            if states:
+                self._notify([], states)
+
+    def sync_order(self, order: Order):
+        # an order was edited or cancelled outside a tick -- mirror it, and drop any route towards it
+        with self.lock:
+            state = OrderState.from_model(order)
+            if order.status in ACTIVE_ORDER_STATUSES:
+                self.orders[order.id] = state
+            else:
+                self.orders.pop(order.id, None)
+                self._dirty_orders.discard(order.id)
+                for bot_id, target in list(self._bot_targets.items()):
+                    if target[2] == order.id:
+                        del self._bot_targets[bot_id]
+                        self._bot_routes[bot_id] = []
+            self._notify([], [state])
+
+    def sync_bot(self, bot: Bot):
+        with self.lock:
+            if bot.id in self.bots:
+                self.bots[bot.id].status = bot.status
+                self.bots[bot.id].current_node_id = bot.current_node_id
+            else:
+                self.bots[bot.id] = BotState.from_model(bot)
+            self._reindex(self.bots[bot.id])
+            self._notify([self.bots[bot.id]], [])
+
+    def try_assign_least_loaded(self, order_id: int) -> bool:
+        # immediate assignment for a freshly created order: the least-loaded idle/moving bot with room takes it
+        return bool(self.assign_least_loaded([order_id]))
+
+    def assign_least_loaded(self, order_ids: List[int]) -> List[int]:
+        # same rule for a batch of new orders in one pass -- loads are bumped as we go, so the batch spreads
+        # over the fleet exactly as one-by-one calls would. returns the ids that got a bot
+        with self.lock:
+            loads = self.active_order_counts()
+            assigned = []
+
+            for order_id in order_ids:
+                order = self.orders.get(order_id)
+                if order is None or order.status != OrderStatus.PENDING:
+                    continue
+
+                best_bot = None
+                best_load = float('inf')
+                for bot in self.bots.values():
+                    if bot.status not in (BotStatus.IDLE, BotStatus.MOVING):
+                        continue
+                    current_orders = loads.get(bot.id, 0)
+                    # strictly respect the bot's capacity limit
+                    if current_orders >= bot.max_capacity:
+                        continue
+                    # prefer the bot with the fewest active orders to spread the load evenly
+                    if current_orders < best_load:
+                        best_load = current_orders
+                        best_bot = bot
+
+                if best_bot is None:
+                    # every bot is full -- nothing later in the batch will fit either
+                    break
+
+                self._assign_order(order, best_bot)
+                loads[best_bot.id] = loads.get(best_bot.id, 0) + 1
+                assigned.append(order_id)
+
+            return assigned
+
+    def repair_routes(self, graph: GridGraph, from_id: int, to_id: int) -> List[int]:
+        # a single edge changed -- move onto the new graph version and re-plan only the bots it affects:
+        # on a closure, bots whose remaining route crosses the edge; on a reopening, bots that now have a shorter way
+        with self.lock:
+            self.graph = graph
+            self.pathfinder = PathfindingService(self.db, graph)
+            now_blocked = (from_id, to_id) in graph.blocked_pairs
+            replanned = []
+
+            for bot_id, route in list(self._bot_routes.items()):
+                bot = self.bots.get(bot_id)
+                target = self._bot_targets.get(bot_id)
+                if not route or not target or bot is None or bot.current_node_id is None:
+                    continue
+
+                current = bot.current_node_id
+                target_node = target[0]
+
+                if now_blocked:
+                    steps = [current] + route
+                    affected = any(
+                        {steps[i], steps[i + 1]} == {from_id, to_id}
+                        for i in range(len(steps) - 1)
+                    )
+                else:
+                    shortest = self.pathfinder.get_path_length(current, target_node)
+                    affected = shortest is not None and shortest < len(route)
+
+                if not affected:
+                    continue
+
+                if self.collision_avoidance:
+                    # keep the target, the next tick re-plans the route around everyone else's bookings
+                    self._bot_routes[bot_id] = []
+                    self._route_horizon.pop(bot_id, None)
+                    replanned.append(bot_id)
+                    continue
+
+                path = self.pathfinder.find_path(current, target_node)
+                if path:
+                    self._bot_routes[bot_id] = path[1:]
+                else:
+                    # target got cut off -- drop it and let the next tick pick something reachable
+                    self._bot_routes[bot_id] = []
+                    del self._bot_targets[bot_id]
+                replanned.append(bot_id)
+
+            return replanned
+
+    def active_order_counts(self) -> Dict[int, int]:
+        # the in-memory side of the fleet load snapshot (see fleet_load.py)
+        with self.lock:
+            loads: Dict[int, int] = {}
+            for order in self.orders.values():
+                if order.bot_id is not None and order.status in CARRIED_ORDER_STATUSES:
+                    loads[order.bot_id] = loads.get(order.bot_id, 0) + 1
+            return loads
+
+    @property
+    def tick_count(self) -> int:
+        return self._tick_counter
 
     def get_bot_route(self, bot_id: int) -> List[int]:
         return self._bot_routes.get(bot_id, [])
 
     def get_bot_target(self, bot_id: int) -> Optional[tuple]:
         return self._bot_targets.get(bot_id)
+
+    def get_bot_plan(self, bot_id: int) -> List[Stop]:
+        return self._bot_plans.get(bot_id, [])
+
+
+# one engine per process -- created on first use, dropped on reset so it reloads from the db
+_service_lock = threading.Lock()
+_service: Optional[SimulationService] = None
+# listeners every process-wide engine gets (e.g. the live dashboard feed) -- throwaway engines don't
+_service_listeners: List[Callable] = []
+
+
+def add_service_listener(listener: Callable):
+    _service_listeners.append(listener)
+
+
+def get_simulation_service(db: Session) -> SimulationService:
+    global _service
+    service = _service
+    if service is not None:
+        return service
+
+    with _service_lock:
+        if _service is None:
+            _service = SimulationService(db)
+            # the engine outlives this request, so it mustn't hang on to the request's session
+            _service.db = None
+            _service.pathfinder.db = None
+            _service.listeners = list(_service_listeners)
+        return _service
+
+
+def peek_simulation_service() -> Optional[SimulationService]:
+    # the engine if one is running, without creating it
+    return _service
+
+
+def reset_simulation_service():
+    global _service
+    with _service_lock:
+        _service = None
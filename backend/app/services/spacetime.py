@@ -0,0 +1,187 @@
+# collision-free multi-bot routing -- cooperative (windowed) space-time a*.
+# bots are planned one after another in priority order; every plan books its (node, tick) cells and the
+# (edge, tick) moves in a shared reservation table, and later bots route around what's booked, waiting in place
+# when they have to. the search only looks `window` ticks ahead and follows the plain shortest path after that,
+# so planning cost per bot is bounded by the window, not the fleet size -- routes get re-checked as the
+# window runs out (see SimulationService._plan_cooperative)
+
+import heapq
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services.pathfinding import PathfindingService
+
+
+class ReservationTable:
+    # node cells are (node index, tick) -> bot id; edge moves are (from index, to index, arrival tick) -> bot id.
+    # exempt nodes (the station) can hold any number of bots at once
+
+    def __init__(self, exempt: Iterable[int] = ()):
+        self.exempt: Set[int] = set(exempt)
+        self.nodes: Dict[Tuple[int, int], int] = {}
+        self.edges: Dict[Tuple[int, int, int], int] = {}
+
+    def node_free(self, node: int, tick: int, bot_id: int) -> bool:
+        if node in self.exempt:
+            return True
+        holder = self.nodes.get((node, tick))
+        return holder is None or holder == bot_id
+
+    def move_free(self, from_node: int, to_node: int, tick: int, bot_id: int) -> bool:
+        # arriving at to_node on `tick` -- the cell has to be free, and nobody may be coming the other way
+        # over the same edge on that tick (two bots swapping places)
+        if not self.node_free(to_node, tick, bot_id):
+            return False
+        if from_node == to_node:
+            return True
+        holder = self.edges.get((to_node, from_node, tick))
+        return holder is None or holder == bot_id
+
+    def reserve_node(self, node: int, tick: int, bot_id: int) -> bool:
+        # False when somebody else already holds the cell -- the caller decides whether that's a conflict
+        if node in self.exempt:
+            return True
+        return self.nodes.setdefault((node, tick), bot_id) == bot_id
+
+    def release_node(self, node: int, tick: int, bot_id: int):
+        if self.nodes.get((node, tick)) == bot_id:
+            del self.nodes[(node, tick)]
+
+    def release_bot(self, bot_id: int):
+        # drops every booking the bot holds (its route is being thrown away and re-planned)
+        self.nodes = {cell: holder for cell, holder in self.nodes.items() if holder != bot_id}
+        self.edges = {move: holder for move, holder in self.edges.items() if holder != bot_id}
+
+    def path_free(self, bot_id: int, start: int, path: List[int], first_tick: int) -> bool:
+        # whether the bot could still follow path (see reserve_path) without running into anyone's bookings
+        previous = start
+        for tick, node in enumerate(path, start=first_tick):
+            if not self.move_free(previous, node, tick, bot_id):
+                return False
+            previous = node
+        return True
+
+    def reserve_path(self, bot_id: int, start: int, path: List[int], first_tick: int, park_ticks: int = 1):
+        # path[k] is where the bot is on first_tick + k, coming from start -- it has to be free (see path_free).
+        # the last cell then stays booked for up to park_ticks more ticks, since the bot sits there until its
+        # next leg is planned; parking stops short of a tick someone else already holds, and that bot gets
+        # moved out of the way by the plan of whichever tick the two would actually meet on
+        previous = start
+        tick = first_tick
+        for node in path:
+            self.reserve_node(node, tick, bot_id)
+            if node != previous:
+                self.edges.setdefault((previous, node, tick), bot_id)
+            previous = node
+            tick += 1
+        end = path[-1] if path else start
+        for extra in range(park_ticks):
+            if not self.reserve_node(end, tick + extra, bot_id):
+                break
+
+    def hold(self, bot_id: int, node: int, first_tick: int, ticks: int) -> Set[int]:
+        # a bot that can't move books its node outright: anyone else booked on it in that span loses their whole
+        # reservation. returns those bots -- they have to be planned again around this one
+        if node in self.exempt:
+            return set()
+        displaced = {self.nodes.get((node, tick)) for tick in range(first_tick, first_tick + ticks)}
+        displaced -= {None, bot_id}
+        for other in displaced:
+            self.release_bot(other)
+        for tick in range(first_tick, first_tick + ticks):
+            self.nodes[(node, tick)] = bot_id
+        return displaced
+
+
+class SpaceTimePlanner:
+
+    def __init__(self, pathfinder: PathfindingService, window: int, max_expansions: int):
+        self.pathfinder = pathfinder
+        self.graph = pathfinder.graph
+        self.window = window
+        self.max_expansions = max_expansions
+
+    def _distance(self, node: int, goal: int) -> Optional[int]:
+        # exact hop count when the map has a distance table (an admissible, consistent heuristic),
+        # manhattan on maps too big for one
+        graph = self.graph
+        if self.pathfinder._table is not None:
+            return self.pathfinder._table.distance(graph.node_ids[node], graph.node_ids[goal])
+        return abs(graph.xs[node] - graph.xs[goal]) + abs(graph.ys[node] - graph.ys[goal])
+
+    def _shortest_tail(self, node: int, goal: int) -> Optional[List[int]]:
+        path = self.pathfinder.find_path(self.graph.node_ids[node], self.graph.node_ids[goal])
+        return [self.graph.index[node_id] for node_id in path[1:]] if path else None
+
+    def plan(
+        self,
+        bot_id: int,
+        start_id: int,
+        goal_id: int,
+        first_tick: int,
+        reservations: ReservationTable,
+    ) -> Optional[List[int]]:
+        # node ids the bot occupies on first_tick, first_tick + 1, ... ending at the goal (repeats are waits).
+        # [] when it's already there, None when the goal is unreachable or nothing fits in the expansion budget
+        graph = self.graph
+        start = graph.index.get(start_id)
+        goal = graph.index.get(goal_id)
+        if start is None or goal is None:
+            return None
+        if start == goal:
+            return []
+        h0 = self._distance(start, goal)
+        if h0 is None or self.pathfinder.get_path_length(start_id, goal_id) is None:
+            return None
+
+        offsets, targets = graph.offsets, graph.targets
+        horizon = first_tick + self.window
+        # (f, -depth, node, tick) -- ties go to the deeper state so the search dives instead of fanning out
+        open_set = [(h0, 0, start, first_tick - 1)]
+        came_from: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        g_score: Dict[Tuple[int, int], int] = {(start, first_tick - 1): 0}
+        expansions = 0
+
+        while open_set:
+            _, _, node, tick = heapq.heappop(open_set)
+            state = (node, tick)
+
+            if node == goal or tick + 1 >= horizon:
+                # reached the goal, or the edge of the window -- past it we follow the plain shortest path
+                prefix = self._unwind(came_from, state)
+                if node == goal:
+                    return [graph.node_ids[i] for i in prefix]
+                tail = self._shortest_tail(node, goal)
+                if tail is None:
+                    return None
+                return [graph.node_ids[i] for i in prefix + tail]
+
+            expansions += 1
+            if expansions > self.max_expansions:
+                return None
+
+            g = g_score[state] + 1
+            next_tick = tick + 1
+            for k in range(offsets[node], offsets[node + 1] + 1):
+                # the extra iteration is "wait where you are"
+                neighbor = targets[k] if k < offsets[node + 1] else node
+                next_state = (neighbor, next_tick)
+                if next_state in g_score and g_score[next_state] <= g:
+                    continue
+                if not reservations.move_free(node, neighbor, next_tick, bot_id):
+                    continue
+                h = self._distance(neighbor, goal)
+                if h is None:
+                    continue
+                g_score[next_state] = g
+                came_from[next_state] = state
+                heapq.heappush(open_set, (g + h, -g, neighbor, next_tick))
+
+        return None
+
+    def _unwind(self, came_from: Dict[Tuple[int, int], Tuple[int, int]], state: Tuple[int, int]) -> List[int]:
+        path = []
+        while state in came_from:
+            path.append(state[0])
+            state = came_from[state]
+        path.reverse()
+        return path
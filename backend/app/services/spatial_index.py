@@ -0,0 +1,103 @@
+# bucketed grid index of bot positions -- bucket_size x bucket_size cells, each holding the bots standing in it.
+# nearest() walks the buckets outwards from a node and hands back bots in order of manhattan distance, which is a
+# lower bound on the real path length. so a caller can stop as soon as that bound can't beat the best exact
+# distance it has found, instead of measuring every bot in the fleet
+
+import heapq
+from typing import Callable, Dict, Iterator, Optional, Set, Tuple
+
+Bucket = Tuple[int, int]
+
+
+class BotSpatialIndex:
+
+    def __init__(self, graph, bucket_size: int):
+        self.graph = graph
+        self.bucket_size = max(bucket_size, 1)
+        self._buckets: Dict[Bucket, Set[int]] = {}
+        # bot id -> (node id, bucket) as last indexed
+        self._positions: Dict[int, Tuple[int, Bucket]] = {}
+        if graph.size:
+            self._min_bucket = (min(graph.xs) // self.bucket_size, min(graph.ys) // self.bucket_size)
+            self._max_bucket = (max(graph.xs) // self.bucket_size, max(graph.ys) // self.bucket_size)
+        else:
+            self._min_bucket = self._max_bucket = (0, 0)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _bucket(self, x: int, y: int) -> Bucket:
+        return x // self.bucket_size, y // self.bucket_size
+
+    def move(self, bot_id: int, node_id: Optional[int]):
+        # (re)places a bot -- O(1), and a no-op when it stayed on the same node
+        current = self._positions.get(bot_id)
+        if current is not None and current[0] == node_id:
+            return
+        coords = self.graph.coords(node_id) if node_id is not None else None
+        if current is not None:
+            bucket = self._buckets[current[1]]
+            bucket.discard(bot_id)
+            if not bucket:
+                del self._buckets[current[1]]
+            del self._positions[bot_id]
+        if coords is None:
+            return
+        bucket = self._bucket(*coords)
+        self._buckets.setdefault(bucket, set()).add(bot_id)
+        self._positions[bot_id] = (node_id, bucket)
+
+    def remove(self, bot_id: int):
+        self.move(bot_id, None)
+
+    def nearest(self, node_id: int, accept: Callable[[int], bool] = lambda bot_id: True) -> Iterator[Tuple[int, int]]:
+        # (manhattan distance, bot id) for the accepted bots, closest first (ties by id). lazy -- stop whenever
+        coords = self.graph.coords(node_id)
+        if coords is None:
+            return
+        x, y = coords
+        bs = self.bucket_size
+        qx, qy = self._bucket(x, y)
+        (min_bx, min_by), (max_bx, max_by) = self._min_bucket, self._max_bucket
+        last_ring = max(qx - min_bx, max_bx - qx, qy - min_by, max_by - qy, 0)
+
+        # buckets (kind 0) and bots (kind 1) share one heap, keyed by a lower bound / the exact distance
+        heap = []
+        ring = -1
+        while True:
+            # every cell in ring r + 1 is at least r * bs + 1 away in x or y, so nothing out there can beat
+            # what's already on the heap until the heap's best key passes that
+            if ring < last_ring and (not heap or heap[0][0] > ring * bs):
+                ring += 1
+                for bucket in self._ring(qx, qy, ring):
+                    bx, by = bucket
+                    dx = max(bx * bs - x, 0, x - (bx * bs + bs - 1))
+                    dy = max(by * bs - y, 0, y - (by * bs + bs - 1))
+                    heapq.heappush(heap, (dx + dy, 0, bucket))
+                continue
+            if not heap:
+                return
+
+            key, kind, item = heapq.heappop(heap)
+            if kind == 1:
+                yield key, item
+                continue
+            for bot_id in self._buckets.get(item, ()):
+                if accept(bot_id):
+                    bot_x, bot_y = self.graph.coords(self._positions[bot_id][0])
+                    heapq.heappush(heap, (abs(bot_x - x) + abs(bot_y - y), 1, bot_id))
+
+    def _ring(self, qx: int, qy: int, ring: int) -> Iterator[Bucket]:
+        # the occupied buckets exactly `ring` steps out (chebyshev) from (qx, qy)
+        if ring == 0:
+            if (qx, qy) in self._buckets:
+                yield qx, qy
+            return
+        for bx in range(qx - ring, qx + ring + 1):
+            for by in (qy - ring, qy + ring):
+                if (bx, by) in self._buckets:
+                    yield bx, by
+        for by in range(qy - ring + 1, qy + ring):
+            for bx in (qx - ring, qx + ring):
+                if (bx, by) in self._buckets:
+                    yield bx, by
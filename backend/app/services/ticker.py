@@ -0,0 +1,142 @@
+# server-side tick loop -- ticks the simulation at a fixed cadence instead of relying on browser timers
+# the loop schedules against absolute deadlines, so a slow tick doesn't push every later tick back (drift correction).
+# it only ever stops between ticks: a tick already running in its worker thread can't be interrupted, so stop
+# waits for it to finish instead of walking away from it
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("eagroute")
+
+
+class SimulationTicker:
+    # owns one asyncio task on the app's event loop; the tick itself runs in a worker thread
+    # since the engine talks to the db through the sync sqlalchemy session
+
+    def __init__(self, tick_fn: Callable[[], Any], interval: float, speed: float = 1.0):
+        self.tick_fn = tick_fn
+        self.interval = interval
+        self.speed = speed
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        # set to ask the current task to stop at the next gap between ticks
+        self._stopping: Optional[asyncio.Event] = None
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+        self.last_duration = 0.0
+
+    @property
+    def period(self) -> float:
+        # seconds between ticks at the current speed multiplier
+        return self.interval / self.speed
+
+    @property
+    def is_running(self) -> bool:
+        # a loop that was asked to stop counts as stopped, even while its last tick finishes
+        return self._task is not None and not self._task.done() and not self._stopping.is_set()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        # called from the lifespan hook so start/stop can be used from sync endpoints (which run in threads)
+        self._loop = loop
+
+    def start(self, speed: Optional[float] = None):
+        if speed is not None:
+            self.set_speed(speed)
+        if self._loop is None:
+            raise RuntimeError("Tick loop is not bound to an event loop")
+        self._loop.call_soon_threadsafe(self._spawn)
+
+    def stop(self):
+        # blocks until the loop is down, in-flight tick included -- so the caller can touch the db right after.
+        # meant for sync endpoints (they run in worker threads); from the event loop itself use shutdown()
+        loop = self._loop
+        if loop is None or loop.is_closed() or not loop.is_running():
+            return
+        asyncio.run_coroutine_threadsafe(self.shutdown(), loop).result()
+
+    def set_speed(self, speed: float):
+        if speed <= 0:
+            raise ValueError("Speed multiplier must be greater than 0")
+        self.speed = speed
+
+    async def shutdown(self):
+        # asks the loop to stop and waits for it, so we never leave a tick half-done. safe to call more than
+        # once at a time -- every caller waits for the same task (shielded, so a cancelled caller can't cancel it)
+        task = self._task
+        if task is None:
+            return
+        self._stopping.set()
+        await asyncio.shield(task)
+        if self._task is task:
+            self._task = None
+
+    def _spawn(self):
+        if not self.is_running:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run(self._stopping))
+
+    async def _run(self, stopping: asyncio.Event):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.period
+        logger.info(f"Tick loop started (every {self.period:.3f}s, speed x{self.speed})")
+
+        try:
+            while True:
+                # sleep until the deadline, or wake up early because someone asked us to stop
+                try:
+                    await asyncio.wait_for(stopping.wait(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+                if stopping.is_set():
+                    break
+
+                # how late we woke up compared to where the tick was scheduled
+                lag = max(0.0, loop.time() - deadline)
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self._total_lag += lag
+
+                started = time.perf_counter()
+                try:
+                    await asyncio.to_thread(self.tick_fn)
+                except Exception as exc:
+                    # one bad tick shouldn't kill the loop
+                    self.errors += 1
+                    logger.error(f"Tick failed: {exc}")
+                self.last_duration = time.perf_counter() - started
+                self.ticks += 1
+
+                # next deadline is relative to the schedule, not to when this tick finished.
+                # if we've fallen more than a whole period behind, skip those ticks rather than bursting to catch up
+                deadline += self.period
+                behind = loop.time() - deadline
+                if behind > self.period:
+                    skipped = int(behind // self.period)
+                    self.missed_ticks += skipped
+                    deadline += skipped * self.period
+        finally:
+            logger.info("Tick loop stopped")
+
+    def metrics(self) -> Dict:
+        return {
+            "running": self.is_running,
+            "interval_seconds": self.interval,
+            "speed": self.speed,
+            "period_seconds": round(self.period, 6),
+            "ticks": self.ticks,
+            "missed_ticks": self.missed_ticks,
+            "errors": self.errors,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "mean_lag_ms": round(self._total_lag / self.ticks * 1000, 3) if self.ticks else 0.0,
+            "last_tick_duration_ms": round(self.last_duration * 1000, 3),
+        }
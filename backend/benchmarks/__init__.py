@@ -0,0 +1,6 @@
+# scale-out benchmarks for pathfinding, dispatch and full ticks -- see suite.py, run with `python -m benchmarks`
+
+import os
+
+# sqlite unless told otherwise, set before anything imports app.database (same trick as tests/conftest.py)
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
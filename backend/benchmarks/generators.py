@@ -0,0 +1,105 @@
+# synthetic data for the benchmarks -- open grids with random blocked edges, random fleets and pending orders
+# everything is bulk inserted so seeding a 500x500 grid with 100k orders doesn't dominate the run
+
+import random
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Node, Restaurant, Bot, Order, BlockedEdge
+from app.models.bot import BotStatus
+from app.models.order import OrderStatus
+
+DELIVERY_POINT_RATIO = 0.2
+MAX_RESTAURANTS = 50
+
+
+def node_id_at(width: int, x: int, y: int) -> int:
+    return y * width + x + 1
+
+
+def grid_rows(width: int, height: int, obstacle_density: float, rng: random.Random) -> Tuple[List[Dict], List[Dict]]:
+    # nodes plus blocked edges -- each grid edge is blocked with probability obstacle_density (stored from < to)
+    nodes = [
+        {"id": node_id_at(width, x, y), "x": x, "y": y, "is_delivery_point": rng.random() < DELIVERY_POINT_RATIO}
+        for y in range(height)
+        for x in range(width)
+    ]
+
+    blocked = []
+    if obstacle_density > 0:
+        for y in range(height):
+            for x in range(width):
+                here = node_id_at(width, x, y)
+                if x + 1 < width and rng.random() < obstacle_density:
+                    blocked.append({"from_node_id": here, "to_node_id": node_id_at(width, x + 1, y)})
+                if y + 1 < height and rng.random() < obstacle_density:
+                    blocked.append({"from_node_id": here, "to_node_id": node_id_at(width, x, y + 1)})
+    for i, row in enumerate(blocked, start=1):
+        row["id"] = i
+
+    return nodes, blocked
+
+
+def seed_database(
+    db: Session,
+    width: int,
+    height: int,
+    obstacle_density: float,
+    bots: int,
+    orders: int,
+    seed: int = 0,
+) -> Dict:
+    # fills an empty schema with one synthetic scenario, returns what it made
+    rng = random.Random(seed)
+    nodes, blocked = grid_rows(width, height, obstacle_density, rng)
+    node_ids = [n["id"] for n in nodes]
+    delivery_ids = [n["id"] for n in nodes if n["is_delivery_point"]] or node_ids
+
+    restaurant_nodes = rng.sample(node_ids, max(1, min(MAX_RESTAURANTS, len(node_ids) // 100)))
+    restaurants = [
+        {"id": i, "name": f"R{i}", "node_id": node_id}
+        for i, node_id in enumerate(restaurant_nodes, start=1)
+    ]
+
+    bot_rows = [
+        {
+            "id": i,
+            "name": f"Bot-{i}",
+            "current_node_id": rng.choice(node_ids),
+            "status": BotStatus.IDLE,
+            "max_capacity": settings.MAX_BOT_CAPACITY,
+        }
+        for i in range(1, bots + 1)
+    ]
+
+    order_rows = []
+    for i in range(1, orders + 1):
+        restaurant = rng.choice(restaurants)
+        order_rows.append({
+            "id": i,
+            "restaurant_id": restaurant["id"],
+            "pickup_node_id": restaurant["node_id"],
+            "delivery_node_id": rng.choice(delivery_ids),
+            "status": OrderStatus.PENDING,
+        })
+
+    db.execute(insert(Node), nodes)
+    if blocked:
+        db.execute(insert(BlockedEdge), blocked)
+    db.execute(insert(Restaurant), restaurants)
+    if bot_rows:
+        db.execute(insert(Bot), bot_rows)
+    if order_rows:
+        db.execute(insert(Order), order_rows)
+    db.commit()
+
+    return {
+        "nodes": len(nodes),
+        "blocked_edges": len(blocked),
+        "restaurants": len(restaurants),
+        "bots": len(bot_rows),
+        "orders": len(order_rows),
+    }
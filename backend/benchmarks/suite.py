@@ -0,0 +1,322 @@
+# benchmark suite -- measures how find_path, _assign_pending_orders and a full tick scale with grid size,
+# fleet size and backlog. every case gets its own throwaway sqlite db (no postgres needed), results go out
+# as json so two commits can be compared with --compare
+#
+#   python -m benchmarks --grids 10x10 100x100 --bots 5 500 --orders 10 10000 --out results.json
+#   python -m benchmarks --compare baseline.json --out results.json
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.services.grid_graph import GridGraph
+from app.services.headless import nearest_rank_percentile
+from app.services.pathfinding import PathfindingService
+from app.services.simulation import SimulationService
+from benchmarks.generators import seed_database
+
+# the full range we care about -- takes a long while, the defaults are a quick smoke run
+FULL_GRIDS = ["10x10", "50x50", "100x100", "250x250", "500x500"]
+FULL_BOTS = [5, 50, 500, 5000]
+FULL_ORDERS = [10, 1000, 10000, 100000]
+
+# latency keys compared by --compare
+COMPARED = [("pathfinding", "p50_ms"), ("pathfinding", "p95_ms"), ("dispatch", "p50_ms"), ("tick", "p50_ms"), ("tick", "p95_ms")]
+
+
+def latency_summary(samples: List[float]) -> Dict:
+    # seconds in, milliseconds out
+    ms = sorted(s * 1000 for s in samples)
+    if not ms:
+        return {"samples": 0}
+    return {
+        "samples": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 4),
+        "p50_ms": round(nearest_rank_percentile(ms, 0.5), 4),
+        "p95_ms": round(nearest_rank_percentile(ms, 0.95), 4),
+        "p99_ms": round(nearest_rank_percentile(ms, 0.99), 4),
+        "max_ms": round(ms[-1], 4),
+    }
+
+
+class QueryCounter:
+    # counts statements sent through an engine while enabled
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def bench_pathfinding(graph: GridGraph, samples: int, rng: random.Random) -> Dict:
+    # the table (when the grid is small enough to get one) or the hpa* clusters are built up front and timed separately
+    table_ms = None
+    hierarchy_ms = None
+    if 0 < graph.size <= settings.DISTANCE_TABLE_MAX_NODES:
+        started = time.perf_counter()
+        graph.distance_table()
+        table_ms = round((time.perf_counter() - started) * 1000, 3)
+    elif settings.PATHFINDING_MODE == "hierarchical":
+        started = time.perf_counter()
+        graph.hierarchy()
+        hierarchy_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    pathfinder = PathfindingService(graph=graph)
+    node_ids = list(graph.node_ids)
+    timings = []
+    unreachable = 0
+    for _ in range(samples):
+        start, goal = rng.choice(node_ids), rng.choice(node_ids)
+        started = time.perf_counter()
+        path = pathfinder.find_path(start, goal)
+        timings.append(time.perf_counter() - started)
+        if path is None:
+            unreachable += 1
+
+    return {
+        **latency_summary(timings),
+        "mode": "table" if table_ms is not None else settings.PATHFINDING_MODE,
+        "table_build_ms": table_ms,
+        "hierarchy_build_ms": hierarchy_ms,
+        "unreachable": unreachable,
+    }
+
+
+def bench_dispatch(session_factory, graph: GridGraph, reps: int, dispatch_mode: Optional[str]) -> Dict:
+    # one assignment pass over the whole backlog, on a freshly loaded engine each rep so nothing is pre-assigned
+    timings = []
+    assigned = 0
+    for _ in range(reps):
+        db = session_factory()
+        try:
+            service = SimulationService(db, graph=graph, dispatch_mode=dispatch_mode)
+            started = time.perf_counter()
+            assigned = service._assign_pending_orders()
+            timings.append(time.perf_counter() - started)
+        finally:
+            db.close()
+    return {**latency_summary(timings), "assigned": assigned}
+
+
+def bench_ticks(session_factory, graph: GridGraph, ticks: int, dispatch_mode: Optional[str], counter: QueryCounter) -> Dict:
+    # full ticks including the write-behind flush, with the sql statements each one issues
+    db = session_factory()
+    try:
+        service = SimulationService(db, graph=graph, dispatch_mode=dispatch_mode)
+        timings = []
+        queries = []
+        for _ in range(ticks):
+            before = counter.count
+            started = time.perf_counter()
+            service.tick(db)
+            timings.append(time.perf_counter() - started)
+            queries.append(counter.count - before)
+    finally:
+        db.close()
+
+    return {
+        **latency_summary(timings),
+        "queries_per_tick_mean": round(sum(queries) / len(queries), 2) if queries else 0,
+        "queries_per_tick_max": max(queries, default=0),
+    }
+
+
+def run_case(
+    width: int,
+    height: int,
+    obstacle_density: float,
+    bots: int,
+    orders: int,
+    args: argparse.Namespace,
+    db_url: Optional[str] = None,
+) -> Dict:
+    tmpdir = None
+    schema = None
+    if db_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}")
+    else:
+        # never touch the tables already in a real db -- the case gets a scratch schema of its own,
+        # dropped again afterwards
+        schema = scratch_schema(db_url)
+        engine = create_engine(db_url, connect_args={"options": f"-csearch_path={schema}"})
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    try:
+        db = session_factory()
+        try:
+            started = time.perf_counter()
+            seeded = seed_database(db, width, height, obstacle_density, bots, orders, seed=args.seed)
+            seed_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            graph = GridGraph.from_db(db)
+            graph_ms = (time.perf_counter() - started) * 1000
+        finally:
+            db.close()
+
+        counter = QueryCounter(engine)
+        rng = random.Random(args.seed)
+        return {
+            "case": case_name(width, height, obstacle_density, bots, orders),
+            "grid": {"width": width, "height": height, "obstacle_density": obstacle_density},
+            "seeded": seeded,
+            "seed_ms": round(seed_ms, 3),
+            "graph_load_ms": round(graph_ms, 3),
+            "pathfinding": bench_pathfinding(graph, args.path_samples, rng),
+            "dispatch": bench_dispatch(session_factory, graph, args.dispatch_reps, args.dispatch_mode),
+            "tick": bench_ticks(session_factory, graph, args.ticks, args.dispatch_mode, counter),
+        }
+    finally:
+        engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+        if schema is not None:
+            drop_scratch_schema(db_url, schema)
+
+
+def scratch_schema(db_url: str) -> str:
+    # only postgres has schemas to hide in -- anything else could mean writing into someone's real tables
+    if make_url(db_url).get_backend_name() != "postgresql":
+        raise ValueError("--db-url must be a postgresql url (cases run in a scratch schema); leave it out for temp sqlite")
+    schema = f"eagroute_bench_{uuid.uuid4().hex[:12]}"
+    admin = create_engine(db_url)
+    try:
+        with admin.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+    finally:
+        admin.dispose()
+    return schema
+
+
+def drop_scratch_schema(db_url: str, schema: str):
+    admin = create_engine(db_url)
+    try:
+        with admin.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+    finally:
+        admin.dispose()
+
+
+def case_name(width: int, height: int, obstacle_density: float, bots: int, orders: int) -> str:
+    return f"{width}x{height}/d{obstacle_density}/b{bots}/o{orders}"
+
+
+def parse_grid(value: str) -> Tuple[int, int]:
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height or width)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args: argparse.Namespace) -> Dict:
+    cases = []
+    for grid, density, bots, orders in itertools.product(args.grids, args.densities, args.bots, args.orders):
+        width, height = parse_grid(grid)
+        print(f"running {case_name(width, height, density, bots, orders)} ...", file=sys.stderr)
+        cases.append(run_case(width, height, density, bots, orders, args, args.db_url))
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "dispatch_mode": args.dispatch_mode or settings.DISPATCH_MODE,
+            "distance_table_max_nodes": settings.DISTANCE_TABLE_MAX_NODES,
+            "pathfinding_mode": settings.PATHFINDING_MODE,
+            "astar_landmarks": settings.ASTAR_LANDMARKS,
+            "seed": args.seed,
+        },
+        "cases": cases,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    # ratios current/baseline for the latency keys, flags anything slower than the threshold
+    regressions = []
+    previous = {case["case"]: case for case in baseline.get("cases", [])}
+    for case in current["cases"]:
+        old = previous.get(case["case"])
+        if old is None:
+            continue
+        for section, key in COMPARED:
+            before, after = old[section].get(key), case[section].get(key)
+            if not before or after is None:
+                continue
+            ratio = after / before
+            line = f"{case['case']} {section}.{key}: {before:.3f} -> {after:.3f} ms (x{ratio:.2f})"
+            print(line, file=sys.stderr)
+            if ratio > threshold:
+                regressions.append(line)
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Pathfinding / dispatch / tick scaling benchmarks")
+    parser.add_argument("--grids", nargs="+", default=["10x10", "50x50", "100x100"], help="WIDTHxHEIGHT")
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.1], help="fraction of edges blocked")
+    parser.add_argument("--bots", type=int, nargs="+", default=[5, 50])
+    parser.add_argument("--orders", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--full", action="store_true", help="10x10..500x500, 5..5000 bots, 10..100k orders")
+    parser.add_argument("--path-samples", type=int, default=200)
+    parser.add_argument("--dispatch-reps", type=int, default=3)
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--dispatch-mode", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--db-url", default=None, help="postgres db to run in (inside a throwaway schema) instead of a temp sqlite file"
+    )
+    parser.add_argument("--out", default=None, help="write json results here (default: stdout)")
+    parser.add_argument("--compare", default=None, help="baseline json from an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio that counts as a regression")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.db_url and make_url(args.db_url).get_backend_name() != "postgresql":
+        parser.error("--db-url must be a postgresql url -- leave it out to run on temp sqlite dbs")
+    if args.full:
+        args.grids, args.bots, args.orders = FULL_GRIDS, FULL_BOTS, FULL_ORDERS
+
+    result = run_suite(args)
+    output = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), result, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over x{args.threshold}", file=sys.stderr)
+            sys.exit(1)
@@ -15,6 +15,9 @@ from fastapi.testclient import TestClient
 from app.database import Base, get_db
 from app.models import Node, Restaurant, Bot, BlockedEdge
 from app.models.bot import BotStatus
+from app.services.admission import restaurant_admission
+from app.services.grid_graph import reset_grid_graph
+from app.services.simulation import reset_simulation_service
 
 # sqlite, fast and disposable
 TEST_DATABASE_URL = "sqlite:///./test.db"
@@ -39,6 +42,12 @@ def db_session():
     # fresh tables for every single test
     # we use create_all here (not alembic) because sqlite can't handle postgres enums
     Base.metadata.create_all(bind=engine)
+    # the grid graph is shared process-wide, drop it so each test reloads from its own seed data
+    reset_grid_graph()
+    # same for the long-lived simulation engine, it would otherwise carry bots/orders over between tests
+    reset_simulation_service()
+    # and the api's restaurant windows, or one test's orders would throttle the next
+    restaurant_admission.reset()
     session = TestingSessionLocal()
     try:
         yield session
@@ -57,9 +66,11 @@ def client(db_session):
             pass
 
     # patch out run_migrations so the lifespan doesn't try to run alembic on sqlite
-    # also patch load_initial_data since we seed data ourselves in fixtures
+    # also patch load_initial_data since we seed data ourselves in fixtures, and load_grid_graph
+    # since the graph gets lazily loaded from the test db on first use instead
     with patch("app.main.run_migrations"), \
-         patch("app.main.load_initial_data"):
+         patch("app.main.load_initial_data"), \
+         patch("app.main.load_grid_graph"):
         # importing app here to avoid circular issues
         from app.main import app
         app.dependency_overrides[get_db] = override_get_db
@@ -108,3 +119,18 @@ def seed_bots(db_session, seed_nodes):
 def seed_all(seed_nodes, seed_restaurant, seed_bots):
     # convenience fixture when you want everything
     pass
+
+
+@pytest.fixture
+def query_counter():
+    # counts every sql statement sent through the test engine -- for n+1 regression tests
+    counter = {"count": 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
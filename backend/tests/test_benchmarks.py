@@ -0,0 +1,43 @@
+# benchmark suite smoke test - tiny case end to end, json shape and the regression compare
+
+import json
+import sqlite3
+
+import pytest
+
+from benchmarks.suite import compare, main
+
+
+def test_benchmark_suite_writes_comparable_json(tmp_path):
+    out = tmp_path / "results.json"
+    main(["--grids", "6x5", "--bots", "2", "--orders", "5", "--path-samples", "10", "--ticks", "3", "--out", str(out)])
+
+    result = json.loads(out.read_text())
+    case = result["cases"][0]
+    assert case["case"] == "6x5/d0.1/b2/o5"
+    assert case["seeded"]["nodes"] == 30
+    assert case["pathfinding"]["samples"] == 10
+    assert case["pathfinding"]["mode"] == "table"
+    assert case["dispatch"]["assigned"] > 0
+    assert case["tick"]["samples"] == 3
+    assert case["tick"]["queries_per_tick_max"] >= 1
+
+    # same numbers against themselves -> no regressions; a 10x slower run gets flagged
+    assert compare(result, result, 1.2) == []
+    slower = json.loads(out.read_text())
+    slower["cases"][0]["tick"]["p50_ms"] = case["tick"]["p50_ms"] * 10
+    assert compare(result, slower, 1.2)
+
+
+def test_benchmark_suite_refuses_to_touch_a_non_scratch_db(tmp_path):
+    # the suite used to drop_all whatever --db-url pointed at
+    path = tmp_path / "real.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE nodes (id INTEGER PRIMARY KEY)")
+        conn.execute("INSERT INTO nodes VALUES (1)")
+
+    with pytest.raises(SystemExit):
+        main(["--grids", "6x5", "--bots", "2", "--orders", "5", "--ticks", "1", "--db-url", f"sqlite:///{path}"])
+
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM nodes").fetchone() == (1,)
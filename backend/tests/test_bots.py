@@ -22,3 +22,29 @@ def test_get_single_bot(client, seed_bots):
 def test_get_bot_not_found(client, seed_bots):
     response = client.get("/api/bots/999")
     assert response.status_code == 404
+
+
+def test_get_bots_query_count_is_constant(client, db_session, seed_all, query_counter):
+    from app.models import Bot, Order
+    from app.models.order import OrderStatus
+
+    def queries_for_listing():
+        query_counter["count"] = 0
+        response = client.get("/api/bots")
+        assert response.status_code == 200
+        return query_counter["count"], response.json()
+
+    # first call warms up the shared grid graph, measure from the second one
+    queries_for_listing()
+    small, _ = queries_for_listing()
+
+    # pile on more bots, each carrying an order
+    for i in range(3, 13):
+        db_session.add(Bot(id=i, name=f"Bot-{i}", current_node_id=5, max_capacity=3))
+        db_session.add(Order(restaurant_id=1, pickup_node_id=1, delivery_node_id=2, bot_id=i, status=OrderStatus.ASSIGNED))
+    db_session.commit()
+
+    large, bots = queries_for_listing()
+    assert large == small
+    loaded = [b for b in bots if b["id"] >= 3]
+    assert all(b["current_order_count"] == 1 and b["available_capacity"] == 2 for b in loaded)
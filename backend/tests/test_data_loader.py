@@ -0,0 +1,75 @@
+# csv import tests - chunked bulk load, dynamic restaurant columns, validation, configurable station
+
+import pytest
+
+from app.config import settings
+from app.models import Node, Restaurant, Bot, BlockedEdge
+from app.utils.data_loader import load_map, load_blocked_edges, create_bots
+
+
+def _write_map(tmp_path, rows, header="id,x,y,delivery_point,RAMEN,TACOS"):
+    path = tmp_path / "map.csv"
+    path.write_text("\ufeff" + header + "\n" + "\n".join(rows) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def _grid_rows(width, height):
+    rows = []
+    for y in range(height):
+        for x in range(width):
+            node_id = y * width + x + 1
+            rows.append(f"{node_id},{x},{y},{'TRUE' if y == 0 else 'FALSE'},"
+                        f"{'TRUE' if node_id == 2 else 'FALSE'},{'TRUE' if node_id == 7 else 'FALSE'}")
+    return rows
+
+
+def test_load_map_in_chunks_with_dynamic_restaurants(db_session, tmp_path):
+    csv_path = _write_map(tmp_path, _grid_rows(4, 3))
+
+    # chunk size smaller than the file so several bulk inserts happen
+    result = load_map(db_session, csv_path, chunk_size=5)
+
+    assert result["nodes"]["loaded"] == 12
+    assert result["restaurants"]["loaded"] == 2
+    assert db_session.query(Node).count() == 12
+    assert db_session.query(Node).filter(Node.is_delivery_point).count() == 4
+    assert {(r.name, r.node_id) for r in db_session.query(Restaurant)} == {("RAMEN", 2), ("TACOS", 7)}
+
+    # second call is a no-op
+    assert load_map(db_session, csv_path)["nodes"]["loaded"] == 0
+
+
+def test_load_map_rejects_bad_rows(db_session, tmp_path):
+    rows = _grid_rows(2, 2)
+    rows[2] = "3,0,1,MAYBE,FALSE,FALSE"
+    with pytest.raises(ValueError, match="line 4"):
+        load_map(db_session, _write_map(tmp_path, rows))
+
+    rows = _grid_rows(2, 2)
+    rows[3] = "4,0,0,FALSE,FALSE,FALSE"
+    with pytest.raises(ValueError, match="duplicate coordinates"):
+        load_map(db_session, _write_map(tmp_path, rows))
+
+    with pytest.raises(ValueError, match="missing columns"):
+        load_map(db_session, _write_map(tmp_path, ["1,0,0"], header="id,x,y"))
+
+
+def test_blocked_edges_and_configurable_station(db_session, tmp_path, monkeypatch):
+    load_map(db_session, _write_map(tmp_path, _grid_rows(4, 3)))
+
+    edges = tmp_path / "blocked.csv"
+    edges.write_text("from_id,to_id\n1,2\n5,9\n")
+    assert load_blocked_edges(db_session, str(edges), chunk_size=1)["loaded"] == 2
+    assert db_session.query(BlockedEdge).count() == 2
+
+    bad = tmp_path / "bad.csv"
+    bad.write_text("from_id,to_id\n1,99\n")
+    db_session.query(BlockedEdge).delete()
+    with pytest.raises(ValueError, match="unknown node"):
+        load_blocked_edges(db_session, str(bad))
+    db_session.rollback()
+
+    monkeypatch.setattr(settings, "STATION_X", 2)
+    monkeypatch.setattr(settings, "STATION_Y", 1)
+    assert create_bots(db_session, 3) == 3
+    assert {b.current_node_id for b in db_session.query(Bot)} == {7}
@@ -0,0 +1,199 @@
+# dispatch tests - min-cost matching, batch vs greedy assignment, and monte carlo fleet sizing
+
+import itertools
+import random
+
+from app.models import Node, Restaurant, Bot, Order
+from app.models.bot import BotStatus
+from app.models.order import OrderStatus
+from app.services.assignment import INF, min_cost_assignment
+from app.services.simulation import SimulationService
+
+
+def _brute_force(cost):
+    # best total over every way to match the smaller side
+    rows, cols = len(cost), len(cost[0])
+    best = INF
+    if rows <= cols:
+        for perm in itertools.permutations(range(cols), rows):
+            best = min(best, sum(cost[r][c] for r, c in enumerate(perm)))
+    else:
+        for perm in itertools.permutations(range(rows), cols):
+            best = min(best, sum(cost[r][c] for c, r in enumerate(perm)))
+    return best
+
+
+def test_min_cost_assignment_is_optimal():
+    rng = random.Random(7)
+    for rows, cols in [(3, 3), (2, 5), (5, 2), (4, 4)]:
+        for _ in range(20):
+            cost = [[rng.randint(0, 20) for _ in range(cols)] for _ in range(rows)]
+            match = min_cost_assignment(cost)
+            used = [c for c in match if c is not None]
+            assert len(used) == len(set(used)) == min(rows, cols)
+            assert sum(cost[r][c] for r, c in enumerate(match) if c is not None) == _brute_force(cost)
+
+
+def test_min_cost_assignment_skips_unreachable():
+    cost = [[INF, INF], [3, 1]]
+    assert min_cost_assignment(cost) == [None, 1]
+
+
+def _seed_line(db_session):
+    # a 5-node street, restaurants at x=2 and x=4, single-slot bots at x=0 and x=3
+    for x in range(5):
+        db_session.add(Node(id=x + 1, x=x, y=0, is_delivery_point=(x == 0)))
+    db_session.add_all([
+        Restaurant(id=1, name="RAMEN", node_id=3),
+        Restaurant(id=2, name="SUSHI", node_id=5),
+        Bot(id=1, name="Bot-1", current_node_id=1, status=BotStatus.IDLE, max_capacity=1),
+        Bot(id=2, name="Bot-2", current_node_id=4, status=BotStatus.IDLE, max_capacity=1),
+        Order(id=1, restaurant_id=1, pickup_node_id=3, delivery_node_id=1, status=OrderStatus.PENDING),
+        Order(id=2, restaurant_id=2, pickup_node_id=5, delivery_node_id=1, status=OrderStatus.PENDING),
+    ])
+    db_session.commit()
+
+
+def test_batch_dispatch_beats_greedy_on_total_distance(db_session):
+    _seed_line(db_session)
+
+    # greedy hands order 1 to the nearest bot (bot 2), leaving bot 1 a long trip to order 2
+    greedy = SimulationService(db_session, dispatch_mode="greedy")
+    assert greedy._assign_pending_orders() == 2
+    assert {o.id: o.bot_id for o in greedy.orders.values()} == {1: 2, 2: 1}
+
+    batch = SimulationService(db_session, dispatch_mode="batch")
+    assert batch._assign_pending_orders() == 2
+    assert {o.id: o.bot_id for o in batch.orders.values()} == {1: 1, 2: 2}
+
+
+def test_batch_dispatch_respects_restaurant_window(db_session):
+    _seed_line(db_session)
+    db_session.add(Bot(id=3, name="Bot-3", current_node_id=3, status=BotStatus.IDLE, max_capacity=3))
+    for order_id in range(3, 7):
+        db_session.add(Order(id=order_id, restaurant_id=1, pickup_node_id=3, delivery_node_id=1, status=OrderStatus.PENDING))
+    db_session.commit()
+
+    service = SimulationService(db_session, dispatch_mode="batch")
+    service._assign_pending_orders()
+
+    ramen_assigned = [o for o in service.orders.values() if o.restaurant_id == 1 and o.status == OrderStatus.ASSIGNED]
+    assert len(ramen_assigned) == 3
+
+
+def _planning_graph():
+    from app.services.grid_graph import GridGraph
+
+    # 6x5 open grid with the station at (4,3), two restaurants and a row of delivery points along y=0
+    nodes = [(y * 6 + x + 1, x, y, y == 0) for y in range(5) for x in range(6)]
+    return GridGraph(nodes, [], [(1, "RAMEN", 26), (2, "SUSHI", 30)])
+
+
+def test_graph_pickles_with_its_distance_table():
+    import pickle
+
+    graph = _planning_graph()
+    table = graph.distance_table()
+    copy = pickle.loads(pickle.dumps(graph))
+
+    assert copy.version == graph.version
+    assert copy.distance_table() is copy._table
+    assert copy.distance_table().dist == table.dist
+
+
+def test_monte_carlo_runs_match_serial_and_merge_by_scenario():
+    from app.services.montecarlo import run_scenarios, scenario_grid
+
+    graph = _planning_graph()
+    scenarios = scenario_grid(bots=[1, 3], capacities=[3], cooldowns=[30], arrival_rates=[0.3], seeds=3, ticks=200)
+
+    parallel = run_scenarios(graph, scenarios, max_workers=2)
+    serial = run_scenarios(graph, scenarios, max_workers=1)
+
+    def outcomes(result):
+        # timings differ run to run, everything else is deterministic per seed
+        return [{k: v for k, v in r["kpis"].items() if k not in ("elapsed_ms", "ticks_per_second")} for r in result["runs"]]
+
+    assert outcomes(parallel) == outcomes(serial)
+
+    merged = {s["bots"]: s for s in parallel["scenarios"]}
+    assert set(merged) == {1, 3}
+    assert all(s["runs"] == 3 for s in merged.values())
+    # same seeds -> same order stream, so more bots should never deliver slower on average
+    assert merged[3]["kpis"]["mean_delivery_ticks"]["mean"] <= merged[1]["kpis"]["mean_delivery_ticks"]["mean"]
+
+
+def test_spatial_index_yields_bots_closest_first():
+    from app.services.grid_graph import GridGraph
+    from app.services.spatial_index import BotSpatialIndex
+
+    rng = random.Random(4)
+    graph = GridGraph([(y * 30 + x + 1, x, y, False) for y in range(20) for x in range(30)], [], [])
+    index = BotSpatialIndex(graph, 4)
+    positions = {}
+    for bot_id in range(1, 41):
+        positions[bot_id] = rng.randrange(graph.size) + 1
+        index.move(bot_id, positions[bot_id])
+    # a few moves and one bot leaving, the way a tick would
+    for bot_id in (3, 7, 11):
+        positions[bot_id] = rng.randrange(graph.size) + 1
+        index.move(bot_id, positions[bot_id])
+    index.remove(5)
+    del positions[5]
+    assert len(index) == 39
+
+    def manhattan(a, b):
+        (ax, ay), (bx, by) = graph.coords(a), graph.coords(b)
+        return abs(ax - bx) + abs(ay - by)
+
+    for query in (1, 300, 600, 417):
+        expected = sorted((manhattan(node, query), bot_id) for bot_id, node in positions.items() if bot_id % 3)
+        assert list(index.nearest(query, lambda bot_id: bot_id % 3 != 0)) == expected
+
+
+def test_greedy_dispatch_only_measures_bots_that_could_win():
+    from app.services.fleet_state import BotState, OrderState
+    from app.services.grid_graph import GridGraph
+
+    rng = random.Random(9)
+    graph = GridGraph([(y * 40 + x + 1, x, y, y == 0) for y in range(40) for x in range(40)], [], [(1, "RAMEN", 820)])
+    service = SimulationService(graph=graph, dispatch_mode="greedy")
+    service.bots = {
+        bot_id: BotState(id=bot_id, name=f"Bot-{bot_id}", current_node_id=rng.randrange(1600) + 1,
+                         status=BotStatus.IDLE, max_capacity=1)
+        for bot_id in range(1, 201)
+    }
+    service.orders = {
+        order_id: OrderState(id=order_id, restaurant_id=1, pickup_node_id=820, delivery_node_id=order_id,
+                             bot_id=None, status=OrderStatus.PENDING)
+        for order_id in (1, 2, 3)
+    }
+
+    # brute force: the three closest bots by path length, ties to the lower id
+    distance = service.pathfinder.get_path_length
+    expected = sorted(service.bots.values(), key=lambda b: (distance(b.current_node_id, 820), b.id))[:3]
+
+    gathers = []
+    original = service.pathfinder.distances_to
+
+    def counting(goal, starts):
+        gathers.append(len(starts))
+        return original(goal, starts)
+
+    service.pathfinder.distances_to = counting
+    assert service._assign_pending_orders() == 3
+    assert [service.orders[i].bot_id for i in (1, 2, 3)] == [bot.id for bot in expected]
+    # per order: the closest bot sets the cap, then one gather over everyone inside it -- not all 200
+    assert len(gathers) == 6
+    assert sum(gathers) < 40
+
+    # moving a bot right onto the pickup makes it the next pick, without rebuilding the index
+    index = service._bot_index
+    service.bots[200].current_node_id = 820
+    service._reindex(service.bots[200])
+    service.orders[4] = OrderState(id=4, restaurant_id=1, pickup_node_id=820, delivery_node_id=4,
+                                   bot_id=None, status=OrderStatus.PENDING)
+    service._restaurant_window.reset()
+    assert service._assign_pending_orders() == 1
+    assert service.orders[4].bot_id == 200
+    assert service._bot_index is index
@@ -24,3 +24,43 @@ def test_get_grid_full(client, seed_nodes, seed_restaurant):
 def test_get_node_not_found(client, seed_nodes):
     response = client.get("/api/grid/nodes/999")
     assert response.status_code == 404
+
+
+def test_block_and_unblock_edge(client, seed_nodes):
+    # nodes 1 (0,0) and 2 (1,0) are neighbours
+    response = client.post("/api/grid/blocked-edges", json={"from_node_id": 2, "to_node_id": 1})
+    assert response.status_code == 201
+    edge = response.json()
+    assert (edge["from_node_id"], edge["to_node_id"]) == (1, 2)
+
+    edges = client.get("/api/grid/blocked-edges").json()
+    assert [e["id"] for e in edges] == [edge["id"]]
+
+    # blocking it twice is a conflict
+    again = client.post("/api/grid/blocked-edges", json={"from_node_id": 1, "to_node_id": 2})
+    assert again.status_code == 409
+
+    delete = client.delete(f"/api/grid/blocked-edges/{edge['id']}")
+    assert delete.status_code == 204
+    assert client.get("/api/grid/blocked-edges").json() == []
+
+
+def test_block_edge_rejects_non_adjacent_nodes(client, seed_nodes):
+    # (0,0) and (2,0) aren't neighbours
+    response = client.post("/api/grid/blocked-edges", json={"from_node_id": 1, "to_node_id": 3})
+    assert response.status_code == 400
+
+
+def test_block_edge_conflict_from_concurrent_insert(client, seed_nodes, db_session):
+    from app.models import BlockedEdge
+    from app.services.grid_graph import get_grid_graph
+
+    # another request got its row in first, but the shared graph hasn't seen it yet -- the unique constraint
+    # is what catches it, and that's still a 409, not a 500
+    get_grid_graph(db_session)
+    db_session.add(BlockedEdge(from_node_id=1, to_node_id=2))
+    db_session.commit()
+
+    response = client.post("/api/grid/blocked-edges", json={"from_node_id": 2, "to_node_id": 1})
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Edge is already blocked"
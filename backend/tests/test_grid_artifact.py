@@ -0,0 +1,102 @@
+# grid artifact tests - build, mmap round trip, fingerprint staleness
+
+import pytest
+
+from app.models import Node, Restaurant, BlockedEdge
+from app.services.grid_artifact import build_artifact, db_fingerprint, load_or_rebuild, map_artifact
+from app.services.grid_graph import GridGraph
+from app.services.pathfinding import PathfindingService
+
+
+def _seed_grid(db_session):
+    for y in range(4):
+        for x in range(5):
+            db_session.add(Node(id=y * 5 + x + 1, x=x, y=y, is_delivery_point=(y == 0)))
+    db_session.add_all([
+        Restaurant(id=1, name="RAMEN", node_id=17),
+        BlockedEdge(id=1, from_node_id=7, to_node_id=8),
+        BlockedEdge(id=2, from_node_id=8, to_node_id=13),
+    ])
+    db_session.commit()
+
+
+def test_artifact_round_trip_matches_db_graph(db_session, tmp_path):
+    _seed_grid(db_session)
+    path = str(tmp_path / "grid.bin")
+    header = build_artifact(db_session, path)
+    assert header["has_tables"]
+
+    mapped = map_artifact(path, db_fingerprint(db_session))
+    built = GridGraph.from_db(db_session)
+
+    assert list(mapped.node_ids) == list(built.node_ids)
+    assert list(mapped.offsets) == list(built.offsets)
+    assert list(mapped.targets) == list(built.targets)
+    assert mapped.blocked_edges == built.blocked_edges
+    assert mapped.restaurants == built.restaurants
+    assert mapped.delivery_point_ids() == built.delivery_point_ids()
+    assert mapped.station_node_id() == built.station_node_id()
+
+    # tables come straight out of the mapping, no bfs
+    assert mapped._table is not None
+    mapped_paths = PathfindingService(graph=mapped)
+    built_paths = PathfindingService(graph=built)
+    for start in (1, 7, 20):
+        for goal in (3, 8, 16):
+            assert mapped_paths.find_path(start, goal) == built_paths.find_path(start, goal)
+
+    # runtime edge changes still work on top of a mapped graph
+    repaired, _ = mapped.distance_table().repaired(mapped.with_blocked_edge(3, 1, 2), 1, 2)
+    assert repaired.distance(1, 2) == 3
+
+
+def test_stale_artifact_is_rebuilt(db_session, tmp_path):
+    _seed_grid(db_session)
+    path = str(tmp_path / "grid.bin")
+    build_artifact(db_session, path)
+
+    db_session.add(BlockedEdge(id=3, from_node_id=1, to_node_id=2))
+    db_session.commit()
+
+    with pytest.raises(ValueError, match="stale"):
+        map_artifact(path, db_fingerprint(db_session))
+
+    graph = load_or_rebuild(db_session, path)
+    assert (1, 2) in graph.blocked_pairs
+    # and the rewritten artifact is current again
+    assert (1, 2) in map_artifact(path, db_fingerprint(db_session)).blocked_pairs
+
+
+def test_fingerprint_sees_changes_that_keep_the_sums(db_session):
+    _seed_grid(db_session)
+    before = db_fingerprint(db_session)
+
+    # both closures move elsewhere, but count, sum(id), sum(id * from) and sum(id * to) all stay the same
+    for edge_id, from_id, to_id in ((1, 9, 10), (2, 7, 12)):
+        edge = db_session.get(BlockedEdge, edge_id)
+        edge.from_node_id, edge.to_node_id = from_id, to_id
+    db_session.commit()
+    assert db_fingerprint(db_session) != before
+
+
+def test_mangled_header_falls_back_to_a_rebuild(db_session, tmp_path):
+    import json
+    import sys
+    from app.services.grid_artifact import PREAMBLE, MAGIC, FORMAT_VERSION
+
+    _seed_grid(db_session)
+    path = tmp_path / "grid.bin"
+    # a header without its sections -- the kind of artifact an older or interrupted build could leave behind
+    header = json.dumps({"fingerprint": db_fingerprint(db_session), "byteorder": sys.byteorder}).encode()
+    path.write_bytes(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)) + header)
+
+    graph = load_or_rebuild(db_session, str(path))
+    assert graph.size == 20
+    assert map_artifact(str(path), db_fingerprint(db_session)).size == 20
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / "junk.bin"
+    path.write_bytes(b"definitely not a grid artifact")
+    with pytest.raises(ValueError, match="Not a grid artifact"):
+        map_artifact(str(path))
@@ -1,5 +1,8 @@
 # order api tests - create, get, cancel
 
+import pytest
+
+
 def test_create_order(client, seed_all):
     # order from ramen restaurant to delivery node 2
     response = client.post("/api/orders", json={
@@ -61,3 +64,450 @@ def test_cancel_order(client, seed_all):
 
     cancel_resp = client.delete(f"/api/orders/{order_id}")
     assert cancel_resp.status_code == 204
+
+
+def test_cancel_checks_engine_progress_not_yet_written(client, db_session, seed_all):
+    from app.models.order import OrderStatus
+    from app.services.simulation import get_simulation_service
+
+    order_id = client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2}).json()["id"]
+    # the engine picked it up this tick but hasn't flushed yet -- too late to cancel
+    service = get_simulation_service(db_session)
+    service.orders[order_id].status = OrderStatus.PICKED_UP
+    service._mark_order(service.orders[order_id])
+
+    assert client.delete(f"/api/orders/{order_id}").status_code == 400
+    assert client.get(f"/api/orders/{order_id}").json()["status"] == "PICKED_UP"
+
+
+def test_cancel_is_not_overwritten_by_a_concurrent_flush(client, db_session, seed_all, monkeypatch):
+    import threading
+    from tests.conftest import TestingSessionLocal
+    from app.services.simulation import get_simulation_service
+
+    order_id = client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2}).json()["id"]
+    service = get_simulation_service(db_session)
+    real_commit = db_session.commit
+    flushes = []
+
+    def commit_then_flush():
+        real_commit()
+        if flushes:
+            return
+        # a tick lands right after the cancel commits, with its own (still ASSIGNED) copy of the order dirty
+        service._mark_order(service.orders[order_id])
+        other = TestingSessionLocal()
+        flusher = threading.Thread(target=lambda: (service.flush(other), other.close()))
+        flushes.append(flusher)
+        flusher.start()
+        flusher.join(0.2)
+
+    monkeypatch.setattr(db_session, "commit", commit_then_flush)
+    assert client.delete(f"/api/orders/{order_id}").status_code == 204
+    flushes[0].join(5)
+    monkeypatch.undo()
+
+    db_session.expire_all()
+    assert client.get(f"/api/orders/{order_id}").json()["status"] == "CANCELLED"
+
+
+def test_order_views_etag_changes_with_order_events(client, seed_all):
+    first = client.get("/api/orders")
+    etag = first.headers["etag"]
+
+    # nothing changed -- a polling client gets a 304 instead of the list again
+    again = client.get("/api/orders", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+    order_id = client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2}).json()["id"]
+    after = client.get("/api/orders", headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["etag"] != etag
+    assert [o["id"] for o in after.json()] == [order_id]
+
+    history = client.get(f"/api/orders/{order_id}/history")
+    assert client.get(
+        f"/api/orders/{order_id}/history", headers={"If-None-Match": history.headers["etag"]}
+    ).status_code == 304
+
+
+
+def test_order_view_etags_are_per_query_and_follow_every_write(client, db_session, seed_all):
+    from app.models import Order
+    from app.models.order import OrderStatus
+
+    listing = client.get("/api/orders?status=pending&limit=10").headers["etag"]
+    # same view, params in another order -- same etag; a different view never shares it
+    assert client.get("/api/orders?limit=10&status=pending").headers["etag"] == listing
+    assert client.get("/api/orders?status=pending&limit=11").headers["etag"] != listing
+    assert client.get("/api/orders?status=delivered&limit=10", headers={"If-None-Match": listing}).status_code == 200
+
+    order = Order(restaurant_id=1, pickup_node_id=1, delivery_node_id=2, status=OrderStatus.PENDING)
+    db_session.add(order)
+    db_session.commit()
+    listing = client.get("/api/orders?status=pending&limit=10").headers["etag"]
+
+    # moving the delivery point isn't a status change, but the view still changed
+    assert client.put(f"/api/orders/{order.id}", json={"delivery_node_id": 3}).status_code == 200
+    after = client.get("/api/orders?status=pending&limit=10", headers={"If-None-Match": listing})
+    assert after.status_code == 200
+    assert after.json()[0]["delivery_node_id"] == 3
+
+def test_order_stream_pushes_status_transitions(client, seed_all):
+    import asyncio
+    import json
+    from app.routers.orders import _status_snapshot
+    from app.services.order_events import order_events
+
+    def parse(frame):
+        event, data = frame.strip().split("\n")
+        return event[len("event: "):], json.loads(data[len("data: "):])
+
+    async def scenario():
+        broadcaster = order_events.broadcaster
+        broadcaster.bind(asyncio.get_running_loop())
+        queue = broadcaster.subscribe()
+
+        async def snapshot():
+            return await asyncio.to_thread(_status_snapshot)
+
+        async def never_disconnected():
+            return False
+
+        stream = broadcaster.stream(queue, snapshot, never_disconnected)
+        try:
+            event, data = parse(await stream.__anext__())
+            assert event == "snapshot"
+            assert data["orders"] == []
+
+            order_id = client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2}).json()["id"]
+            client.delete(f"/api/orders/{order_id}")
+
+            frames = [parse(await asyncio.wait_for(stream.__anext__(), 2)) for _ in range(3)]
+            assert [e for e, _ in frames] == ["status", "status", "status"]
+            transitions = [(ev["order_id"], ev["old_status"], ev["new_status"]) for _, d in frames for ev in d["events"]]
+            assert transitions == [
+                (order_id, None, "PENDING"),
+                (order_id, "PENDING", "ASSIGNED"),
+                (order_id, "ASSIGNED", "CANCELLED"),
+            ]
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    asyncio.run(scenario())
+
+
+def test_list_orders_query_count_is_constant(client, db_session, seed_all, query_counter):
+    from app.models import Bot, Order
+    from app.models.order import OrderStatus
+
+    def queries_for_listing(limit):
+        query_counter["count"] = 0
+        response = client.get(f"/api/orders?limit={limit}")
+        assert response.status_code == 200
+        return query_counter["count"], response.json()
+
+    # a mix of unassigned orders and orders spread over several bots, so every join has something to load
+    for i in range(3, 13):
+        db_session.add(Bot(id=i, name=f"Bot-{i}", current_node_id=5, max_capacity=3))
+    for i in range(40):
+        bot_id = 3 + i % 10 if i % 2 else None
+        status = OrderStatus.ASSIGNED if bot_id else OrderStatus.PENDING
+        db_session.add(Order(restaurant_id=1, pickup_node_id=1, delivery_node_id=2 + i % 2, bot_id=bot_id, status=status))
+    db_session.commit()
+
+    small, _ = queries_for_listing(1)
+    large, orders = queries_for_listing(40)
+    assert large == small
+    assert len(orders) == 40
+    assigned = [o for o in orders if o["bot_id"]]
+    assert all(o["bot_name"] == f"Bot-{o['bot_id']}" for o in assigned)
+    assert all(o["restaurant_name"] == "RAMEN" and o["pickup_address"] and o["delivery_address"] for o in orders)
+
+    # the per-bot listing goes through the same single query
+    query_counter["count"] = 0
+    bot_orders = client.get("/api/bots/4/orders").json()
+    per_bot = query_counter["count"]
+    query_counter["count"] = 0
+    client.get("/api/bots/3/orders")
+    assert len(bot_orders) == 4 and per_bot == query_counter["count"]
+    assert bot_orders[0]["delivery_address"]
+
+
+def test_list_orders_keyset_pagination_and_filters(client, db_session, seed_all):
+    from datetime import datetime, timedelta
+    from app.models import Order
+    from app.models.order import OrderStatus
+
+    # three orders per second, so the id tiebreak inside one timestamp matters too
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    for i in range(25):
+        db_session.add(Order(
+            restaurant_id=1, pickup_node_id=1, delivery_node_id=2 + i % 2,
+            bot_id=1 if i % 5 == 0 else None,
+            status=OrderStatus.ASSIGNED if i % 5 == 0 else OrderStatus.PENDING,
+            created_at=start + timedelta(seconds=i // 3),
+        ))
+    db_session.commit()
+    expected = [o.id for o in sorted(db_session.query(Order).all(), key=lambda o: (o.created_at, o.id), reverse=True)]
+
+    def walk(params):
+        seen, cursor = [], None
+        while True:
+            page = client.get("/api/orders", params={**params, **({"cursor": cursor} if cursor else {})})
+            assert page.status_code == 200
+            seen.extend(o["id"] for o in page.json())
+            cursor = page.headers.get("x-next-cursor")
+            if not cursor:
+                return seen
+
+    assert walk({"limit": 10}) == expected
+    assert walk({"limit": 7, "delivery_node_id": 3}) == [i for i in expected if i % 2 == 0]
+    assert walk({"limit": 2, "bot_id": 1}) == [i for i in expected if (i - 1) % 5 == 0]
+
+    window = walk({"created_after": (start + timedelta(seconds=2)).isoformat(), "created_before": (start + timedelta(seconds=4)).isoformat()})
+    assert sorted(window) == list(range(7, 13))
+
+    assert client.get("/api/orders", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/orders", params={"limit": 0}).status_code == 400
+
+
+def test_batch_orders_validate_throttle_and_assign_per_item(client, db_session, seed_all):
+    from app.models import Restaurant
+    db_session.add(Restaurant(id=2, name="CURRY", node_id=4))
+    db_session.commit()
+
+    response = client.post("/api/orders/batch", json={"orders": [
+        {"restaurant_id": 1, "delivery_node_id": 2},
+        {"restaurant_id": 999, "delivery_node_id": 2},
+        {"restaurant_id": 1, "delivery_node_id": 3},
+        {"restaurant_id": 1, "delivery_node_id": 1},
+        {"restaurant_id": 2, "delivery_node_id": 2},
+        {"restaurant_id": 1, "delivery_node_id": 99},
+        {"restaurant_id": 1, "delivery_node_id": 2},
+        # the window is applied across the batch -- this is RAMEN's 4th accepted order
+        {"restaurant_id": 1, "delivery_node_id": 3},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["rejected"]) == (4, 4)
+    assert [r["index"] for r in body["results"]] == list(range(8))
+    assert [r["status_code"] for r in body["results"]] == [201, 404, 201, 400, 201, 404, 201, 429]
+
+    created = [r["order"] for r in body["results"] if r["status_code"] == 201]
+    assert [o["restaurant_name"] for o in created] == ["RAMEN", "RAMEN", "CURRY", "RAMEN"]
+    # one assignment pass, spread by load like the single-order path
+    assert all(o["status"] == "ASSIGNED" for o in created)
+    assert sorted(o["bot_id"] for o in created) == [1, 1, 2, 2]
+
+    # the batch counts against the window for later single posts too
+    single = client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2})
+    assert single.status_code == 429
+
+
+def test_batch_orders_query_count_is_constant(client, db_session, seed_all, query_counter):
+    from app.models import Bot
+
+    for i in range(3, 9):
+        db_session.add(Bot(id=i, name=f"Bot-{i}", current_node_id=5, max_capacity=3))
+    db_session.commit()
+    # warm the engine and the grid graph first
+    client.get("/api/simulation/bots/positions")
+
+    def queries_for_batch(size):
+        query_counter["count"] = 0
+        response = client.post("/api/orders/batch", json={"orders": [{"restaurant_id": 1, "delivery_node_id": 2}] * size})
+        assert response.json()["created"] == size
+        return query_counter["count"]
+
+    # sqlite can't hand back ids from a multi-row insert in submission order, so there sqlalchemy sends the
+    # insert row by row (postgres does it in one statement) -- every other round trip stays flat
+    assert queries_for_batch(1) - 1 == queries_for_batch(2) - 2
+
+
+def test_grouped_intake_keeps_single_post_semantics(client, seed_all, monkeypatch):
+    from app.config import settings
+    from app.routers.orders import order_intake
+
+    monkeypatch.setattr(settings, "ORDER_INTAKE_MODE", "grouped")
+    written = order_intake.items_written
+
+    first = client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2})
+    assert first.status_code == 201
+    assert first.json()["restaurant_name"] == "RAMEN"
+    assert first.json()["status"] == "ASSIGNED"
+
+    assert client.post("/api/orders", json={"restaurant_id": 999, "delivery_node_id": 2}).status_code == 404
+    assert client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 1}).status_code == 400
+    for _ in range(2):
+        assert client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 3}).status_code == 201
+    throttled = client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2})
+    assert throttled.status_code == 429
+    assert "RAMEN" in throttled.json()["detail"]
+
+    # every one of those went through the writer
+    assert order_intake.items_written - written == 6
+    assert len(client.get("/api/orders").json()) == 3
+
+
+def test_group_commit_queue_batches_concurrent_callers():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services.group_commit import GroupCommitQueue
+
+    class FakeSession:
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    batch_sizes = []
+
+    def handler(db, items):
+        batch_sizes.append(len(items))
+        if "boom" in items:
+            raise RuntimeError("boom")
+        return [item * 2 for item in items]
+
+    writer = GroupCommitQueue(handler, FakeSession, max_batch=8, max_wait_seconds=0.05)
+    try:
+        start = threading.Barrier(20)
+
+        def call(i):
+            start.wait()
+            return writer.submit(i).result(timeout=5)
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(call, range(20)))
+
+        # every caller gets its own result back, but far fewer commits than callers
+        assert results == [i * 2 for i in range(20)]
+        assert sum(batch_sizes) == 20
+        assert max(batch_sizes) <= 8
+        assert writer.batches_written < 20
+
+        # a failing batch fails every caller in it, and the writer keeps going
+        with pytest.raises(RuntimeError):
+            writer.submit("boom").result(timeout=5)
+        assert writer.submit(21).result(timeout=5) == 42
+    finally:
+        writer.stop()
+
+
+def test_group_commit_skips_items_whose_caller_gave_up():
+    import threading
+    from app.services.group_commit import GroupCommitQueue
+
+    class FakeSession:
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    written = []
+    busy = threading.Event()
+    release = threading.Event()
+
+    def handler(db, items):
+        busy.set()
+        release.wait(5)
+        written.extend(items)
+        return items
+
+    writer = GroupCommitQueue(handler, FakeSession, max_batch=1, max_wait_seconds=0)
+    try:
+        first = writer.submit("first")
+        assert busy.wait(5)
+        # queued behind a slow batch: the caller times out and cancels, so it must never be written
+        late = writer.submit("late")
+        assert late.cancel()
+        # the one being written can't be cancelled any more -- its caller waits for the real result
+        assert not first.cancel()
+        release.set()
+        assert first.result(timeout=5) == "first"
+        assert writer.submit("next").result(timeout=5) == "next"
+        assert written == ["first", "next"]
+    finally:
+        release.set()
+        writer.stop()
+
+
+def test_sliding_window_limiter_clock_and_concurrency():
+    import threading
+    from app.services.admission import SlidingWindowLimiter
+
+    now = [0]
+    ticks = SlidingWindowLimiter(3, 30, clock=lambda: now[0])
+    assert [ticks.try_admit("ramen")[0] for _ in range(4)] == [True, True, True, False]
+    assert ticks.try_admit("curry") == (True, 0)
+    now[0] = 29
+    assert ticks.try_admit("ramen") == (False, 3)
+    # the first three fall out of the window together
+    now[0] = 30
+    assert ticks.room("ramen") == 3
+    ticks.record("ramen")
+    assert ticks.count("ramen") == 1
+    ticks.release("ramen")
+    assert ticks.count("ramen") == 0
+    ticks.release("ramen")
+    assert ticks.count("ramen") == 0
+
+    # check-and-record is atomic: 50 racing callers, exactly `limit` get in
+    shared = SlidingWindowLimiter(5, 60)
+    start = threading.Barrier(50)
+    admitted = []
+
+    def race():
+        start.wait()
+        admitted.append(shared.try_admit(1)[0])
+
+    threads = [threading.Thread(target=race) for _ in range(50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert admitted.count(True) == 5
+
+
+def test_failed_commit_gives_the_restaurant_slot_back(client, db_session, seed_all, monkeypatch):
+    from app.services.admission import restaurant_admission
+
+    def failing_commit():
+        raise RuntimeError("db went away")
+
+    monkeypatch.setattr(db_session, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2})
+    with pytest.raises(RuntimeError):
+        client.post("/api/orders/batch", json={"orders": [{"restaurant_id": 1, "delivery_node_id": 2}] * 2})
+    assert restaurant_admission.count(1) == 0
+
+    # nothing was stored and the window is untouched, so all three slots are still there
+    monkeypatch.undo()
+    for _ in range(3):
+        assert client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2}).status_code == 201
+    assert client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2}).status_code == 429
+
+
+def test_restaurant_window_survives_restart(client, db_session, seed_all):
+    from datetime import datetime, timedelta
+    from app.models import Order
+    from app.models.order import OrderStatus
+    from app.services.admission import restaurant_admission, warm_from_db
+
+    # an old order that's long out of the window
+    db_session.add(Order(
+        restaurant_id=1, pickup_node_id=1, delivery_node_id=2, status=OrderStatus.DELIVERED,
+        created_at=datetime.utcnow() - timedelta(hours=1),
+    ))
+    db_session.commit()
+    for _ in range(3):
+        assert client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2}).status_code == 201
+
+    # a restart loses the in-memory windows -- warming from the orders table puts them back
+    restaurant_admission.reset()
+    assert warm_from_db(db_session) == 3
+    assert restaurant_admission.count(1) == 3
+    assert client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2}).status_code == 429
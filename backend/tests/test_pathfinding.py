@@ -0,0 +1,350 @@
+# pathfinding tests - all-pairs table has to agree with plain a*
+
+import numpy as np
+
+from app.config import settings
+from app.models import Node, BlockedEdge
+from app.services.pathfinding import PathfindingService
+from app.services.grid_graph import GridGraph, get_grid_graph
+
+
+def _seed_grid(db_session, size=4):
+    # small open grid with a couple of blocked edges so detours actually matter
+    node_id = 1
+    coords = {}
+    for y in range(size):
+        for x in range(size):
+            db_session.add(Node(id=node_id, x=x, y=y, is_delivery_point=False))
+            coords[(x, y)] = node_id
+            node_id += 1
+    db_session.add_all([
+        BlockedEdge(from_node_id=coords[(1, 0)], to_node_id=coords[(1, 1)]),
+        BlockedEdge(from_node_id=coords[(2, 1)], to_node_id=coords[(2, 2)]),
+    ])
+    db_session.commit()
+    return coords
+
+
+def test_table_matches_astar(db_session, monkeypatch):
+    coords = _seed_grid(db_session)
+
+    table_service = PathfindingService(db_session)
+
+    monkeypatch.setattr(settings, "DISTANCE_TABLE_MAX_NODES", 0)
+    astar_service = PathfindingService(db_session)
+
+    for start in coords.values():
+        for goal in coords.values():
+            assert table_service.get_path_length(start, goal) == astar_service.get_path_length(start, goal)
+
+            path = table_service.find_path(start, goal)
+            assert path[0] == start and path[-1] == goal
+            assert len(path) - 1 == table_service.get_path_length(start, goal)
+
+
+def test_table_respects_blocked_edges(db_session):
+    coords = _seed_grid(db_session)
+
+    service = PathfindingService(db_session)
+    # (1,0) -> (1,1) is blocked, so the bot has to go around
+    assert service.get_path_length(coords[(1, 0)], coords[(1, 1)]) == 3
+
+
+def test_startup_load_builds_the_table(db_session, monkeypatch):
+    from app.services.grid_graph import load_grid_graph
+
+    _seed_grid(db_session)
+    graph = load_grid_graph(db_session)
+    # the first route doesn't pay for the all-pairs build
+    assert graph._table is not None
+    assert PathfindingService(db_session).graph.distance_table() is graph._table
+
+    # past the cap there's nothing to build up front
+    monkeypatch.setattr(settings, "DISTANCE_TABLE_MAX_NODES", 4)
+    assert load_grid_graph(db_session)._table is None
+
+
+def test_table_shared_between_services(db_session):
+    _seed_grid(db_session)
+
+    first = PathfindingService(db_session)
+    second = PathfindingService(db_session)
+    assert first.graph is second.graph
+    assert first.graph.distance_table() is second.graph.distance_table()
+
+
+def test_graph_csr_adjacency(db_session):
+    coords = _seed_grid(db_session, size=3)
+    graph = GridGraph.from_db(db_session)
+
+    assert graph.size == 9
+    assert len(graph.offsets) == graph.size + 1
+    # corner (0,0) only has right + down, and (1,0) lost its downward edge to the block
+    corner = graph.index[coords[(0, 0)]]
+    assert sorted(graph.node_ids[j] for j in graph.neighbors(corner)) == sorted([coords[(1, 0)], coords[(0, 1)]])
+    blocked = graph.index[coords[(1, 0)]]
+    assert coords[(1, 1)] not in [graph.node_ids[j] for j in graph.neighbors(blocked)]
+
+
+def test_graph_versions_are_unique(db_session):
+    _seed_grid(db_session, size=3)
+    first = GridGraph.from_db(db_session)
+    second = GridGraph.from_db(db_session)
+    assert second.version > first.version
+    assert get_grid_graph(db_session).version != first.version
+
+
+def test_repaired_table_matches_full_rebuild(db_session):
+    coords = _seed_grid(db_session, size=6)
+    graph = GridGraph.from_db(db_session)
+    table = graph.distance_table()
+
+    # close an edge out in the corner, then reopen (1,0)-(1,1) on top of that
+    a, b = coords[(5, 4)], coords[(5, 5)]
+    closed = graph.with_blocked_edge(100, a, b)
+    repaired, rows = table.repaired(closed, a, b)
+    assert 0 < rows < closed.size
+    # the untouched rows aren't copied -- only the recomputed ones sit in the overlay
+    assert repaired._dist is table._dist
+    assert len(repaired._overlay) == rows
+    assert repaired.dist == closed.distance_table().dist
+    assert repaired.path(a, b) == closed.distance_table().path(a, b)
+
+    reopened_id = next(e[0] for e in closed.blocked_edges if e[0] != 100)
+    c, d = [e[1:] for e in closed.blocked_edges if e[0] == reopened_id][0]
+    reopened = closed.without_blocked_edge(reopened_id)
+    repaired_again, _ = repaired.repaired(reopened, c, d)
+    assert repaired_again.dist == reopened.distance_table().dist
+    for goal in (a, c, coords[(0, 0)]):
+        for start in (b, d, coords[(3, 2)]):
+            assert repaired_again.path(start, goal) == reopened.distance_table().path(start, goal)
+
+    # a repair that touches most rows folds everything back into fresh flat arrays
+    walled, table = reopened, reopened.distance_table()
+    for x in range(6):
+        walled = walled.with_blocked_edge(200 + x, coords[(x, 2)], coords[(x, 3)])
+        table, _ = table.repaired(walled, coords[(x, 2)], coords[(x, 3)])
+    assert not table._overlay
+    assert table.dist == walled.distance_table().dist
+
+
+def _corridor_graph():
+    # five nodes in a row plus one side pocket under the middle -- ids are y * 5 + x + 1
+    rows = [(x + 1, x, 0, False) for x in range(5)] + [(8, 2, 1, False)]
+    return GridGraph(rows, [], [])
+
+
+def _timeline(start, path):
+    # position per tick, starting with where the bot is before the first step
+    return [start] + list(path)
+
+
+def test_spacetime_planner_dodges_oncoming_bot():
+    from app.services.spacetime import ReservationTable, SpaceTimePlanner
+
+    graph = _corridor_graph()
+    planner = SpaceTimePlanner(PathfindingService(graph=graph), window=16, max_expansions=1000)
+    reservations = ReservationTable()
+
+    # bot 1 drives left to right on ticks 1..4, bot 2 has to get from x=3 to the left end
+    first = planner.plan(1, 1, 5, 1, reservations)
+    assert first == [2, 3, 4, 5]
+    reservations.reserve_path(1, graph.index[1], [graph.index[n] for n in first], 1)
+
+    second = planner.plan(2, 4, 1, 1, reservations)
+    assert second[-1] == 1
+    assert 8 in second
+
+    a, b = _timeline(1, first + [5] * len(second)), _timeline(4, second)
+    for t in range(1, len(b)):
+        assert a[t] != b[t]
+        assert (a[t - 1], a[t]) != (b[t], b[t - 1])
+
+
+def test_spacetime_planner_waits_for_blocked_cell():
+    from app.services.spacetime import ReservationTable, SpaceTimePlanner
+
+    graph = _corridor_graph()
+    planner = SpaceTimePlanner(PathfindingService(graph=graph), window=16, max_expansions=1000)
+    reservations = ReservationTable()
+    for tick in (1, 2, 3):
+        reservations.reserve_node(graph.index[3], tick, 1)
+
+    # the pocket is a dead end, so the only way through is to wait until the middle clears on tick 4
+    path = planner.plan(2, 1, 5, 1, reservations)
+    assert len(path) == 6
+    assert path.index(3) == 3
+    assert path[-1] == 5
+
+    # the station (exempt) never blocks anybody
+    exempt = ReservationTable(exempt=[graph.index[3]])
+    for tick in (1, 2, 3):
+        exempt.reserve_node(graph.index[3], tick, 1)
+    assert planner.plan(2, 1, 5, 1, exempt) == [2, 3, 4, 5]
+
+
+def test_reservation_hold_displaces_conflicting_bookings():
+    from app.services.spacetime import ReservationTable
+
+    graph = _corridor_graph()
+    reservations = ReservationTable()
+    route = [graph.index[n] for n in (2, 3, 4, 5)]
+    reservations.reserve_path(1, graph.index[1], route, 1, park_ticks=3)
+    # the park stopped at nobody else's cells, so it covers the full three ticks after arrival
+    assert all(reservations.nodes[(graph.index[5], tick)] == 1 for tick in (5, 6, 7))
+
+    # a clash is reported instead of silently keeping the first holder
+    assert not reservations.reserve_node(graph.index[3], 2, 2)
+    assert reservations.reserve_node(graph.index[3], 2, 1)
+
+    # bot 2 is stuck on x=3 -- bot 1's whole route through it is dropped so it can be planned again
+    assert reservations.hold(2, graph.index[3], 1, 4) == {1}
+    assert set(reservations.nodes.values()) == {2}
+    assert not reservations.edges
+    assert not reservations.path_free(1, graph.index[1], route, 1)
+
+
+def _random_grid(size, blocked, seed):
+    import random
+
+    rng = random.Random(seed)
+    rows = [(y * size + x + 1, x, y, False) for y in range(size) for x in range(size)]
+    edges = set()
+    while len(edges) < blocked:
+        x, y = rng.randrange(size - 1), rng.randrange(size - 1)
+        a = y * size + x + 1
+        edges.add((a, a + 1) if rng.random() < 0.5 else (a, a + size))
+    return GridGraph(rows, [(k + 1, a, b) for k, (a, b) in enumerate(sorted(edges))], [])
+
+
+def test_hierarchical_paths_are_valid_and_close_to_shortest(monkeypatch):
+    monkeypatch.setattr(settings, "DISTANCE_TABLE_MAX_NODES", 0)
+    monkeypatch.setattr(settings, "HPA_CLUSTER_SIZE", 4)
+    graph = _random_grid(12, 40, seed=3)
+    hpa = PathfindingService(graph=graph, mode="hierarchical")
+    exact = PathfindingService(graph=graph, mode="astar")
+    assert hpa._hierarchy is None and hpa.graph is graph and hpa._hierarchy is not None
+
+    node_ids = list(graph.node_ids)
+    total = extra = 0
+    for start in node_ids[::7]:
+        for goal in node_ids[::5]:
+            shortest = exact.get_path_length(start, goal)
+            path = hpa.find_path(start, goal)
+            if shortest is None:
+                assert path is None
+                continue
+            assert path[0] == start and path[-1] == goal
+            for a, b in zip(path, path[1:]):
+                assert graph.index[b] in graph.neighbors(graph.index[a])
+            assert len(path) - 1 >= shortest
+            total += shortest
+            extra += len(path) - 1 - shortest
+    # tiny clusters on a heavily blocked map is the worst case for the detour through transitions
+    assert extra < 0.15 * total
+
+
+def test_hierarchy_repair_only_rebuilds_touched_clusters(monkeypatch):
+    from app.services.hierarchy import ClusterHierarchy
+
+    graph = _random_grid(12, 20, seed=5)
+    hierarchy = ClusterHierarchy(graph, 4)
+
+    # (3,5)-(4,5) sits on the border between clusters (0,1) and (1,1)
+    a, b = 5 * 12 + 3 + 1, 5 * 12 + 4 + 1
+    closed = graph.with_blocked_edge(999, a, b)
+    repaired, clusters = hierarchy.repaired(closed, a, b)
+    rebuilt = ClusterHierarchy(closed, 4)
+    assert clusters == 2
+    assert repaired.transitions == rebuilt.transitions
+    assert repaired.intra == rebuilt.intra
+    assert repaired.intra[(2, 2)] is hierarchy.intra[(2, 2)]
+
+
+def test_landmark_bounds_are_admissible():
+    from app.services.landmarks import LandmarkTable
+
+    graph = _random_grid(10, 30, seed=11)
+    # cut node (0,9) off completely so there's a second component
+    corner = graph.index[9 * 10 + 1]
+    graph = GridGraph(
+        graph._node_rows(),
+        list(graph.blocked_edges) + [(900, 9 * 10 + 1, 9 * 10 + 2), (901, 9 * 10 + 1, 8 * 10 + 1)],
+        [],
+    )
+    landmarks = LandmarkTable(graph, 4)
+    table = graph.distance_table()
+    assert len(landmarks.landmarks) == 4
+
+    tight = 0
+    for start in range(graph.size):
+        for goal in range(graph.size):
+            active = landmarks.for_query(start, goal)
+            exact = table.distance(graph.node_ids[start], graph.node_ids[goal])
+            if exact is None:
+                # either caught outright, or both ends sit on islands no landmark reaches
+                assert not active
+                continue
+            bound = landmarks.bound(start, active)
+            assert bound <= exact
+            tight += bound == exact
+    assert landmarks.for_query(corner, 0) is None
+    # mostly exact on a map this size -- far better than "admissible but useless"
+    assert tight > graph.size * graph.size // 4
+
+
+def test_landmark_astar_stays_optimal_with_detours(monkeypatch):
+    # a wall down the middle with a single gap at the top -- manhattan badly underestimates crossings
+    monkeypatch.setattr(settings, "DISTANCE_TABLE_MAX_NODES", 0)
+    size = 8
+    rows = [(y * size + x + 1, x, y, False) for y in range(size) for x in range(size)]
+    wall = [(y, y * size + 4, y * size + 5) for y in range(1, size)]
+    graph = GridGraph(rows, wall, [])
+    table = graph.distance_table()
+
+    alt = PathfindingService(graph=graph)
+    assert alt._landmarks is None and alt.graph is graph and alt._landmarks is not None
+    for start in graph.node_ids:
+        for goal in graph.node_ids:
+            assert alt.get_path_length(start, goal) == table.distance(start, goal)
+    assert alt._heuristic(size * (size - 1) + 4, size * (size - 1) + 5) == table.distance(
+        size * (size - 1) + 4, size * (size - 1) + 5
+    )
+
+
+def test_distance_fields_match_table(monkeypatch):
+    monkeypatch.setattr(settings, "DISTANCE_TABLE_MAX_NODES", 0)
+    graph = _random_grid(9, 25, seed=8)
+    # two restaurants and a row of delivery points
+    graph = GridGraph(
+        [(node_id, x, y, y == 8) for node_id, x, y, _ in graph._node_rows()],
+        graph.blocked_edges,
+        [(1, "RAMEN", 1), (2, "SUSHI", 45)],
+    )
+    reference = GridGraph(graph._node_rows(), graph.blocked_edges, graph.restaurants).distance_table()
+    pathfinder = PathfindingService(graph=graph)
+    fields = pathfinder.graph.distance_fields()
+    assert fields.targets == {1, 45, graph.station_node_id()} | set(graph.delivery_point_ids())
+
+    node_ids = list(graph.node_ids)
+    for goal in sorted(fields.targets):
+        expected = [reference.distance(start, goal) for start in node_ids]
+        assert pathfinder.distances_to(goal, node_ids) == expected
+        for start in node_ids[::4]:
+            assert pathfinder.get_path_length(goal, start) == reference.distance(start, goal)
+            path = pathfinder.find_path(start, goal)
+            if expected[graph.index[start]] is None:
+                assert path is None
+                continue
+            assert path[0] == start and path[-1] == goal
+            assert len(path) - 1 == expected[graph.index[start]]
+            for a, b in zip(path, path[1:]):
+                assert graph.index[b] in graph.neighbors(graph.index[a])
+
+    # with a table around, the fields are just views of its rows
+    table_graph = GridGraph(graph._node_rows(), graph.blocked_edges, graph.restaurants)
+    table_graph.distance_table()
+    field = table_graph.distance_fields().field(45)
+    assert isinstance(field, np.ndarray) and field.dtype == np.int32
+    assert not field.flags.owndata
+    assert list(field) == list(reference.dist[graph.index[45] * graph.size:(graph.index[45] + 1) * graph.size])
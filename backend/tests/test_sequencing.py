@@ -0,0 +1,98 @@
+# multi-stop sequencing tests - tour optimality, precedence, and the engine following the plan
+
+import itertools
+import random
+
+from app.models import Node, Restaurant, Bot, Order
+from app.models.bot import BotStatus
+from app.models.order import OrderStatus
+from app.services.fleet_state import OrderState
+from app.services.sequencing import plan_tour, tour_length
+from app.services.simulation import SimulationService
+
+
+def _line_distance(a, b):
+    # nodes on a straight street, node id == position
+    return abs(a - b)
+
+
+def _order(order_id, pickup, delivery, status=OrderStatus.ASSIGNED):
+    return OrderState(
+        id=order_id, restaurant_id=1, pickup_node_id=pickup, delivery_node_id=delivery,
+        bot_id=1, status=status, assigned_at=None, picked_up_at=None, delivered_at=None,
+    )
+
+
+def _best_feasible_length(start, orders):
+    # brute force over every ordering, keeping the ones where each pickup comes before its delivery
+    stops = [(o.delivery_node_id, "DELIVER", o.id) for o in orders]
+    stops += [(o.pickup_node_id, "PICKUP", o.id) for o in orders if o.status == OrderStatus.ASSIGNED]
+
+    best = None
+    for perm in itertools.permutations(stops):
+        index = {(action, order_id): i for i, (_, action, order_id) in enumerate(perm)}
+        if any(index[("PICKUP", oid)] > index[("DELIVER", oid)] for (action, oid) in index if action == "PICKUP"):
+            continue
+        length = tour_length(start, list(perm), _line_distance)
+        best = length if best is None else min(best, length)
+    return best
+
+
+def test_plan_tour_is_optimal_and_respects_precedence():
+    rng = random.Random(3)
+    for _ in range(30):
+        orders = []
+        for order_id in range(1, 4):
+            status = rng.choice([OrderStatus.ASSIGNED, OrderStatus.PICKED_UP])
+            orders.append(_order(order_id, rng.randint(0, 20), rng.randint(0, 20), status))
+        start = rng.randint(0, 20)
+
+        tour = plan_tour(start, orders, _line_distance)
+
+        positions = {(action, order_id): i for i, (_, action, order_id) in enumerate(tour)}
+        for o in orders:
+            assert ("DELIVER", o.id) in positions
+            if o.status == OrderStatus.ASSIGNED:
+                assert positions[("PICKUP", o.id)] < positions[("DELIVER", o.id)]
+            else:
+                assert ("PICKUP", o.id) not in positions
+        assert tour_length(start, tour, _line_distance) == _best_feasible_length(start, orders)
+
+
+def test_plan_tour_beats_nearest_pickup_first():
+    # nearest-first grabs the pickup at 3, runs to 10 for the other, then back -- the plan delivers on the way
+    orders = [_order(1, 3, 0), _order(2, 6, 10)]
+    tour = plan_tour(5, orders, _line_distance)
+    assert tour_length(5, tour, _line_distance) < tour_length(
+        5, [(3, "PICKUP", 1), (6, "PICKUP", 2), (0, "DELIVER", 1), (10, "DELIVER", 2)], _line_distance
+    )
+
+
+def test_bot_follows_sequenced_plan(db_session):
+    # 8-node street, bot at x=4 with two orders: pickups at x=3 and x=5, drop-offs at x=0 and x=7
+    for x in range(8):
+        db_session.add(Node(id=x + 1, x=x, y=0, is_delivery_point=x in (0, 7)))
+    db_session.add_all([
+        Restaurant(id=1, name="RAMEN", node_id=4),
+        Restaurant(id=2, name="SUSHI", node_id=6),
+        Bot(id=1, name="Bot-1", current_node_id=5, status=BotStatus.MOVING, max_capacity=3),
+        Order(id=1, restaurant_id=1, pickup_node_id=4, delivery_node_id=1, bot_id=1, status=OrderStatus.ASSIGNED),
+        Order(id=2, restaurant_id=2, pickup_node_id=6, delivery_node_id=8, bot_id=1, status=OrderStatus.ASSIGNED),
+    ])
+    db_session.commit()
+
+    service = SimulationService(db_session)
+    service._calculate_bot_routes()
+
+    plan = list(service.get_bot_plan(1))
+    assert plan[0][1] == "PICKUP"
+    planned_length = tour_length(5, plan, service.pathfinder.get_path_length)
+
+    ticks = 0
+    while any(o.status != OrderStatus.DELIVERED for o in service.orders.values()) and ticks < 50:
+        service.tick(db_session)
+        ticks += 1
+
+    assert all(o.status == OrderStatus.DELIVERED for o in db_session.query(Order).all())
+    # one node per tick, plus the stop ticks spent picking up / dropping off
+    assert ticks <= planned_length + len(plan)
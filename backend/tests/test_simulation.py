@@ -1,5 +1,8 @@
 # simulation api tests - start, stop, status
 
+import pytest
+
+
 def test_simulation_status(client, seed_all):
     response = client.get("/api/simulation/status")
     assert response.status_code == 200
@@ -18,3 +21,329 @@ def test_start_stop_simulation(client, seed_all):
     stop = client.post("/api/simulation/stop")
     assert stop.status_code == 200
     assert stop.json()["is_running"] == False
+
+
+def test_edge_closure_only_replans_crossing_bots(db_session):
+    from app.models import Node, Bot
+    from app.models.bot import BotStatus
+    from app.services.grid_graph import block_edge
+    from app.services.simulation import SimulationService
+
+    # 5x4 open grid, station at (4,3); one bot parks at (0,3), the other at (4,0)
+    for y in range(4):
+        for x in range(5):
+            db_session.add(Node(id=y * 5 + x + 1, x=x, y=y, is_delivery_point=False))
+    db_session.add_all([
+        Bot(id=1, name="Far", current_node_id=16, status=BotStatus.IDLE),
+        Bot(id=2, name="Near", current_node_id=5, status=BotStatus.IDLE),
+    ])
+    db_session.commit()
+
+    service = SimulationService(db_session)
+    service.tick()
+    near_route = list(service.get_bot_route(2))
+    far_route = list(service.get_bot_route(1))
+
+    # the near bot heads straight down the x=4 column, block its next step
+    db_session.refresh(db_session.get(Bot, 2))
+    current = db_session.get(Bot, 2).current_node_id
+    graph = block_edge(db_session, 999, current, near_route[0])
+    replanned = service.repair_routes(graph, current, near_route[0])
+
+    assert replanned == [2]
+    assert service.get_bot_route(2)[0] != near_route[0]
+    assert service.get_bot_route(1) == far_route
+
+
+def test_routes_survive_between_ticks(client, seed_all):
+    # the engine is long-lived now, so positions should show the route the last tick planned
+    client.post("/api/simulation/start")
+    order = client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2}).json()
+    assert order["status"] == "ASSIGNED"
+
+    tick = client.post("/api/simulation/tick").json()
+    assert tick["results"]["bots_moved"] == 1
+
+    positions = client.get("/api/simulation/bots/positions").json()["bots"]
+    carrier = next(b for b in positions if b["id"] == order["bot_id"])
+    assert carrier["target"]["action"] == "PICKUP"
+    assert carrier["target"]["order_id"] == order["id"]
+    assert carrier["route"] == [1]
+    assert carrier["active_orders"] == 1
+
+    # and the tick's changes were flushed back to the db
+    bot = client.get(f"/api/bots/{order['bot_id']}").json()
+    assert bot["current_node_id"] == carrier["current_node_id"]
+    assert bot["current_node_id"] != 5
+
+
+def test_tick_loop_runs_at_fixed_cadence():
+    import asyncio
+    from app.services.ticker import SimulationTicker
+
+    ticks = []
+
+    async def scenario():
+        # 10ms interval at 2x speed -> a tick every 5ms
+        ticker = SimulationTicker(lambda: ticks.append(1), interval=0.01, speed=2.0)
+        ticker.bind(asyncio.get_running_loop())
+        ticker.start()
+        await asyncio.sleep(0.1)
+        await ticker.shutdown()
+        return ticker.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["ticks"] == len(ticks)
+    assert len(ticks) >= 5
+    assert metrics["period_seconds"] == 0.005
+    assert metrics["running"] is False
+
+
+def test_tick_loop_stop_waits_for_the_tick_in_flight():
+    import asyncio
+    import threading
+    import time
+    from app.services.ticker import SimulationTicker
+
+    started = threading.Event()
+    finished = []
+
+    def slow_tick():
+        started.set()
+        time.sleep(0.05)
+        finished.append(1)
+
+    async def scenario():
+        ticker = SimulationTicker(slow_tick, interval=0.001)
+        ticker.bind(asyncio.get_running_loop())
+        ticker.start()
+        await asyncio.to_thread(started.wait, 5)
+        # stop() is what the sync endpoints call (from a worker thread) -- it only returns once the tick is done
+        await asyncio.to_thread(ticker.stop)
+        done_at_stop = len(finished)
+        # a second stop (e.g. /stop then /reset) has nothing left to wait for
+        await ticker.shutdown()
+        return ticker, done_at_stop
+
+    ticker, done_at_stop = asyncio.run(scenario())
+    assert done_at_stop == len(finished) == 1
+    assert ticker.metrics()["ticks"] == 1
+    assert ticker.is_running is False
+
+
+def test_manual_tick_while_stopped(client, seed_all):
+    # /tick stays around for stepping by hand, even with the loop stopped
+    before = client.get("/api/simulation/status").json()["tick_count"]
+    response = client.post("/api/simulation/tick")
+    assert response.status_code == 200
+    assert response.json()["tick"] == before + 1
+
+    metrics = client.get("/api/simulation/metrics").json()
+    assert metrics["running"] is False
+
+
+def test_headless_run_reports_kpis_without_touching_db(client, seed_all, db_session):
+    from app.models import Order, Bot
+
+    positions_before = [(b.id, b.current_node_id, b.status) for b in db_session.query(Bot).order_by(Bot.id)]
+    script = [{"tick": t, "restaurant_id": 1, "delivery_node_id": 2 + t % 2} for t in range(0, 20, 2)]
+
+    response = client.post("/api/simulation/run", json={
+        "ticks": 500,
+        "orders": script,
+        "bots": [{"node_id": 5}, {"node_id": 5, "max_capacity": 1}],
+    })
+    assert response.status_code == 200
+    kpis = response.json()
+
+    assert kpis["bots"] == 2
+    assert kpis["orders_submitted"] == 10
+    assert kpis["deliveries"] + kpis["undelivered"] == 10
+    assert kpis["deliveries"] > 0
+    assert kpis["mean_delivery_ticks"] <= kpis["p95_delivery_ticks"]
+    assert 0 < kpis["bot_utilization"] <= 1
+    assert kpis["distance_travelled"] > 0
+    # wall-clock ticking runs one tick per SIMULATION_TICK_INTERVAL -- headless should be way past 100x that
+    assert kpis["ticks_per_second"] > 100
+
+    # nothing written back
+    assert db_session.query(Order).count() == 0
+    db_session.expire_all()
+    assert [(b.id, b.current_node_id, b.status) for b in db_session.query(Bot).order_by(Bot.id)] == positions_before
+
+
+def test_headless_kpis_only_count_scripted_orders():
+    from app.models.bot import BotStatus
+    from app.models.order import OrderStatus
+    from app.services.fleet_state import BotState, OrderState
+    from app.services.grid_graph import GridGraph
+    from app.services.headless import OrderArrival, run_headless
+
+    # 6x1 street, restaurant at the far end, delivery point at the start
+    graph = GridGraph([(x + 1, x, 0, x == 0) for x in range(6)], [], [(1, "RAMEN", 6)])
+    bots = [BotState(id=1, name="Bot-1", current_node_id=1, status=BotStatus.IDLE, max_capacity=3)]
+    # one order already pending in the snapshot, two scripted on top of it
+    carried = [OrderState(id=1, restaurant_id=1, pickup_node_id=6, delivery_node_id=1,
+                          bot_id=None, status=OrderStatus.PENDING)]
+    arrivals = [OrderArrival(tick=0, restaurant_id=1, delivery_node_id=1),
+                OrderArrival(tick=2, restaurant_id=1, delivery_node_id=1)]
+
+    kpis = run_headless(graph, bots, arrivals, ticks=100, orders=carried)
+
+    assert kpis["orders_submitted"] == 2
+    assert kpis["deliveries"] == 2
+    assert kpis["undelivered"] == 0
+    assert kpis["snapshot_deliveries"] == 1
+
+
+def test_zero_restaurant_limit_admits_nothing():
+    from app.services.grid_graph import GridGraph
+    from app.services.headless import OrderArrival, fresh_fleet, run_headless
+
+    graph = GridGraph([(x + 1, x, 0, x == 0) for x in range(6)], [], [(1, "RAMEN", 6)])
+    arrivals = [OrderArrival(tick=t, restaurant_id=1, delivery_node_id=1) for t in range(5)]
+
+    # 0 is a real limit, not "use the default"
+    kpis = run_headless(graph, fresh_fleet(graph, [(1, 1)]), arrivals, ticks=50, restaurant_order_limit=0)
+    assert kpis["deliveries"] == 0
+    assert kpis["undelivered"] == 5
+
+
+def test_headless_run_rejects_bad_script(client, seed_all):
+    bad_restaurant = client.post("/api/simulation/run", json={
+        "ticks": 10, "orders": [{"tick": 1, "restaurant_id": 999, "delivery_node_id": 2}],
+    })
+    assert bad_restaurant.status_code == 400
+
+    assert client.post("/api/simulation/run", json={"ticks": 0}).status_code == 400
+
+
+def test_live_stream_snapshot_then_shared_deltas(client, seed_all):
+    import asyncio
+    import json
+    from app.routers.simulation import live_updates, _live_snapshot
+
+    def parse(frame):
+        event, data = frame.strip().split("\n")
+        return event[len("event: "):], json.loads(data[len("data: "):])
+
+    async def scenario():
+        live_updates.bind(asyncio.get_running_loop())
+        viewers = [live_updates.subscribe() for _ in range(3)]
+
+        async def snapshot():
+            return await asyncio.to_thread(_live_snapshot)
+
+        async def never_disconnected():
+            return False
+
+        streams = [live_updates.stream(q, snapshot, never_disconnected) for q in viewers]
+        try:
+            first = [parse(await s.__anext__()) for s in streams]
+            assert all(event == "snapshot" for event, _ in first)
+            assert [b["id"] for b in first[0][1]["bots"]] == [1, 2]
+            assert first[0][1]["status"]["total_orders"] == 0
+
+            client.post("/api/orders", json={"restaurant_id": 1, "delivery_node_id": 2})
+            client.post("/api/simulation/tick")
+
+            frames = []
+            for s in streams:
+                frames.append([await asyncio.wait_for(s.__anext__(), 2) for _ in range(3)])
+            # built once, the very same text goes to every viewer
+            assert frames[0] == frames[1] == frames[2]
+
+            events = [parse(f) for f in frames[0]]
+            assert [e for e, _ in events] == ["delta", "delta", "delta"]
+            created, assigned, ticked = (data for _, data in events)
+            assert created["orders"][0]["status"] == "PENDING"
+            assert created["status"]["total_orders"] == 1
+            assert assigned["orders"][0]["status"] == "ASSIGNED"
+            assert assigned["status"]["pending_orders"] == 0
+            assert ticked["tick"] == 1
+            assert ticked["bots"] and ticked["bots"][0]["status"] == "MOVING"
+        finally:
+            for q in viewers:
+                live_updates.unsubscribe(q)
+
+    asyncio.run(scenario())
+
+
+def test_collision_avoidance_keeps_bots_apart():
+    from app.models.bot import BotStatus
+    from app.models.order import OrderStatus
+    from app.services.fleet_state import BotState, OrderState
+    from app.services.grid_graph import GridGraph
+    from app.services.simulation import SimulationService
+
+    # 5x4 grid, station at (4,3) = node 20, a restaurant in each corner of the top row and deliveries along the bottom
+    rows = [(y * 5 + x + 1, x, y, y == 3) for y in range(4) for x in range(5)]
+    graph = GridGraph(rows, [], [(1, "RAMEN", 1), (2, "SUSHI", 5)])
+    service = SimulationService(graph=graph, collision_avoidance=True)
+    service.bots = {
+        bot_id: BotState(id=bot_id, name=f"Bot-{bot_id}", current_node_id=node, status=BotStatus.IDLE, max_capacity=2)
+        for bot_id, node in enumerate([1, 5, 11, 13, 15, 8], start=1)
+    }
+    for order_id, (restaurant, pickup, delivery) in enumerate([(1, 1, 19), (2, 5, 16), (1, 1, 17), (2, 5, 18)], start=1):
+        service.orders[order_id] = OrderState(
+            id=order_id, restaurant_id=restaurant, pickup_node_id=pickup, delivery_node_id=delivery,
+            bot_id=None, status=OrderStatus.PENDING,
+        )
+    orders = list(service.orders.values())
+
+    previous = {bot.id: bot.current_node_id for bot in service.bots.values()}
+    for _ in range(60):
+        service.tick()
+        positions = {bot.id: bot.current_node_id for bot in service.bots.values()}
+        occupied = [node for node in positions.values() if node != service.station_node_id]
+        assert len(occupied) == len(set(occupied))
+        for a in positions:
+            for b in positions:
+                if a < b and positions[a] != positions[b]:
+                    assert (previous[a], positions[a]) != (positions[b], previous[b])
+        previous = positions
+
+    assert all(order.status == OrderStatus.DELIVERED for order in orders)
+    assert all(bot.current_node_id == service.station_node_id for bot in service.bots.values())
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_collision_avoidance_crowded_grid(seed):
+    import random
+    from app.models.bot import BotStatus
+    from app.models.order import OrderStatus
+    from app.services.fleet_state import BotState, OrderState
+    from app.services.grid_graph import GridGraph
+    from app.services.simulation import SimulationService
+
+    # 12x12 grid, no blocked edges, 30 bots dropped on random nodes -- a new order every tick or two,
+    # so bots keep parking, waiting and crossing each other's routes
+    rng = random.Random(seed)
+    rows = [(y * 12 + x + 1, x, y, x % 3 == 0 and y > 6) for y in range(12) for x in range(12)]
+    restaurants = [(1, "RAMEN", 14), (2, "SUSHI", 23), (3, "TACO", 62), (4, "CURRY", 71)]
+    graph = GridGraph(rows, [], restaurants)
+    service = SimulationService(graph=graph, collision_avoidance=True)
+    start_nodes = rng.sample([node_id for node_id, *_ in rows if node_id != service.station_node_id], 30)
+    service.bots = {
+        bot_id: BotState(id=bot_id, name=f"Bot-{bot_id}", current_node_id=node, status=BotStatus.IDLE, max_capacity=2)
+        for bot_id, node in enumerate(start_nodes, start=1)
+    }
+    drops = [node_id for node_id, _, _, is_delivery in rows if is_delivery]
+
+    previous = {bot.id: bot.current_node_id for bot in service.bots.values()}
+    for tick in range(120):
+        if rng.random() < 0.6:
+            restaurant_id, _, pickup = rng.choice(restaurants)
+            order_id = tick + 1
+            service.orders[order_id] = OrderState(
+                id=order_id, restaurant_id=restaurant_id, pickup_node_id=pickup, delivery_node_id=rng.choice(drops),
+                bot_id=None, status=OrderStatus.PENDING,
+            )
+        service.tick()
+
+        positions = {bot.id: bot.current_node_id for bot in service.bots.values()}
+        occupied = [node for node in positions.values() if node != service.station_node_id]
+        assert len(occupied) == len(set(occupied)), f"tick {tick}: two bots on one node"
+        moves = {(previous[bot_id], node) for bot_id, node in positions.items() if node != previous[bot_id]}
+        assert not any((to, start) in moves for start, to in moves), f"tick {tick}: two bots swapped places"
+        previous = positions
@@ -5,7 +5,7 @@
 "use client";
 import { useEffect, useState, useRef, useCallback, useMemo } from "react";
 import { api } from "@/lib/api";
-import { Grid as GridType, Bot, Order, SimulationStatus } from "@/lib/types";
+import { Grid as GridType, Bot, Order, SimulationStatus, LiveSnapshot, LiveDelta } from "@/lib/types";
 import Grid from "@/components/Grid";
 
 const BOT_COLORS = ["#7c6bf5", "#3b82f6", "#f472b6", "#22d3ee", "#fb923c"];
@@ -108,31 +108,18 @@ function Btn({ onClick, label, color, disabled }: { onClick: () => void; label:
 // Here I am defining the core sections of our dashboard. 
 // These components are reused in both the compact (mobile) and desktop layouts.
 
-// simulation controls — start/stop/tick/reset + auto-tick toggle
-function SimControlsContent({ isRunning, autoRun, setAutoRun, handleStart, handleStop, handleTick, handleReset }: {
-  isRunning: boolean; autoRun: boolean; setAutoRun: (v: boolean) => void;
+// simulation controls — start/stop/tick/reset (the backend runs the tick loop once started)
+function SimControlsContent({ isRunning, handleStart, handleStop, handleTick, handleReset }: {
+  isRunning: boolean;
   handleStart: () => void; handleStop: () => void; handleTick: () => void; handleReset: () => void;
 }) {
   return (
-    <>
-      <div style={{ display: "flex", gap: 6, flexWrap: "wrap" }}>
-        <Btn onClick={handleStart} disabled={isRunning} color="var(--green)" label="▶ Start" />
-        <Btn onClick={handleStop} disabled={!isRunning} color="var(--red)" label="⏹ Stop" />
-        <Btn onClick={handleTick} color="var(--accent)" label="→ Tick" />
-        <Btn onClick={handleReset} color="var(--text-muted)" label="↺ Reset" />
-      </div>
-      <label style={{
-        display: "flex", alignItems: "center", gap: 6, padding: "7px 12px", borderRadius: 8, marginTop: 10,
-        background: autoRun ? "rgba(124,107,245,0.12)" : "var(--bg-input)",
-        border: `1px solid ${autoRun ? "rgba(124,107,245,0.3)" : "var(--border)"}`,
-        cursor: "pointer", fontSize: 13,
-        color: autoRun ? "var(--accent)" : "var(--text-secondary)",
-        userSelect: "none", transition: "all 0.15s ease",
-      }}>
-        <input type="checkbox" checked={autoRun} onChange={(e) => setAutoRun(e.target.checked)} style={{ accentColor: "var(--accent)", margin: 0 }} />
-        Auto-tick every second
-      </label>
-    </>
+    <div style={{ display: "flex", gap: 6, flexWrap: "wrap" }}>
+      <Btn onClick={handleStart} disabled={isRunning} color="var(--green)" label="▶ Start" />
+      <Btn onClick={handleStop} disabled={!isRunning} color="var(--red)" label="⏹ Stop" />
+      <Btn onClick={handleTick} color="var(--accent)" label="→ Tick" />
+      <Btn onClick={handleReset} color="var(--text-muted)" label="↺ Reset" />
+    </div>
   );
 }
 
@@ -280,7 +267,6 @@ export default function Home() {
   const [status, setStatus] = useState<SimulationStatus | null>(null);
   const [selectedRestaurant, setSelectedRestaurant] = useState<number>(0);
   const [selectedDelivery, setSelectedDelivery] = useState<number>(0);
-  const [autoRun, setAutoRun] = useState(false);
   const [showGuide, setShowGuide] = useState(true);
   const [orderFilter, setOrderFilter] = useState<"ALL" | "ACTIVE" | "DELIVERED">("ALL");
   const [windowSize, setWindowSize] = useState({ w: 1400, h: 900 });
@@ -307,17 +293,32 @@ export default function Home() {
   // needed to initialize the map visualization.
   useEffect(() => { api.getGrid().then((g) => { setGrid(g); if (g.restaurants.length) setSelectedRestaurant(g.restaurants[0].id); if (g.delivery_points.length) setSelectedDelivery(g.delivery_points[0].id); }); }, []);
 
-  // I've implemented a robust data streaming loop using polling.
-  // Every second, I am requesting the latest bot positions, active orders, and 
-  // simulation status to keep the UI perfectly in sync with the backend state.
+  // Live updates over server-sent events: the server sends a full snapshot when we connect and then
+  // one delta per tick with just the bots/orders that changed, which I merge into state by id.
+  // EventSource reconnects by itself, and every reconnect starts over with a fresh snapshot.
   useEffect(() => {
-    let alive = true;
-    const poll = async () => { if (!alive) return; try { const [b, o, s] = await Promise.all([api.getBotPositions(), api.getOrders(), api.getStatus()]); if (!alive) return; setBots(b.bots || []); setOrders(o); setStatus(s); } catch (e) { console.error(e); } };
-    poll(); const id = setInterval(poll, 1000); return () => { alive = false; clearInterval(id); };
+    const source = new EventSource(api.streamUrl);
+    const mergeById = <T extends { id: number }>(prev: T[], updates: T[], newFirst: boolean) => {
+      const byId = new Map(updates.map((u) => [u.id, u]));
+      const merged = prev.map((p) => byId.get(p.id) ?? p);
+      const known = new Set(prev.map((p) => p.id));
+      const added = updates.filter((u) => !known.has(u.id));
+      return newFirst ? [...added.reverse(), ...merged] : [...merged, ...added].sort((a, b) => a.id - b.id);
+    };
+    source.addEventListener("snapshot", (e) => {
+      const data: LiveSnapshot = JSON.parse((e as MessageEvent).data);
+      setBots(data.bots); setOrders(data.orders); if (data.status) setStatus(data.status);
+    });
+    source.addEventListener("delta", (e) => {
+      const data: LiveDelta = JSON.parse((e as MessageEvent).data);
+      if (data.bots.length) setBots((prev) => mergeById(prev, data.bots, false));
+      if (data.orders.length) setOrders((prev) => mergeById(prev, data.orders, true));
+      if (data.status) setStatus(data.status);
+    });
+    source.onerror = () => console.error("Live stream interrupted, reconnecting...");
+    return () => source.close();
   }, []);
 
-  // auto-tick: when enabled, fires a tick every second so the simulation runs continuously
-  useEffect(() => { if (!autoRun) return; const id = setInterval(() => api.tick(), 1000); return () => clearInterval(id); }, [autoRun]);
   useEffect(() => { if (logRef.current) logRef.current.scrollTop = logRef.current.scrollHeight; }, [logs]);
   useEffect(() => { if (!toast) return; const id = setTimeout(() => setToast(null), 5000); return () => clearTimeout(id); }, [toast]);
 
@@ -337,8 +338,8 @@ export default function Home() {
     }
   };
   const handleStart = async () => { await api.start(); log("Simulation started"); };
-  const handleStop = async () => { await api.stop(); setAutoRun(false); log("Simulation stopped"); };
-  const handleReset = async () => { await api.reset(); setAutoRun(false); setLogs([]); log("Simulation reset"); };
+  const handleStop = async () => { await api.stop(); log("Simulation stopped"); };
+  const handleReset = async () => { await api.reset(); setLogs([]); log("Simulation reset"); };
   const handleTick = async () => { await api.tick(); };
 
   const filteredOrders = orders.filter((o) => {
@@ -424,9 +425,9 @@ export default function Home() {
       <span style={{ fontSize: 12, fontWeight: 600, color: "var(--accent)", whiteSpace: "nowrap" }}>Quick start:</span>
       <span style={{ fontSize: 12, color: "var(--text-secondary)", lineHeight: 1.5, overflow: "hidden", whiteSpace: "nowrap", textOverflow: "ellipsis" }}>
         <strong>1.</strong> Create order → <Kbd>+ Order</Kbd>
-        &nbsp;&nbsp;<strong>2.</strong> <Kbd>Click ▶ Start</Kbd> and then <Kbd>Click → Tick for one second</Kbd>
+        &nbsp;&nbsp;<strong>2.</strong> <Kbd>Click ▶ Start</Kbd> to run the server tick loop
         &nbsp;&nbsp;<strong>3.</strong> Watch bots
-        &nbsp;&nbsp;<strong>4.</strong> <Kbd>Auto</Kbd> for continuous ticking
+        &nbsp;&nbsp;<strong>4.</strong> <Kbd>Click → Tick</Kbd> to step by hand while stopped
         &nbsp;&nbsp;<strong>5.</strong> <Kbd>Reset</Kbd> to bring all bots to the initial station (4,3)
 
       </span>
@@ -453,7 +454,7 @@ export default function Home() {
           {/* controls row: sim + new order side by side */}
           <div style={{ display: "flex", gap: 14, flexWrap: "wrap" }}>
             <Card title="Simulation" style={{ flex: 1, minWidth: 260 }}>
-              <SimControlsContent isRunning={isRunning} autoRun={autoRun} setAutoRun={setAutoRun} handleStart={handleStart} handleStop={handleStop} handleTick={handleTick} handleReset={handleReset} />
+              <SimControlsContent isRunning={isRunning} handleStart={handleStart} handleStop={handleStop} handleTick={handleTick} handleReset={handleReset} />
             </Card>
             <Card title="New Order" hint="Pick & create" style={{ flex: 1, minWidth: 260 }}>
               <NewOrderContent grid={grid} selectedRestaurant={selectedRestaurant} setSelectedRestaurant={setSelectedRestaurant} selectedDelivery={selectedDelivery} setSelectedDelivery={setSelectedDelivery} handleCreate={handleCreate} />
@@ -494,7 +495,7 @@ export default function Home() {
         {/* LEFT PANEL */}
         <aside style={{ width: LEFT_W, flexShrink: 0, borderRight: "1px solid var(--border)", padding: 14, display: "flex", flexDirection: "column", gap: 12, overflowY: "auto", maxHeight: panelMaxH }}>
           <Card title="Simulation">
-            <SimControlsContent isRunning={isRunning} autoRun={autoRun} setAutoRun={setAutoRun} handleStart={handleStart} handleStop={handleStop} handleTick={handleTick} handleReset={handleReset} />
+            <SimControlsContent isRunning={isRunning} handleStart={handleStart} handleStop={handleStop} handleTick={handleTick} handleReset={handleReset} />
           </Card>
           <Card title="New Order" hint="Pick & create">
             <NewOrderContent grid={grid} selectedRestaurant={selectedRestaurant} setSelectedRestaurant={setSelectedRestaurant} selectedDelivery={selectedDelivery} setSelectedDelivery={setSelectedDelivery} handleCreate={handleCreate} />
@@ -1,7 +1,6 @@
 // I am using this API client to communicate with our FastAPI backend.
-// Instead of complex WebSockets, I decided to go with simple polling (setInterval in page.tsx). (reasoning behind that is simple results, and not a production grade project at this point)
-// This approach is more robust for our current needs and ensures we get near real-time 
-// updates for bot positions and order statuses every second without overcomplicating the stack.
+// Live bot/order/status updates come from one server-sent event stream that page.tsx opens
+// (/simulation/stream) that sends a full snapshot on connect and then one delta per tick.
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api";
 
@@ -33,4 +32,5 @@ export const api = {
   stop: () => safeFetch(API_BASE + "/simulation/stop", { method: "POST" }),
   reset: () => safeFetch(API_BASE + "/simulation/reset", { method: "POST" }),
   tick: () => safeFetch(API_BASE + "/simulation/tick", { method: "POST" }),
+  streamUrl: API_BASE + "/simulation/stream",
 };
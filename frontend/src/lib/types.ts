@@ -85,3 +85,21 @@ export interface SimulationStatus {
   delivered_orders: number;
   active_bots: number;
 }
+
+// What /simulation/stream sends: a full snapshot when the stream (re)connects, then one delta per change
+// with only the bots and orders that changed. status is null until the server has its counters loaded.
+export interface LiveSnapshot {
+  seq: number;
+  tick: number;
+  bots: Bot[];
+  orders: Order[];
+  status: SimulationStatus | null;
+}
+
+export interface LiveDelta {
+  seq: number;
+  tick: number;
+  bots: Bot[];
+  orders: Order[];
+  status: SimulationStatus | null;
+}